@@ -0,0 +1,57 @@
+"""
+Measure the asm and obj stages run as two compiler invocations per file against one fused invocation, see gnu.setfused().
+Generates files small translation units in a temporary directory and compiles them with both modes in turn, counting the
+compiler processes from the profile of each compile. The fused invocation saves a compiler start per file but preprocesses
+in a separate pass, as -save-temps requires, so it gains most where starting processes is expensive.
+
+    python bench/fused.py [compiler] [files] [runs]
+"""
+import asyncio
+import json
+import pathlib
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from opifex import gnu
+
+
+def sources(directory, count):
+    files = []
+    for index in range(count):
+        file = directory / f'unit{index}.cpp'
+        file.write_text(f'#include <vector>\nint unit{index}(int x) {{ std::vector<int> v(x, {index}); int s = 0; for (int i : v) s += i; return s; }}\n')
+        files.append(file)
+    (directory / 'main.cpp').write_text('int main() {}\n')
+    return files + [directory / 'main.cpp']
+
+def measure(compiler, files, fused):
+    compiler.setfused(fused)
+    shutil.rmtree(compiler.builddir, ignore_errors=True)
+    start = time.perf_counter()
+    _, logs = asyncio.run(compiler.async_compile(files))
+    elapsed = time.perf_counter() - start
+    assert logs['final'][0] == 0, logs['final']
+    return (elapsed, len([record for record in logs['profile'].records if record['stage'] in ('asm', 'obj')]))
+
+def summary(runs):
+    times = [elapsed for elapsed, _ in runs]
+    return {'runs': len(runs), 'processes': runs[-1][1], 'mean_ms': statistics.mean(times) * 1e3, 'median_ms': statistics.median(times) * 1e3, 'min_ms': min(times) * 1e3}
+
+if __name__ == '__main__':
+    path = pathlib.Path(sys.argv[1] if len(sys.argv) > 1 else shutil.which('g++'))
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    runs = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    with tempfile.TemporaryDirectory() as directory:
+        directory = pathlib.Path(directory)
+        compiler = gnu(path, 'bench', builddir=directory / 'build', target='bench_fused').setstages(True, True, True).setprofile(True)
+        files = sources(directory, count)
+        separate, fused = [], []
+        for _ in range(runs):
+            separate.append(measure(compiler, files, False))
+            fused.append(measure(compiler, files, True))
+        results = {'separate': summary(separate), 'fused': summary(fused)}
+    results['saved_ms'] = results['separate']['median_ms'] - results['fused']['median_ms']
+    print(json.dumps(results, indent=4))
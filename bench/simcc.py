@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+A simulated compiler that stands in for g++ (as gnu's path) or for vcvars64.bat, cl and link (as msvc's path and on PATH),
+so opifex's own overhead and scheduling can be measured anywhere. It writes every output a real compiler would, with no real work.
+
+The cost of each input comes from a first line like
+
+    // simcc latency=0.05 rss=50000000 output=2048 fail=0.1
+
+in the source (carried into the .s and .obj it writes), falling back to $SIMCC_LATENCY (seconds), $SIMCC_RSS (bytes held at peak),
+$SIMCC_OUTPUT (bytes of warnings on stderr) and $SIMCC_FAIL (probability of an error). Whether an input fails is decided by a hash
+of its path and $SIMCC_SEED, so runs are repeatable. Links only take $SIMCC_LINK seconds. $SIMCC_SCALE multiplies every latency.
+"""
+import hashlib
+import os
+import pathlib
+import re
+import sys
+import time
+
+DEFAULTS = {'latency': 0.0, 'rss': 0, 'output': 0, 'fail': 0.0}
+
+
+def costs(path):
+    values = {name: float(os.environ.get('SIMCC_' + name.upper(), value)) for name, value in DEFAULTS.items()}
+    try:
+        with open(path, 'rb') as file:
+            first = file.readline().decode(errors='replace')
+    except OSError:
+        first = ''
+    if match := re.match(r'\s*(?://|#|;)\s*simcc\s+(.*)', first):
+        for name, value in re.findall(r'(\w+)=([\d.eE+-]+)', match.group(1)):
+            if name in values:
+                values[name] = float(value)
+    return first if match else '', values
+
+def fails(path, probability):
+    digest = hashlib.sha256((os.environ.get('SIMCC_SEED', '0') + ':' + pathlib.Path(path).as_posix()).encode()).digest()
+    return int.from_bytes(digest[:8], 'big') / 2 ** 64 < probability
+
+def work(inputs, link=False):
+    """
+    Spend the latency, hold the rss and write the output of inputs, or only spend the latency of a link.
+    returns the directive line to carry into outputs and whether an input fails.
+    """
+    scale = float(os.environ.get('SIMCC_SCALE', '1'))
+    if link:
+        time.sleep(float(os.environ.get('SIMCC_LINK', '0')) * scale)
+        return '', False
+    header, total = '', dict(DEFAULTS)
+    failed = []
+    for path in inputs:
+        first, values = costs(path)
+        header = header or first
+        total = {name: max(total[name], values[name]) for name in total}
+        if fails(path, values['fail']):
+            failed.append(path)
+    block = bytearray(int(total['rss']))
+    for index in range(0, len(block), 4096):
+        block[index] = 1
+    time.sleep(total['latency'] * scale)
+    line = f'{inputs[0] if inputs else "simcc"}:1:1: warning: simulated diagnostic [-Wsimcc]\n'
+    if total['output'] > 0:
+        sys.stderr.write(line * max(int(total['output']) // len(line), 1))
+    for path in failed:
+        sys.stderr.write(f'{path}:1:1: error: simulated failure\n')
+    return header, bool(failed)
+
+def write(path, header, body):
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(header + body)
+
+def gnu(args):
+    if '-dumpversion' in args:
+        print('12.0.0')
+        return 0
+    if '-dumpmachine' in args:
+        print('x86_64-simcc-linux-gnu')
+        return 0
+    output, depfile, inputs = None, None, []
+    index = 0
+    while index < len(args):
+        arg = args[index]
+        if arg in ('-o', '-MF', '-MT', '-x', '-include', '-dumpdir', '-dumpbase'):
+            output = args[index + 1] if arg == '-o' else output
+            depfile = args[index + 1] if arg == '-MF' else depfile
+            index += 2
+            continue
+        if not arg.startswith('-') or arg == '-':
+            inputs.append(arg)
+        index += 1
+    if '-v' in args:
+        sys.stderr.write('#include <...> search starts here:\n /usr/include/simcc\nEnd of search list.\n')
+    header, failed = work(inputs, not {'-c', '-S', '-E', '-fsyntax-only'} & set(args))
+    if '-E' in args:
+        for path in inputs:
+            sys.stdout.write(pathlib.Path(path).read_text(errors='replace') if os.path.isfile(path) else '')
+    elif failed:
+        return 1
+    elif output is not None and '-fsyntax-only' not in args:
+        executable = '-c' not in args and '-S' not in args
+        write(output, '#!/bin/sh\n' if executable else header, f'simcc {" ".join(inputs)}\n')
+        if executable:
+            os.chmod(output, 0o755)
+    if depfile is not None and not failed:
+        write(depfile, '', f'{output}: ' + ' '.join(path.replace(' ', '\\ ') for path in inputs) + '\n')
+    return 1 if failed else 0
+
+def msvc(tool, args):
+    inputs = [arg for arg in args if not arg.startswith('/') or os.path.isfile(arg)]
+    header, failed = work(inputs, tool == 'link')
+    if failed:
+        return 2
+    flags = {arg[:3]: arg[3:] for arg in args if arg[:3] in ('/Fo', '/Fa')}
+    for path in inputs:
+        stem = pathlib.Path(path.replace('\\', '/')).stem
+        for flag, suffix in (('/Fo', '.obj'), ('/Fa', '.asm')):
+            if flag in flags and tool == 'cl':
+                write(pathlib.Path(flags[flag].rstrip('\\/')) / (stem + suffix), header, f'simcc {path}\n')
+    for arg in args:
+        if arg.upper().startswith('/OUT:'):
+            write(arg[5:], '', f'simcc {" ".join(inputs)}\n')
+    return 0
+
+if __name__ == '__main__':
+    tool = pathlib.Path(sys.argv[0]).stem
+    args = sys.argv[1:]
+    if args[:1] == ['&&']:
+        tool, args = args[1], args[2:]
+    if tool in ('cl', 'link'):
+        sys.exit(msvc(tool, args))
+    sys.exit(0 if not args else gnu(args))
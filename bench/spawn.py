@@ -0,0 +1,64 @@
+"""
+Measure the per file overhead of starting the compiler: the shell based launch async_compile used to do against gnu.launch().
+Every run starts the compiler with -dumpversion, so the time is dominated by process creation rather than compilation.
+
+    python bench/spawn.py [compiler] [runs]
+"""
+import asyncio
+import json
+import pathlib
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+from opifex import gnu
+
+
+async def shell(compiler, runs):
+    times = []
+    command = 'cd ' + gnu.safe(compiler.path.parent) + ' && ' + compiler.path.name + ' -dumpversion'
+    for _ in range(runs):
+        start = time.perf_counter()
+        task = await asyncio.create_subprocess_shell(command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE, env=compiler.create_env())
+        await task.communicate()
+        times.append(time.perf_counter() - start)
+    return times
+
+async def launch(compiler, runs):
+    times = []
+    env = compiler.create_env()
+    for _ in range(runs):
+        start = time.perf_counter()
+        await compiler.async_compile_kernel([compiler.path.name, '-dumpversion'], env=env)
+        times.append(time.perf_counter() - start)
+    return times
+
+def sync(compiler, runs, shell):
+    times = []
+    env = compiler.create_env()
+    for _ in range(runs):
+        start = time.perf_counter()
+        if shell:
+            subprocess.run(compiler.path.name + ' -dumpversion', shell=True, capture_output=True, env=env)
+        else:
+            compiler.compile_kernel([compiler.path.name, '-dumpversion'], env)
+        times.append(time.perf_counter() - start)
+    return times
+
+def summary(times):
+    return {'runs': len(times), 'mean_ms': statistics.mean(times) * 1e3, 'median_ms': statistics.median(times) * 1e3, 'min_ms': min(times) * 1e3}
+
+if __name__ == '__main__':
+    path = pathlib.Path(sys.argv[1] if len(sys.argv) > 1 else shutil.which('g++'))
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    compiler = gnu(path, 'bench')
+    results = {
+        'async_shell': summary(asyncio.run(shell(compiler, runs))),
+        'async_launch': summary(asyncio.run(launch(compiler, runs))),
+        'sync_shell': summary(sync(compiler, runs, True)),
+        'sync_launch': summary(sync(compiler, runs, False))
+    }
+    results['async_saved_ms'] = results['async_shell']['median_ms'] - results['async_launch']['median_ms']
+    print(json.dumps(results, indent=4))
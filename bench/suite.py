@@ -0,0 +1,169 @@
+"""
+Measure opifex's own overhead and scheduling quality on synthetic projects compiled by bench/simcc.py, a simulated compiler,
+so no real toolchain is needed. For every size a project of that many translation units is generated, each with a latency drawn
+from a lognormal distribution around latency seconds, and the suite reports:
+
+    commands     asm and obj commands generated per second, and the time to freeze and generate the final command
+    spawn        the median time to start simcc directly against gnu.compile_kernel() and gnu.async_compile_kernel()
+    makespan     the wall time of an async compile with jobs jobs in file order and longest processing time first, against the
+                 ideal schedule of the latencies alone and with the direct spawn time added to each file, which is cpu time
+                 so the spawns of all files can't take less than their sum over the cpus
+    memory       the peak python allocations of a compile under tracemalloc, run separately at no latency, and the peak rss
+    msvc         the wall time of msvc.compile() and msvc.async_compile() at no latency, with simcc standing in for vcvars, cl and link
+
+The results are printed as json so runs can be compared for regressions, sizes is a comma separated list.
+
+    python bench/suite.py [sizes] [jobs] [latency] [runs]
+"""
+import asyncio
+import json
+import math
+import os
+import pathlib
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from opifex import gnu, msvc, schedule
+
+SIMCC = pathlib.Path(__file__).resolve().parent / 'simcc.py'
+
+
+def project(directory, count, latency, seed=0):
+    """
+    Write count sources into directory, each with a simcc directive for its latency.
+    returns the files and their latencies.
+    """
+    generator = random.Random(seed)
+    sigma = 1.0
+    files, latencies = [], []
+    directory.mkdir(parents=True, exist_ok=True)
+    for index in range(count):
+        cost = generator.lognormvariate(math.log(latency) - sigma ** 2 / 2, sigma) if latency > 0 else 0.0
+        file = directory / f'unit{index}.cpp'
+        file.write_text(f'// simcc latency={cost:.6f}\nint unit{index}() {{ return {index}; }}\n')
+        files.append(file)
+        latencies.append(cost)
+    return files, latencies
+
+def shim(directory):
+    """
+    Link vcvars64.bat, cl and link to simcc in directory and put it first on PATH, as the async msvc kernels find cl and link through the shell.
+    returns the path of vcvars64.bat.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    for name in ('vcvars64.bat', 'cl', 'link'):
+        (directory / name).symlink_to(SIMCC)
+    os.environ['PATH'] = str(directory) + os.pathsep + os.environ.get('PATH', '')
+    return directory / 'vcvars64.bat'
+
+def commands(compiler, files):
+    compiler.frozen = None
+    start = time.perf_counter()
+    _, final = compiler.final_command(files)
+    frozen = time.perf_counter() - start
+    start = time.perf_counter()
+    for file in files:
+        compiler.asm_command(file)
+        compiler.obj_command(file)
+    elapsed = time.perf_counter() - start
+    return {'per_second': 2 * len(files) / elapsed if elapsed else None, 'freeze_final_ms': frozen * 1e3, 'final_args': len(final)}
+
+def spawn(compiler, runs):
+    env = compiler.create_env()
+    cmd = [compiler.path.name, '-dumpversion']
+    direct, kernel, launched = [], [], []
+
+    async def measure():
+        for _ in range(runs):
+            start = time.perf_counter()
+            await compiler.async_compile_kernel(cmd, env=env)
+            launched.append(time.perf_counter() - start)
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([str(SIMCC), '-dumpversion'], capture_output=True, env=env)
+        direct.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        compiler.compile_kernel(cmd, env)
+        kernel.append(time.perf_counter() - start)
+    asyncio.run(measure())
+    median = lambda times: statistics.median(times) * 1e3
+    return {'runs': runs, 'direct_ms': median(direct), 'compile_kernel_ms': median(kernel), 'async_compile_kernel_ms': median(launched)}
+
+def build(compiler, files):
+    shutil.rmtree(compiler.builddir / compiler.name / 'obj', ignore_errors=True)
+    start = time.perf_counter()
+    _, logs = asyncio.run(compiler.async_compile(files))
+    elapsed = time.perf_counter() - start
+    assert logs['final'][0] == 0, logs['final']
+    return elapsed
+
+def makespan(compiler, files, latencies, jobs, spawned, runs):
+    ideal = schedule.makespan(sorted(latencies, reverse=True), jobs)
+    spawned = max(schedule.makespan(sorted([latency + spawned for latency in latencies], reverse=True), jobs), spawned * len(files) / (os.cpu_count() or 1))
+    results = {'jobs': jobs, 'ideal_s': ideal, 'ideal_spawn_s': spawned}
+    for name, scheduling in (('ordered', False), ('lpt', True)):
+        compiler.setschedule(scheduling)
+        if scheduling:
+            build(compiler, files)
+        measured = statistics.median([build(compiler, files) for _ in range(runs)])
+        results[name] = {'measured_s': measured, 'efficiency': ideal / measured if measured else None, 'overhead_per_unit_ms': (measured - spawned) / len(files) * 1e3}
+    compiler.setschedule(False)
+    return results
+
+def memory(compiler, files):
+    os.environ['SIMCC_SCALE'] = '0'
+    try:
+        tracemalloc.start()
+        build(compiler, files)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        del os.environ['SIMCC_SCALE']
+    return {'python_peak_bytes': peak, 'python_peak_per_unit_bytes': peak / len(files), 'maxrss_kib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}
+
+def windows(path, directory, files, count, runs):
+    compiler = msvc(path, 'msim', builddir=directory / 'build', target=f'suite_msim{count}', stages={'asm': False, 'obj': True, 'final': True})
+    os.environ['SIMCC_SCALE'] = '0'
+    try:
+        sync, concurrent = [], []
+        for _ in range(runs):
+            start = time.perf_counter()
+            logs = compiler.compile(files)[3]
+            sync.append(time.perf_counter() - start)
+            assert all(log[0] == 0 for log in logs), logs
+            start = time.perf_counter()
+            logs = asyncio.run(compiler.async_compile(files))[3]
+            concurrent.append(time.perf_counter() - start)
+            assert all(log[0] == 0 for log in logs), logs
+    finally:
+        del os.environ['SIMCC_SCALE']
+    return {'compile_ms': statistics.median(sync) * 1e3, 'async_compile_ms': statistics.median(concurrent) * 1e3}
+
+if __name__ == '__main__':
+    sizes = [int(size) for size in (sys.argv[1] if len(sys.argv) > 1 else '10,100,1000').split(',')]
+    jobs = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    latency = float(sys.argv[3]) if len(sys.argv) > 3 else 0.02
+    runs = int(sys.argv[4]) if len(sys.argv) > 4 else 3
+    with tempfile.TemporaryDirectory() as directory:
+        directory = pathlib.Path(directory)
+        vcvars = shim(directory / 'shim')
+        compiler = gnu(SIMCC, 'sim', builddir=directory / 'build', stages={'asm': False, 'obj': True, 'final': True}).setjobs(jobs)
+        results = {'python': sys.version.split()[0], 'cpus': os.cpu_count(), 'jobs': jobs, 'latency_s': latency, 'spawn': spawn(compiler, max(runs * 10, 10)), 'sizes': dict()}
+        for count in sizes:
+            files, latencies = project(directory / f'project{count}', count, latency)
+            compiler.target = f'suite_sim{count}'
+            results['sizes'][count] = {
+                'commands': commands(compiler, files),
+                'makespan': makespan(compiler, files, latencies, jobs, results['spawn']['direct_ms'] / 1e3, runs),
+                'memory': memory(compiler, files),
+                'msvc': windows(vcvars, directory, files, count, runs)
+            }
+    print(json.dumps(results, indent=4))
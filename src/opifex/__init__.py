@@ -1,2 +1,19 @@
+from .autotune.autotune import *
+from .cache.cache import *
+from .depindex.depindex import *
+from .diagnostics.diagnostics import *
 from .gnu.gnu import *
+from .graph.graph import *
+from .headers.headers import *
+from .jobserver.jobserver import *
+from .manifest.manifest import *
+from .memory.memory import *
 from .msvc.msvc import *
+from .persist.persist import *
+from .probe.probe import *
+from .profile.profile import *
+from .remote.remote import *
+from .schedule.schedule import *
+from .sink.sink import *
+from .snapshot.snapshot import *
+from .worker.worker import *
@@ -0,0 +1,169 @@
+import asyncio
+import copy
+import itertools
+import math
+import statistics
+import subprocess
+import time
+
+from ..graph.graph import graph
+
+class autotune:
+    """
+    Picks the options a binary ships with by building a variant of a base toolchain for every combination of a search space,
+    running each executable repeatedly and ranking the variants by the median of their run times.
+    """
+    def __init__(self, base, sources, space, command=('{exe}',), runs=10, warmup=2, confidence=0.95, jobs=None):
+        """
+        Takes the toolchain every variant starts from, the sources of the binary, the search space as a dict of dimension names
+        to lists of alternatives, the benchmark command with {exe} standing for the executable, how many timed runs and untimed
+        warmup runs each variant gets, the confidence of the intervals and how many compiles and links run at once.
+        An alternative is a list of options, where -flto or -flto=jobs turns on gnu.setlto(), or a callable taking and returning the toolchain.
+        Options replace the ones of the same family in the base, see autotune.family(), so {'O': [['-O2'], ['-O3']]} works on a base with -O1.
+        Raises AssertionError if runs is less than 1 or confidence isn't between 0 and 1.
+        """
+        assert runs >= 1, f'autotune(). runs must be at least 1. runs was [{runs}].'
+        assert 0 < confidence < 1, f'autotune(). confidence must be between 0 and 1. confidence was [{confidence}].'
+        self.base = base
+        self.sources = list(sources)
+        self.space = dict(space)
+        self.command = list(command)
+        self.runs = runs
+        self.warmup = warmup
+        self.confidence = confidence
+        self.jobs = jobs
+    
+    @staticmethod
+    def family(option):
+        """
+        returns the family of option, options of which override each other: -O levels, -fx and -fno-x, and -x=value by -x.
+        """
+        if option.startswith('-O'):
+            return '-O'
+        if option.startswith('-fno-') or option.startswith('-mno-'):
+            option = option[:2] + option[5:]
+        return option.partition('=')[0]
+    
+    @staticmethod
+    def label(alternative):
+        """
+        returns the options of alternative, or the name of the callable, as a string for reports.
+        """
+        return alternative.__name__ if callable(alternative) else ' '.join(alternative)
+    
+    @staticmethod
+    def derive(base, alternatives, key=None):
+        """
+        returns a copy of base with each of alternatives applied, sharing none of its option sets.
+        Given a key the copy is named base.name-key and builds base.target-key, set before anything can freeze it.
+        """
+        variant = copy.copy(base)
+        if key is not None:
+            variant.name, variant.target = f'{base.name}-{key}', f'{base.target}-{key}'
+        variant.includes, variant.libpaths, variant.libs = set(base.includes), set(base.libpaths), set(base.libs)
+        variant.options, variant.archives = set(base.options), set(base.archives)
+        variant.lto = None if base.lto is None else dict(base.lto)
+        variant.frozen = None
+        for alternative in alternatives:
+            if callable(alternative):
+                variant = alternative(variant)
+                continue
+            for option in alternative:
+                if option == '-flto' or option.startswith('-flto='):
+                    jobs = option.partition('=')[2] or None
+                    variant.setlto(True, int(jobs) if jobs and jobs.isdigit() else jobs)
+                    continue
+                variant.discardopts(*[other for other in variant.options if autotune.family(other) == autotune.family(option)])
+                variant.addopts(option)
+        return variant
+    
+    def variants(self):
+        """
+        returns a dict of keys to the variants of the search space, each with the labels of its alternatives and its toolchain.
+        The key is the start of the fingerprint of the toolchain, so identical configurations are built once, and names
+        the toolchain and its target, which are derived again under that name. Variants are incremental so builds of a key that already exist are reused.
+        """
+        variants = dict()
+        for combination in itertools.product(*self.space.values()):
+            key = autotune.derive(self.base, combination).freeze().fingerprint[:12]
+            if key in variants:
+                continue
+            toolchain = autotune.derive(self.base, combination, key)
+            toolchain.setincremental(True).setstages(toolchain.outasm, toolchain.outobj, True)
+            labels = {dimension: autotune.label(alternative) for dimension, alternative in zip(self.space, combination)}
+            variants[key] = {'labels': labels, 'toolchain': toolchain}
+        return variants
+    
+    @staticmethod
+    def interval(times, confidence=0.95):
+        """
+        returns the median of times and the order statistics bounding a distribution free confidence interval of it.
+        With too few times for the confidence the interval is the full range.
+        """
+        ordered = sorted(times)
+        n = len(ordered)
+        tail = (1 - confidence) / 2
+        cdf = lambda k: sum(math.comb(n, i) for i in range(k + 1)) / 2 ** n
+        k = 0
+        while k + 1 <= (n - 1) // 2 and cdf(k + 1) <= tail:
+            k += 1
+        return (statistics.median(ordered), ordered[k], ordered[n - 1 - k])
+    
+    def run(self, executable):
+        """
+        Run the benchmark command with executable self.warmup times untimed and self.runs times timed.
+        returns the wall times and None, or the times so far and the [returncode, stdout, stderr] result of the run that failed.
+        """
+        command = [str(executable) if arg == '{exe}' else arg.replace('{exe}', str(executable)) for arg in self.command]
+        times = []
+        for index in range(self.warmup + self.runs):
+            start = time.perf_counter()
+            task = subprocess.run(command, capture_output=True, text=True)
+            elapsed = time.perf_counter() - start
+            if task.returncode != 0:
+                return (times, [task.returncode, task.stdout, task.stderr])
+            if index >= self.warmup:
+                times.append(elapsed)
+        return (times, None)
+    
+    async def async_tune(self, emit=None):
+        """
+        Build every variant concurrently with an opifex.graph, then benchmark them one at a time so the runs don't disturb each other.
+        returns the variants ranked by median run time, each a dict of the key, labels, options, whether the build was reused,
+        the median, low and high of the interval, the times and the error of a failed build or run. Failed variants rank last.
+        A variant whose interval overlaps that of the fastest isn't reliably slower and has 'overlaps' set.
+        """
+        variants = self.variants()
+        builder = graph(self.jobs)
+        for key, variant in variants.items():
+            builder.add(key, variant['toolchain'], self.sources)
+        built = await builder.async_compile(emit)
+        ranking = []
+        for key, variant in variants.items():
+            toolchain = variant['toolchain']
+            executable, logs = built[key]
+            entry = {
+                'key': key,
+                'labels': variant['labels'],
+                'options': sorted(toolchain.options) + (['-flto'] if toolchain.lto is not None else []),
+                'reused': not logs['rebuilt'],
+                'median': None, 'low': None, 'high': None, 'times': [], 'error': None
+            }
+            if not logs['final'] or logs['final'][0] != 0:
+                entry['error'] = logs['final'] or [None, '', 'not linked, a compile failed']
+            else:
+                entry['times'], entry['error'] = await asyncio.to_thread(self.run, executable)
+                if entry['error'] is None:
+                    entry['median'], entry['low'], entry['high'] = autotune.interval(entry['times'], self.confidence)
+            ranking.append(entry)
+        ranking.sort(key=lambda entry: (entry['median'] is None, entry['median'] or 0.0))
+        best = ranking[0] if ranking and ranking[0]['median'] is not None else None
+        for entry in ranking:
+            entry['overlaps'] = best is not None and entry['median'] is not None and entry['low'] <= best['high']
+        return ranking
+    
+    def tune(self, emit=None):
+        """
+        Build, benchmark and rank the variants like autotune.async_tune() from synchronous code.
+        """
+        return asyncio.run(self.async_tune(emit))
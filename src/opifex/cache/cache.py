@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import uuid
+
+from ..persist.persist import persist
+
+class cache:
+    """
+    Content addressed store of compiler outputs and their diagnostics, shared between builddirs, branches and toolchain names.
+    Entries are evicted least recently used first once the total size exceeds maxsize.
+    """
+    def __init__(self, path=None, maxsize=5 << 30, hardlink=False):
+        """
+        Takes the cache directory, defaulting to $OPIFEX_CACHE or ~/.cache/opifex, the maximum total size in bytes
+        and whether hits are hardlinked into builddir. By default they are copied. A hardlinked output is the cached entry itself,
+        so it must be treated as read-only: tools that rewrite it in place would change the entry. Entries are checked against
+        the size and mtime they were stored with, so an entry changed anyway is dropped instead of restored.
+        """
+        self.path = pathlib.Path(path or os.environ.get('OPIFEX_CACHE', pathlib.Path.home() / '.cache' / 'opifex'))
+        self.maxsize = maxsize
+        self.hardlink = hardlink
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        os.makedirs(self.path, exist_ok=True)
+    
+    @staticmethod
+    def normalize(command, inputs):
+        """
+        Strip the compiler name, the inputs, the output and depfile paths, the include directories and the forced includes, like the
+        precompiled header stub in builddir (which only affect the preprocessed TU) from command, so the same TU built into different
+        builddirs normalizes identically.
+        """
+        normalized = []
+        skip = False
+        for arg in command[1:]:
+            if skip:
+                skip = False
+            elif arg in ('-o', '-MF', '-include'):
+                skip = True
+            elif arg != '-MMD' and not arg.startswith('-I') and arg not in inputs:
+                normalized.append(arg)
+        return normalized
+    
+    @staticmethod
+    def key(identity, command, content):
+        """
+        returns the hex key of the output of compiling content with the normalized command by the compiler identified by identity.
+        """
+        sha = hashlib.sha256()
+        for part in [identity, '\0'.join(command)]:
+            sha.update(part.encode())
+            sha.update(b'\0')
+        sha.update(content if isinstance(content, bytes) else content.encode())
+        return sha.hexdigest()
+    
+    def entry(self, key):
+        """
+        returns the directory of the entry stored under key.
+        """
+        return self.path / key[:2] / key[2:]
+    
+    def fetch(self, key, output, depfile=None):
+        """
+        Restore the output stored under key to output, and its dependencies to depfile if given.
+        returns the [returncode, stdout, stderr] result of the compile that produced it or None on a miss, counting entries that changed since they were stored.
+        """
+        entry = self.entry(key)
+        try:
+            meta = json.loads((entry / 'meta.json').read_text())
+            stat = os.stat(entry / 'output')
+            if (stat.st_size, stat.st_mtime_ns) != (meta.get('size', stat.st_size), meta.get('mtime', stat.st_mtime_ns)):
+                shutil.rmtree(entry, ignore_errors=True)
+                raise ValueError(f'cache.fetch(). the entry was changed after it was stored. key was [{key}].')
+            if output.exists():
+                os.unlink(output)
+            if self.hardlink:
+                try:
+                    os.link(entry / 'output', output)
+                except OSError:
+                    shutil.copyfile(entry / 'output', output)
+            else:
+                shutil.copyfile(entry / 'output', output)
+            os.utime(entry)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        if depfile is not None and meta['deps'] is not None:
+            pathlib.Path(depfile).write_text(str(output).replace(' ', '\\ ') + ': ' + ' \\\n '.join(dep.replace(' ', '\\ ') for dep in meta['deps']) + '\n')
+        self.hits += 1
+        return [0, meta['stdout'], meta['stderr']]
+    
+    def store(self, key, output, result, deps=None):
+        """
+        Store output and the [returncode, stdout, stderr] result of the compile that produced it under key. Failed compiles are not stored.
+        """
+        entry = self.entry(key)
+        if result[0] != 0 or entry.exists():
+            return self
+        temp = self.path / 'tmp' / uuid.uuid4().hex
+        os.makedirs(temp)
+        try:
+            shutil.copyfile(output, temp / 'output')
+            stat = os.stat(temp / 'output')
+            (temp / 'meta.json').write_text(json.dumps({'stdout': result[1], 'stderr': result[2], 'deps': deps, 'size': stat.st_size, 'mtime': stat.st_mtime_ns}))
+            os.makedirs(entry.parent, exist_ok=True)
+            os.rename(temp, entry)
+            self.size += os.path.getsize(entry / 'output') + os.path.getsize(entry / 'meta.json')
+        except OSError:
+            shutil.rmtree(temp, ignore_errors=True)
+        return self
+    
+    def stats(self):
+        """
+        returns the hit and miss counters and total size persisted in the cache directory merged with those of this object.
+        """
+        try:
+            stats = json.loads((self.path / 'stats.json').read_text())
+        except (OSError, ValueError):
+            stats = {'hits': 0, 'misses': 0, 'size': 0}
+        return {'hits': stats['hits'] + self.hits, 'misses': stats['misses'] + self.misses, 'size': stats['size'] + self.size}
+    
+    def evict(self, limit):
+        """
+        Remove the least recently used entries until the total size is at most limit.
+        returns the remaining total size.
+        """
+        entries = []
+        total = 0
+        for prefix in self.path.iterdir():
+            if len(prefix.name) != 2 or not prefix.is_dir():
+                continue
+            for entry in prefix.iterdir():
+                size = sum(file.stat().st_size for file in entry.iterdir())
+                entries.append((entry.stat().st_mtime_ns, size, entry))
+                total += size
+        for _, size, entry in sorted(entries):
+            if total <= limit:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+        return total
+    
+    def save(self):
+        """
+        Persist the counters of this object into the cache directory and evict entries if the cache grew beyond maxsize.
+        """
+        stats = self.stats()
+        if stats['size'] > self.maxsize:
+            stats['size'] = self.evict(self.maxsize * 9 // 10)
+        persist.write(self.path / 'stats.json', stats)
+        self.hits = self.misses = self.size = 0
+        return self
@@ -0,0 +1,117 @@
+import json
+import os
+import pathlib
+import re
+
+from ..persist.persist import persist
+
+class depindex:
+    """
+    Reverse index from every dependency listed in compiler depfiles (-MMD -MF) to the outputs that depend on it.
+    The parsed depfiles are persisted so only depfiles that changed since the last run are read again.
+    """
+    def __init__(self, path):
+        """
+        Takes the file path of the persisted index, which is loaded if it exists.
+        """
+        self.path = pathlib.Path(path)
+        self.depfiles = dict()
+        if self.path.is_file():
+            try:
+                self.depfiles = json.loads(self.path.read_text())['depfiles']
+            except (ValueError, KeyError):
+                self.depfiles = dict()
+        self.reverse = dict()
+        for depfile, entry in self.depfiles.items():
+            self.link(entry['output'], entry['deps'])
+    
+    @staticmethod
+    def parse(text):
+        """
+        Parse the make rule of a depfile.
+        returns the target and the list of its dependencies with escaped spaces unescaped.
+        """
+        text = text.replace('\\\r\n', ' ').replace('\\\n', ' ')
+        target, _, deps = text.partition(': ')
+        deps = re.split(r'(?<!\\)\s+', deps.strip())
+        return (target.strip().replace('\\ ', ' '), [dep.replace('\\ ', ' ').replace('$$', '$') for dep in deps if dep])
+    
+    def link(self, output, deps):
+        """
+        Add the edges from each of deps to output to the reverse index.
+        """
+        for dep in deps:
+            self.reverse.setdefault(dep, set()).add(output)
+    
+    def unlink(self, output, deps):
+        """
+        Remove the edges from each of deps to output from the reverse index.
+        """
+        for dep in deps:
+            outputs = self.reverse.get(dep)
+            if outputs is not None:
+                outputs.discard(output)
+                if not outputs:
+                    del self.reverse[dep]
+    
+    def update(self, depfile, output):
+        """
+        Index the dependencies of output from depfile, parsing it only if it changed since it was last indexed.
+        """
+        depfile = str(depfile)
+        try:
+            mtime = os.stat(depfile).st_mtime_ns
+        except OSError:
+            return self.discard(depfile)
+        entry = self.depfiles.get(depfile)
+        if entry is not None and entry['mtime'] == mtime and entry['output'] == str(output):
+            return self
+        self.discard(depfile)
+        with open(depfile) as f:
+            _, deps = depindex.parse(f.read())
+        self.depfiles[depfile] = {'mtime': mtime, 'output': str(output), 'deps': deps}
+        self.link(str(output), deps)
+        return self
+    
+    def discard(self, depfile):
+        """
+        Remove depfile and the edges it contributed from the index.
+        """
+        entry = self.depfiles.pop(str(depfile), None)
+        if entry is not None:
+            self.unlink(entry['output'], entry['deps'])
+        return self
+    
+    def dependents(self, dep):
+        """
+        returns the set of outputs that depend on dep.
+        """
+        return set(self.reverse.get(str(dep), set()))
+    
+    def stale(self):
+        """
+        returns the set of indexed outputs that are missing or older than one of their dependencies. Every file is stat'ed once.
+        """
+        mtimes = dict()
+        def mtime(file):
+            if file not in mtimes:
+                try:
+                    mtimes[file] = os.stat(file).st_mtime_ns
+                except OSError:
+                    mtimes[file] = None
+            return mtimes[file]
+        stale = set()
+        for dep, outputs in self.reverse.items():
+            depmtime = mtime(dep)
+            for output in outputs:
+                outmtime = mtime(output)
+                if depmtime is None or outmtime is None or depmtime > outmtime:
+                    stale.add(output)
+        return stale
+    
+    def save(self):
+        """
+        Write the index to its path, replacing the previous one atomically.
+        """
+        persist.write(self.path, {'depfiles': self.depfiles})
+        return self
@@ -0,0 +1,111 @@
+import json
+import os
+import pathlib
+
+class diagnostics:
+    """
+    Collects the diagnostics compilers print with -fdiagnostics-format=json across the files of a compile as compact records.
+    A diagnostic repeated by every file that includes the same header is kept once, with the list of files it came from.
+    """
+    def __init__(self):
+        """
+        Starts without any diagnostics, see diagnostics.add().
+        """
+        self.records = dict()
+        self.files = dict()
+    
+    @staticmethod
+    def parse(text):
+        """
+        Parse the json arrays in the stderr of a compiler, one for each compiler proper it ran.
+        returns the list of diagnostics as gcc prints them and the text outside the arrays, like driver or linker errors.
+        """
+        decoder = json.JSONDecoder()
+        found = []
+        rest = []
+        index = 0
+        while index < len(text):
+            start = text.find('[', index)
+            if start == -1:
+                rest.append(text[index:])
+                break
+            try:
+                value, end = decoder.raw_decode(text, start)
+            except ValueError:
+                rest.append(text[index:start + 1])
+                index = start + 1
+                continue
+            if isinstance(value, list) and all(isinstance(entry, dict) and 'kind' in entry for entry in value):
+                rest.append(text[index:start])
+                found += value
+            else:
+                rest.append(text[index:end])
+            index = end
+        return (found, ''.join(rest).strip())
+    
+    @staticmethod
+    def location(entry, cwd=None):
+        """
+        returns the file, line and column of the caret of the first location of a parsed diagnostic, with the file made absolute against cwd.
+        """
+        caret = (entry.get('locations') or [{}])[0].get('caret', {})
+        file = caret.get('file')
+        if file is not None:
+            file = pathlib.PurePath(os.path.normpath(os.path.join(cwd or os.getcwd(), file))).as_posix()
+        return (file, caret.get('line'), caret.get('column'))
+    
+    @staticmethod
+    def compact(entry, cwd=None):
+        """
+        returns the record of a parsed diagnostic: its kind, location, option, message and the compact records of its notes.
+        """
+        file, line, column = diagnostics.location(entry, cwd)
+        return {
+            'kind': entry.get('kind'),
+            'file': file,
+            'line': line,
+            'column': column,
+            'option': entry.get('option'),
+            'message': entry.get('message'),
+            'children': [diagnostics.compact(child, cwd) for child in entry.get('children', [])]
+        }
+    
+    def add(self, unit, text, cwd=None):
+        """
+        Add the diagnostics the compile of unit printed in text, merging those already seen from other files.
+        returns the text outside the json, see diagnostics.parse().
+        """
+        found, rest = diagnostics.parse(text)
+        unit = pathlib.Path(unit).as_posix()
+        for entry in found:
+            record = diagnostics.compact(entry, cwd)
+            key = (record['file'], record['line'], record['column'], record['kind'], record['option'], record['message'])
+            if key not in self.records:
+                record['units'] = []
+                self.records[key] = record
+                self.files.setdefault(record['file'], []).append(key)
+            if unit not in self.records[key]['units']:
+                self.records[key]['units'].append(unit)
+        return rest
+    
+    def query(self, file=None, kind=None, option=None):
+        """
+        returns the records in file (a path), of kind (error, warning or note) and from option (like -Wunused-variable), each if given.
+        """
+        keys = self.records if file is None else self.files.get(pathlib.Path(os.path.abspath(file)).as_posix(), [])
+        return [
+            self.records[key] for key in keys
+            if (kind is None or self.records[key]['kind'] == kind) and (option is None or self.records[key]['option'] == option)
+        ]
+    
+    def report(self):
+        """
+        returns the number of distinct diagnostics and of their occurrences across files per kind, and the files with the most distinct diagnostics.
+        """
+        kinds = dict()
+        for record in self.records.values():
+            counts = kinds.setdefault(record['kind'], {'distinct': 0, 'occurrences': 0})
+            counts['distinct'] += 1
+            counts['occurrences'] += len(record['units'])
+        files = sorted(self.files.items(), key=lambda item: -len(item[1]))
+        return {'kinds': kinds, 'files': [(file, len(keys)) for file, keys in files]}
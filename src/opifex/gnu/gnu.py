@@ -1,7 +1,28 @@
 import asyncio
+import hashlib
+import json
 import os
 import pathlib
+import shutil
+import signal
 import subprocess
+import sys
+import threading
+import time
+
+from ..cache.cache import cache
+from ..depindex.depindex import depindex
+from ..diagnostics.diagnostics import diagnostics
+from ..headers.headers import headers
+from ..jobserver.jobserver import jobserver
+from ..manifest.manifest import manifest
+from ..memory.memory import memory
+from ..persist.persist import persist
+from ..probe.probe import probe
+from ..profile.profile import profile
+from ..schedule.schedule import schedule
+from ..sink.sink import sink
+from ..snapshot.snapshot import snapshot
 
 class gnu:
     """
@@ -35,18 +56,211 @@ class gnu:
         
         self.target = kwargs.get('target', pathlib.Path.cwd().absolute().stem.replace(' ', '_') + '_' + self.name)
         self.builddir = kwargs.get('builddir', pathlib.Path('build/').absolute())
+        
+        self.setjobs(kwargs.get('jobs', os.cpu_count() or 1))
+        self.incremental = kwargs.get('incremental', False)
+        self.hashing = kwargs.get('hashing', False)
+        self.depfiles = kwargs.get('depfiles', False)
+        self.cache = kwargs.get('cache', None)
+        self.remote = kwargs.get('remote', None)
+        self.setpch(kwargs.get('pch', None))
+        self.setpolicy(kwargs.get('policy', 'stop'))
+        self.profiling = kwargs.get('profile', False)
+        self.jobserver = kwargs.get('jobserver', False)
+        self.setmemory(kwargs.get('memory', False))
+        self.scheduling = kwargs.get('schedule', False)
+        self.fused = kwargs.get('fused', False)
+        self.setsink(kwargs.get('sink', False))
+        self.diagnostics = kwargs.get('diagnostics', False)
+        self.unity = None
+        self.lto = None
+        self.archive = None
+        self.archives = set()
+        self.probe = kwargs.get('probe') or probe(self.path)
+        self.frozen = None
+    
+    def launch_args(self, env=None, cwd=None, program=None, pass_fds=(), streams=None):
+        """
+        returns the keyword arguments both kernels start the compiler with: the compiler itself as executable whatever argv[0] is,
+        unless program names another tool, a working directory of cwd (the current one if None), env (see gnu.create_env() if None),
+        the descriptors in pass_fds, output piped or written to the stdout and stderr in streams and a process group of its own.
+        """
+        return {
+            'pass_fds': pass_fds,
+            'executable': self.path if program in (None, self.path.name) else program,
+            'cwd': pathlib.Path.cwd() if cwd is None else cwd,
+            'env': self.create_env() if env is None else env,
+            'stdout': subprocess.PIPE if streams is None else streams[0],
+            'stderr': subprocess.PIPE if streams is None else streams[1],
+            'start_new_session': True
+        }
+    
+    def launch(self, cmd, env=None, cwd=None, pass_fds=(), streams=None):
+        """
+        Start the compiler with the argv list cmd and without a shell, see gnu.launch_args().
+        returns the subprocess.Popen with binary stdout and stderr pipes, unless streams are given.
+        """
+        return subprocess.Popen(cmd, **self.launch_args(env, cwd, cmd[0], pass_fds, streams))
+    
+    def compile_kernel(self, cmd, env=None, usage=None, cwd=None, tokens=None, streams=None):
+        """
+        Executes compilation of the argv list cmd in a subprocess with the environment specified in env in the directory cwd, see gnu.launch().
+        If usage is a dict it is filled with the resource usage of the subprocess where the platform has os.wait4, see gnu.usage(),
+        and with the time.perf_counter() the subprocess started at as usage['start'], after any wait for a jobserver token.
+        If tokens is an opifex.jobserver a token is held while the subprocess runs and the subprocess inherits the jobserver.
+        If streams holds a stdout and stderr, like the files of opifex.sink, the output is written to them and returned empty.
+        """
+        if tokens is None:
+            return self.run_kernel(cmd, env, usage, cwd, (), streams)
+        token = tokens.acquire()
+        try:
+            return self.run_kernel(cmd, env, usage, cwd, tokens.fds(), streams)
+        finally:
+            tokens.release(token)
+    
+    def run_kernel(self, cmd, env=None, usage=None, cwd=None, pass_fds=(), streams=None):
+        """
+        Run the subprocess of gnu.compile_kernel() and wait for it.
+        """
+        if usage is not None:
+            usage['start'] = time.perf_counter()
+        task = self.launch(cmd, env, cwd, pass_fds, streams)
+        if usage is None or not hasattr(os, 'wait4'):
+            stdout, stderr = task.communicate()
+            return (task.returncode, gnu.decode(stdout or b''), gnu.decode(stderr or b''))
+        stdout, stderr = b'', [b'']
+        if streams is None:
+            reader = threading.Thread(target=lambda: stderr.append(task.stderr.read()))
+            reader.start()
+            stdout = task.stdout.read()
+            reader.join()
+            task.stdout.close()
+            task.stderr.close()
+        _, status, rusage = os.wait4(task.pid, 0)
+        task.returncode = os.waitstatus_to_exitcode(status)
+        usage.update(gnu.usage(rusage))
+        return (task.returncode, gnu.decode(stdout), gnu.decode(stderr[-1]))
+    
+    async def async_compile_kernel(self, cmd, callback=None, processes=None, usage=None, env=None, cwd=None, tokens=None, streams=None):
+        """
+        Executes compilation of the argv list cmd like gnu.compile_kernel() in a subprocess in its own process group, which is killed if the kernel is cancelled.
+        If callback is given it is called with 'stdout' or 'stderr' and each line as soon as the compiler writes it, and the output isn't kept.
+        If processes is given the subprocess is in it while it runs, see gnu.kill().
+        If usage is a dict it is filled like gnu.compile_kernel() fills it.
+        If tokens is an opifex.jobserver a token is held while the subprocess runs and the subprocess inherits the jobserver.
+        If streams holds a stdout and stderr the output is written to them like gnu.compile_kernel() does and callback is ignored.
+        """
+        if tokens is None:
+            return await self.async_run_kernel(cmd, callback, processes, usage, env, cwd, (), streams)
+        token = await tokens.async_acquire()
+        try:
+            return await self.async_run_kernel(cmd, callback, processes, usage, env, cwd, tokens.fds(), streams)
+        finally:
+            tokens.release(token)
+    
+    async def async_run_kernel(self, cmd, callback=None, processes=None, usage=None, env=None, cwd=None, pass_fds=(), streams=None):
+        """
+        Run the subprocess of gnu.async_compile_kernel() and wait for it.
+        """
+        if usage is not None:
+            usage['start'] = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        transports = []
+        readers = []
+        if hasattr(os, 'wait4'):
+            task = self.launch(cmd, env, cwd, pass_fds, streams)
+            waited = gnu.wait4(loop, task)
+            for pipe in [task.stdout, task.stderr] if streams is None else []:
+                stream = asyncio.StreamReader()
+                transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(stream), pipe)
+                transports.append(transport)
+                readers.append(stream)
+        else:
+            task = await asyncio.create_subprocess_exec(*cmd, **self.launch_args(env, cwd, cmd[0], pass_fds, streams))
+            waited = None
+            readers = [task.stdout, task.stderr] if streams is None else []
+        if processes is not None:
+            processes.add(task)
+        try:
+            async def pipe(stream, name):
+                chunks = []
+                pending = b''
+                while chunk := await stream.read(1 << 16):
+                    if callback is None:
+                        chunks.append(chunk)
+                        continue
+                    *lines, pending = (pending + chunk).split(b'\n')
+                    for line in lines:
+                        callback(name, gnu.decode(line + b'\n'))
+                if pending:
+                    callback(name, gnu.decode(pending))
+                return gnu.decode(b''.join(chunks))
+            
+            stdout, stderr = await asyncio.gather(pipe(readers[0], 'stdout'), pipe(readers[1], 'stderr')) if readers else ('', '')
+            if waited is None:
+                return (await task.wait(), stdout, stderr)
+            status, rusage = await waited
+            task.returncode = os.waitstatus_to_exitcode(status)
+            if usage is not None:
+                usage.update(gnu.usage(rusage))
+            return (task.returncode, stdout, stderr)
+        except asyncio.CancelledError:
+            gnu.kill(task)
+            raise
+        finally:
+            for transport in transports:
+                transport.close()
+            if processes is not None:
+                processes.discard(task)
+    
+    @staticmethod
+    def wait4(loop, task):
+        """
+        Reap task with os.wait4 on a separate thread.
+        returns a future of loop that resolves to the wait status and resource usage of task.
+        """
+        waited = loop.create_future()
+        
+        def resolve(result):
+            if not waited.done():
+                waited.set_result(result)
+        
+        def wait():
+            _, status, rusage = os.wait4(task.pid, 0)
+            try:
+                loop.call_soon_threadsafe(resolve, (status, rusage))
+            except RuntimeError:
+                pass
+        
+        threading.Thread(target=wait, daemon=True).start()
+        return waited
+    
+    @staticmethod
+    def usage(rusage):
+        """
+        returns the user and system cpu seconds and the peak rss in bytes of a resource usage from os.wait4.
+        """
+        return {'user': rusage.ru_utime, 'system': rusage.ru_stime, 'maxrss': rusage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)}
     
-    def compile_kernel(self, cmd, env=os.environ):
+    @staticmethod
+    def decode(output):
         """
-        Executes compilation in a subprocess with the environment specified in env.
+        returns the bytes a compiler wrote as text with CRLF line endings translated to LF, like a text mode pipe would.
         """
-        task = subprocess.run(cmd, env=env, capture_output=True, text=True)
-        return (task.returncode, task.stdout, task.stderr)
+        return output.decode(errors='replace').replace('\r\n', '\n')
     
-    async def async_compile_kernel(self, cmd):
-        task = await asyncio.create_subprocess_shell(cmd, stderr=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE)
-        stdout, stderr = await task.communicate()
-        return (task.returncode, stdout.decode(), stderr.decode())
+    @staticmethod
+    def kill(process):
+        """
+        Kill process together with the compiler drivers and tools it started, ignoring processes that already exited.
+        """
+        try:
+            if hasattr(os, 'killpg'):
+                os.killpg(process.pid, signal.SIGKILL)
+            else:
+                process.kill()
+        except (ProcessLookupError, PermissionError):
+            pass
     
     @staticmethod
     def safe(path):
@@ -55,81 +269,285 @@ class gnu:
         """
         return f'"{path.as_posix()}"'
     
-    def asm_command(self, file, strcallback=str):
+    @staticmethod
+    def stems(files):
+        """
+        Map each file to the stem of its outputs. Files sharing a stem from different directories get a hash of their directory appended so their outputs don't overwrite each other.
+        """
+        dirs = dict()
+        for file in files:
+            dirs.setdefault(file.stem, set()).add(file.resolve().parent)
+        stems = dict()
+        for file in files:
+            stems[file] = file.stem
+            if len(dirs[file.stem]) > 1:
+                stems[file] += '_' + hashlib.sha1(file.resolve().parent.as_posix().encode()).hexdigest()[:8]
+        return stems
+    
+    @staticmethod
+    def depfile(nfile):
+        """
+        returns the path of the depfile written next to the output nfile when depfiles are enabled.
+        """
+        return nfile.with_name(nfile.stem + '.d')
+    
+    def asm_command(self, file, strcallback=str, stem=None):
         """
         Creates a compiler command that stops at the asm output stage with input files, includes, target output, and options.
         returns pathlib paths to the future output file(s) and a list of command arguments.
-        Raises AssertionError if files contains 0 elements.
+        stem overrides the output name, see gnu.stems().
         """
+        frozen = self.freeze()
         inputs = [strcallback(file.resolve())]
-        asmfile = (self.builddir / self.name / 'asm' / file.stem).with_suffix('.s')
+        asmfile = self.builddir / self.name / 'asm' / ((stem or file.stem) + '.s')
         outputs = ['-o'] + [strcallback(asmfile)]
-        includes = []
-        if len(self.includes) != 0:
-            includes += ['-I' + gnu.safe(include) for include in self.includes]
+        includes = self.pch_args(strcallback) + frozen.splice('includes')
         
-        options = list(self.options)
+        depfile = ['-MMD', '-MF', strcallback(gnu.depfile(asmfile))] if self.depfiles else []
         
-        return (asmfile, [self.path.name, '-S'] + inputs + includes + outputs + options)
+        return (asmfile, [self.path.name, '-S'] + inputs + includes + outputs + depfile + frozen.splice('options', 'lto', 'diagnostics'))
     
-    def obj_command(self, file, strcallback=str):
+    def obj_command(self, file, strcallback=str, stem=None):
         """
         Creates a compiler command that stops at the obj output stage with input files, includes, target output, and options.
         returns pathlib paths to the future output file(s) and a list of command arguments.
-        Raises AssertionError if files contains 0 elements.
+        stem overrides the output name, see gnu.stems().
         """
-        inputs = [strcallback(file)]
-        objfile = (self.builddir / self.name / 'obj' / file.stem).with_suffix('.obj')
+        frozen = self.freeze()
+        inputs = [strcallback(file.resolve())]
+        objfile = self.builddir / self.name / 'obj' / ((stem or file.stem) + '.obj')
         outputs = ['-o'] + [strcallback(objfile)]
-        includes = []
-        if len(self.includes) != 0 and not self.outasm:
-            includes += ['-I' + gnu.safe(include) for include in self.includes]
+        includes = [] if self.outasm else self.pch_args(strcallback) + frozen.splice('includes')
+        
+        depfile = ['-MMD', '-MF', strcallback(gnu.depfile(objfile))] if self.depfiles and not self.outasm else []
         
-        options = list(self.options)
+        lto = [] if self.outasm else frozen.splice('lto')
         
-        return (objfile, [self.path.name, '-c'] + inputs + includes + outputs + options)
+        return (objfile, [self.path.name, '-c'] + inputs + includes + outputs + depfile + frozen.splice('options') + lto + frozen.splice('diagnostics'))
 
+    def fused_command(self, file, strcallback=str, stem=None):
+        """
+        Creates a compiler command that outputs both the asm and the obj of file in one invocation, keeping the assembly it
+        compiles with -save-temps in the asm directory, see gnu.setfused(). The preprocessed file kept next to it is removed afterwards.
+        returns pathlib paths to the future asm and obj files and a list of command arguments.
+        """
+        frozen = self.freeze()
+        inputs = [strcallback(file.resolve())]
+        asmfile = self.builddir / self.name / 'asm' / ((stem or file.stem) + '.s')
+        objfile = self.builddir / self.name / 'obj' / ((stem or file.stem) + '.obj')
+        outputs = ['-o', strcallback(objfile), '-save-temps', '-dumpdir', strcallback(asmfile.parent) + '/', '-dumpbase', asmfile.stem]
+        includes = self.pch_args(strcallback) + frozen.splice('includes')
+        
+        depfile = ['-MMD', '-MF', strcallback(gnu.depfile(objfile))] if self.depfiles else []
+        
+        return (asmfile, objfile, [self.path.name, '-c'] + inputs + includes + outputs + depfile + frozen.splice('options', 'lto', 'diagnostics'))
+    
+    def fusing(self):
+        """
+        returns whether the asm and obj stages run as one invocation, see gnu.setfused().
+        """
+        return bool(self.fused and self.outasm and self.outobj and self.cache is None and self.remote is None)
+    
+    def fuse(self, asmfile, nfile, ran):
+        """
+        Remove the preprocessed file a fused invocation kept next to asmfile. A missing asmfile makes nfile stale so both are rebuilt.
+        """
+        if ran:
+            asmfile.with_suffix('.ii').unlink(missing_ok=True)
+        elif not asmfile.exists() and nfile.exists():
+            os.unlink(nfile)
+    
+    def preprocess_command(self, file, strcallback=str, output=None):
+        """
+        Creates a compiler command that writes the preprocessed file to stdout with includes and options, used to key the cache
+        and as the TU sent to remote workers. If output is given the depfile of output is written along the way.
+        returns a list of command arguments.
+        """
+        frozen = self.freeze()
+        depfile = ['-MMD', '-MF', strcallback(gnu.depfile(output)), '-MT', strcallback(output)] if output is not None else []
+        return [self.path.name, '-E', strcallback(file.resolve())] + self.pch_args(strcallback) + frozen.splice('includes', 'options') + depfile
+    
+    def analyze_command(self, file, strcallback=str):
+        """
+        Creates a compiler command that only parses file with includes and options and reports its include tree and time spent, see gnu.analyze().
+        returns a list of command arguments.
+        """
+        return [self.path.name, '-fsyntax-only', '-H', '-ftime-report', strcallback(file.resolve())] + self.freeze().splice('includes', 'options')
+    
+    def pch_args(self, strcallback=str):
+        """
+        returns the arguments that force include the precompiled stub of self.pch, or an empty list if there is none.
+        """
+        if self.pch is None:
+            return []
+        return ['-include', strcallback(self.builddir / self.name / 'pch' / self.pch.name)]
+    
+    def pch_command(self, strcallback=str):
+        """
+        Creates a compiler command that precompiles the stub of self.pch in builddir/name/pch with includes and options.
+        returns pathlib paths to the future .gch file and a list of command arguments.
+        """
+        stub = self.builddir / self.name / 'pch' / self.pch.name
+        gch = stub.with_name(stub.name + '.gch')
+        frozen = self.freeze()
+        outputs = ['-o', strcallback(gch), '-MMD', '-MF', strcallback(gnu.depfile(gch))]
+        return (gch, [self.path.name, '-x', 'c++-header', strcallback(stub)] + frozen.splice('includes') + outputs + frozen.splice('options', 'lto', 'diagnostics'))
+    
     def final_command(self, files, strcallback=str):
         """
         Creates a compiler command with input files, includes, target output, options, libpaths, libs and the static option.
         returns pathlib paths to the future output file(s) and a list of command arguments.
         Raises AssertionError if files contains 0 elements.
         """
+        frozen = self.freeze()
         inputs = [strcallback(file) for file in files]
         outfile = self.builddir / self.target
         output = ['-o', strcallback(outfile)]
         
-        includes = []
-        if len(self.includes) != 0 and not (self.outasm or self.outobj):
-            includes += ['-I' + gnu.safe(include) for include in self.includes]
-        
-        options = list(self.options)
+        includes = [] if self.outasm or self.outobj else frozen.splice('includes')
         
-        libpaths = []
-        if len(self.libpaths) != 0:
-            libpaths += ['-L' + gnu.safe(libpath) for libpath in self.libpaths]
-        
-        libs = []
-        if len(self.libs) != 0:
-            libs += ['-l' + lib for lib in self.libs]
-        
-        static = ['-static'] if self.static else []
-        
-        return (outfile, [self.path.name] + inputs + includes + output + options + libpaths + libs + static)
+        return (outfile, [self.path.name] + inputs + includes + output + frozen.splice('options', 'ltolink', 'libpaths', 'libs', 'static'))
     
-    def create_env(self):
+    def archive_path(self):
         """
-        Prepends the compilers parent directory to path on a copy of the systems environment variables.
+        returns the path to the static library of the archive stage, builddir/lib<target>.a, so -l<target> finds it, see gnu.uselib().
         """
-        env = os.environ 
-        env['PATH'] = str(self.path.parent.resolve()) + os.pathsep + os.environ['PATH']
-        return env
+        return self.builddir / ('lib' + self.target + '.a')
     
-    def create_prefix(self):
+    def list_command(self):
         """
-        Create a prefex to prepend to commands to set the e
+        Creates the archiver command that lists the members of the archive, see gnu.archive_commands().
+        returns a list of command arguments.
         """
-        return 'cd ' + gnu.safe(self.path.parent) + ' && '
+        return [str(self.archivers()[0]), 't', str(self.archive_path())]
+    
+    def archive_commands(self, files, listed=None):
+        """
+        Creates the archiver commands that bring the archive up to date with the object files in files: members whose objects are
+        newer than the archive or missing from it are replaced, members without an object are deleted and the index is rewritten.
+        An archive of the other kind (thin or not) is removed first, as ar can't convert between them.
+        returns pathlib paths to the future archive, the command that would create it from scratch, used to check whether it is
+        up to date, and the list of commands to run. listed is the [returncode, stdout, stderr] result of gnu.list_command(),
+        which is run here if it isn't given and the archive exists.
+        Raises AssertionError if the obj stage is disabled.
+        """
+        assert self.outobj, f'gnu.archive_commands(). the archive stage needs the obj stage. stages were [{self.outasm}, {self.outobj}, {self.outfinal}].'
+        archive = self.archive_path()
+        ar, _ = self.archivers()
+        flags = 'rcsT' if self.archive['thin'] else 'rcs'
+        command = [str(ar), flags, str(archive)] + [str(file) for file in files]
+        try:
+            with open(archive, 'rb') as handle:
+                magic = handle.read(8)
+            if magic != (b'!<thin>\n' if self.archive['thin'] else b'!<arch>\n'):
+                os.unlink(archive)
+        except OSError:
+            pass
+        if not archive.exists():
+            return (archive, command, [command])
+        ret, stdout, _ = listed if listed is not None else self.compile_kernel(self.list_command(), cwd=archive.parent)
+        members = {pathlib.Path(member).name: member for member in stdout.splitlines()} if ret == 0 else dict()
+        mtime = os.stat(archive).st_mtime_ns
+        changed = [str(file) for file in files if file.name not in members or os.stat(file).st_mtime_ns > mtime]
+        names = {file.name for file in files}
+        removed = [member for name, member in members.items() if name not in names]
+        commands = [[str(ar), 'd', str(archive)] + removed] if removed else []
+        return (archive, command, commands + [[str(ar), flags, str(archive)] + changed])
+    
+    def freeze(self):
+        """
+        Freeze the configuration into an opifex.snapshot with the include, option, libpath, lib and static fragments rendered in sorted order.
+        The snapshot is kept until an add*, discard* or set* call changes the configuration, so commands only splice its fragments.
+        snapshot.fingerprint identifies the configuration for keying caches and manifests. Settings that don't change the outputs,
+        like jobs, the failure policy or profiling, are kept in snapshot.runtime and left out of the fingerprint.
+        """
+        if self.frozen is None:
+            self.frozen = snapshot({
+                'includes': ['-I' + include.as_posix() for include in sorted(self.includes)],
+                'options': sorted(self.options),
+                'libpaths': ['-L' + libpath.as_posix() for libpath in sorted(self.libpaths)],
+                'libs': ['-l' + lib for lib in sorted(self.libs)],
+                'static': ['-static'] if self.static else [],
+                'lto': [] if self.lto is None else ['-flto'],
+                'ltolink': [] if self.lto is None else gnu.lto_args(**self.lto),
+                'diagnostics': ['-fdiagnostics-format=json'] if self.diagnostics else []
+            }, {
+                'path': self.path.as_posix(),
+                'name': self.name,
+                'target': self.target,
+                'builddir': pathlib.Path(self.builddir).as_posix(),
+                'stages': (self.outasm, self.outobj, self.outfinal),
+                'depfiles': self.depfiles,
+                'pch': None if self.pch is None else self.pch.as_posix(),
+                'fused': self.fused,
+                'diagnostics': self.diagnostics,
+                'unity': self.unity,
+                'lto': self.lto,
+                'archive': self.archive,
+                'archives': sorted(archive.as_posix() for archive in self.archives)
+            }, {
+                'jobs': self.jobs,
+                'incremental': (self.incremental, self.hashing),
+                'cache': None if self.cache is None else self.cache.path.as_posix(),
+                'remote': None if self.remote is None else [(target['host'], target['port'], target['slots']) for target in self.remote.workers],
+                'policy': self.policy,
+                'jobserver': self.jobserver,
+                'memory': self.memory,
+                'schedule': self.scheduling,
+                'sink': self.sink,
+                'profile': self.profiling
+            })
+        return self.frozen
+    
+    @staticmethod
+    def lto_args(jobs=None, partition=None):
+        """
+        returns the link arguments of an lto mode: -flto for a full serial link or -flto=jobs (auto or a number) for parallel partitions,
+        followed by -flto-partition=partition if given.
+        """
+        return ['-flto' if jobs is None else f'-flto={jobs}'] + ([] if partition is None else [f'-flto-partition={partition}'])
+    
+    def tool(self, name):
+        """
+        returns the path to the binutils or gcc tool name that goes with the compiler: the one next to it with the same target prefix and
+        version suffix (x86_64-w64-mingw32-g++-12 gives x86_64-w64-mingw32-gcc-ar-12), without the suffix, or the first name on path.
+        """
+        driver = self.path.name
+        candidates = []
+        for compiler in ('g++', 'gcc', 'c++'):
+            if compiler in driver:
+                prefix, suffix = driver.split(compiler, 1)
+                candidates += [self.path.with_name(prefix + name + suffix), self.path.with_name(prefix + name + self.path.suffix)]
+                break
+        candidates.append(self.path.with_name(name + self.path.suffix))
+        found = next((candidate for candidate in candidates if candidate.is_file()), None) or shutil.which(name)
+        return pathlib.Path(found or name)
+    
+    def archivers(self):
+        """
+        returns the paths to the archiver and ranlib for static libraries. With lto these are gcc-ar and gcc-ranlib, which load the lto plugin
+        so the archive index lists the symbols of the lto objects, see gnu.setlto().
+        """
+        if self.lto is not None:
+            return (self.tool('gcc-ar'), self.tool('gcc-ranlib'))
+        return (self.tool('ar'), self.tool('ranlib'))
+    
+    def create_jobserver(self):
+        """
+        returns the jobserver of the make that started this process if there is one, otherwise a new one for self.jobs jobs,
+        or None if the jobserver is disabled, see gnu.setjobserver().
+        """
+        if not self.jobserver:
+            return None
+        return jobserver.client() or jobserver.server(self.jobs)
+    
+    def create_env(self):
+        """
+        Prepends the compilers parent directory to path on a copy of the systems environment variables, leaving os.environ as is.
+        """
+        env = os.environ.copy()
+        env['PATH'] = str(self.path.parent.resolve()) + os.pathsep + env.get('PATH', '')
+        return env
     
     def makedirs(self, asm, obj):
         """
@@ -143,82 +561,944 @@ class gnu:
             os.makedirs(self.builddir / self.name / 'obj', exist_ok=True)
         return self
     
-    async def async_compile(self, files):
+    def unity_sources(self, files):
         """
-        Run compiler concurrently, with internal configuration and files as input and return the path(s) to the output files in builddir.
+        Group files, sorted by path, into aggregate sources builddir/name/unity/unity_<n>.cpp that include up to self.unity['batch'] files
+        and up to self.unity['budget'] bytes of source each. An aggregate is only rewritten when its members change, so it stays up to date for incremental builds.
+        returns the aggregates followed by the excluded files and a dict from each aggregate to its members.
         """
-        self.makedirs(self.outasm, self.outobj)
-        env = self.create_env()
-        logs = {
-            'asm': dict(),
-            'obj': dict(),
-            'final': []
+        unitydir = self.builddir / self.name / 'unity'
+        os.makedirs(unitydir, exist_ok=True)
+        exclude = {pathlib.Path(file).resolve() for file in self.unity['exclude']}
+        batches = [[]]
+        size = 0
+        excluded = []
+        for file in sorted(files, key=lambda file: file.resolve().as_posix()):
+            if file.resolve() in exclude:
+                excluded.append(file)
+                continue
+            filesize = os.path.getsize(file)
+            if batches[-1] and (len(batches[-1]) == self.unity['batch'] or (self.unity['budget'] is not None and size + filesize > self.unity['budget'])):
+                batches.append([])
+                size = 0
+            batches[-1].append(file)
+            size += filesize
+        members = dict()
+        for n, batch in enumerate(batch for batch in batches if batch):
+            aggregate = unitydir / f'unity_{n}.cpp'
+            text = ''.join(f'#include "{file.resolve().as_posix()}"\n' for file in batch)
+            if not aggregate.is_file() or aggregate.read_text() != text:
+                aggregate.write_text(text)
+            members[aggregate] = batch
+        for stale in unitydir.glob('unity_*.cpp'):
+            if stale not in members:
+                os.unlink(stale)
+        return (list(members) + excluded, members)
+    
+    def create_build(self, files):
+        """
+        Create the state shared by the files of a single compile: the logs, the output stem of each file, the manifest if incremental
+        and the depfile index together with the outputs whose headers changed since they were built if depfiles are enabled.
+        """
+        build = {
+            'logs': {
+                'asm': dict(),
+                'obj': dict(),
+                'final': [],
+                'rebuilt': [],
+                'uptodate': [],
+                'policy': {'policy': self.policy, 'completed': 0, 'failed': 0, 'cancelled': 0, 'skipped': 0}
+            },
+            'stems': gnu.stems(files),
+            'members': dict(),
+            'manifest': manifest(self.builddir / self.name / 'manifest.json', self.hashing) if self.incremental else None,
+            'depindex': depindex(self.builddir / self.name / 'depindex.json') if self.depfiles else None
         }
-        prefix = self.create_prefix()
-        failed = False
-        nfiles = []
-        for file in files:
-            if self.outasm and not failed:
-                nfile, command = self.asm_command(file, gnu.safe)
-                ret, stdout, stderr = await self.async_compile_kernel(prefix + ' '.join(command))
-                failed = False if ret == 0 else True
-                logs['asm'][file] = [ret, stdout, stderr]
-                if self.outobj:
-                    file = nfile
-                else:
-                    nfiles.append(nfile)
-            if self.outobj and not failed:
-                nfile, command = self.obj_command(file, gnu.safe)
-                ret, stdout, stderr = await self.async_compile_kernel(prefix + ' '.join(command))
-                failed = False if ret == 0 else True
-                logs['obj'][file] = [ret, stdout, stderr]
-                nfiles.append(nfile)
+        build['env'] = self.create_env()
+        build['cwd'] = pathlib.Path.cwd()
+        build['jobserver'] = self.create_jobserver()
+        if build['jobserver'] is not None:
+            build['env']['MAKEFLAGS'] = build['jobserver'].makeflags(build['env'].get('MAKEFLAGS'))
+            build['logs']['jobserver'] = 'client' if build['jobserver'].path is not None or not build['jobserver'].owned else 'server'
+        build['pchinputs'] = []
+        build['compiletime'] = 0.0
+        build['compiled'] = 0
+        build['sources'] = dict()
+        build['durations'] = dict()
+        build['stale'] = build['depindex'].stale() if build['manifest'] is not None and build['depindex'] is not None else set()
+        build['profile'] = build['logs']['profile'] = profile() if self.profiling else None
+        build['diagnostics'] = build['logs']['diagnostics'] = diagnostics() if self.diagnostics else None
+        build['memory'] = memory(self.builddir / self.name / 'history.json', **self.memory) if self.memory is not None else None
+        build['schedule'] = schedule(self.builddir / self.name / 'durations.json') if self.scheduling else None
+        if self.remote is not None:
+            build['logs']['remote'] = {'remote': 0, 'local': 0}
+        if self.cache is not None:
+            build['identity'] = self.identity()
+            build['cached'] = (self.cache.hits, self.cache.misses)
+        return build
+    
+    def pending_pch(self, build, strcallback=str):
+        """
+        Write the stub header that includes self.pch by absolute path and check whether its .gch is up to date with the header, its includes and the command.
+        The stub is only rewritten when its contents change, so it never invalidates the .gch by itself.
+        returns the command to build the .gch or None if it is up to date.
+        """
+        pchdir = self.builddir / self.name / 'pch'
+        os.makedirs(pchdir, exist_ok=True)
+        stub = pchdir / self.pch.name
+        text = f'#include "{self.pch.resolve().as_posix()}"\n'
+        if not stub.is_file() or stub.read_text() != text:
+            stub.write_text(text)
+        gch, command = self.pch_command(strcallback)
+        build['pchmanifest'] = manifest(pchdir / 'manifest.json', self.hashing)
+        entry = build['pchmanifest'].entries.get(str(gch))
+        inputs = list(entry['inputs']) if entry is not None else [stub]
+        build['logs']['pch'] = {'gch': gch, 'built': False, 'result': [0, '', ''], 'time': 0.0, 'saved': None}
+        build['pchinputs'] = [gch]
+        return None if build['pchmanifest'].uptodate(gch, inputs, command) else command
+    
+    def record_pch(self, build, command, result, elapsed):
+        """
+        Log the result of building the .gch and record it in the pch manifest with the dependencies from its depfile.
+        returns whether the .gch was built successfully.
+        """
+        gch = build['logs']['pch']['gch']
+        build['logs']['pch'].update({'built': True, 'result': result, 'time': elapsed})
+        if result[0] == 0:
+            _, deps = depindex.parse(gnu.depfile(gch).read_text())
+            build['pchmanifest'].record(gch, deps, command)
+        else:
+            build['pchmanifest'].discard(gch)
+        build['pchmanifest'].save()
+        return result[0] == 0
+    
+    def record_times(self, build):
+        """
+        Persist the mean compile time per file of this compile in builddir/name/times.json, separately for compiles with and without a pch.
+        When compiling with a pch the time saved relative to the last compile without one is reported in logs['pch']['saved'].
+        """
+        if build['compiled'] == 0:
+            return self
+        path = self.builddir / self.name / 'times.json'
+        try:
+            times = json.loads(path.read_text())
+        except (OSError, ValueError):
+            times = dict()
+        mean = build['compiletime'] / build['compiled']
+        if self.pch is not None and 'nopch' in times and 'pch' in build['logs']:
+            build['logs']['pch']['saved'] = (times['nopch'] - mean) * build['compiled'] - build['logs']['pch']['time']
+        times['pch' if self.pch is not None else 'nopch'] = mean
+        persist.write(path, times)
+        return self
+    
+    def finish_build(self, build):
+        """
+        Persist the manifest, depfile index and cache counters of build and report the cache hits and misses of this compile in its logs.
+        """
+        if build['jobserver'] is not None:
+            build['jobserver'].close()
+        if self.remote is not None:
+            build['logs']['remote']['workers'] = self.remote.report()
+        if build['schedule'] is not None:
+            build['schedule'].save()
+        if build['memory'] is not None:
+            build['memory'].save()
+            build['logs']['memory'] = {'throttled': build['memory'].throttled}
+        if build['manifest'] is not None:
+            build['manifest'].save()
+        if build['depindex'] is not None:
+            build['depindex'].save()
+        self.record_times(build)
+        if self.cache is not None:
+            build['logs']['cache'] = {'hits': self.cache.hits - build['cached'][0], 'misses': self.cache.misses - build['cached'][1]}
+            self.cache.save()
+        return build['logs']
+    
+    def record_link(self, build, ran, elapsed):
+        """
+        Report the lto mode and the wall time of the final stage in logs['lto'] if lto is enabled. With lto the link runs the optimizer,
+        so it usually dominates the build and is kept apart from the compile times. link is None if the final stage was up to date.
+        """
+        if self.lto is not None:
+            build['logs']['lto'] = {'args': gnu.lto_args(**self.lto), 'link': elapsed if ran else None}
+    
+    def identity(self):
+        """
+        returns a string identifying the compiler binary by its resolved path, mtime and size, used to key the cache, see probe.identity().
+        """
+        return self.probe.identity()
+    
+    def unstub(self, content):
+        """
+        returns the preprocessed content with the path of the precompiled header stub in its line markers replaced by pch/ and the
+        name of the header, so the cache key doesn't depend on builddir or the toolchain name. The header itself is in content either way.
+        """
+        if self.pch is None:
+            return content
+        stub = self.builddir / self.name / 'pch' / self.pch.name
+        for path in {str(stub), stub.as_posix()}:
+            old, new = '"' + path.replace('\\', '\\\\') + '"', f'"pch/{self.pch.name}"'
+            content = content.replace(old.encode(), new.encode()) if isinstance(content, bytes) else content.replace(old, new)
+        return content
+    
+    def restore(self, build, nfile, file, command, content):
+        """
+        Look up the output of compiling the preprocessed or assembly content of file with command in the cache and restore it to nfile.
+        returns the cache key and the cached [returncode, stdout, stderr] result or None on a miss.
+        """
+        key = cache.key(build['identity'], cache.normalize(command, {str(file.resolve())}), self.unstub(content))
+        result = self.cache.fetch(key, nfile, gnu.depfile(nfile) if '-MMD' in command else None)
+        if result is None and nfile.exists():
+            os.unlink(nfile)
+        return (key, result)
+    
+    def store(self, build, key, nfile, command, result):
+        """
+        Store nfile and its result in the cache under key, along with the dependencies from its depfile.
+        """
+        deps = None
+        if '-MMD' in command and gnu.depfile(nfile).exists():
+            _, deps = depindex.parse(gnu.depfile(nfile).read_text())
+        self.cache.store(key, nfile, [result[0], str(result[1]), str(result[2])], deps)
+    
+    def uptodate(self, build, nfile, inputs, command):
+        """
+        returns True if incremental and nfile was last built from unchanged inputs with the same command.
+        """
+        return build['manifest'] is not None and str(nfile) not in build['stale'] and build['manifest'].uptodate(nfile, inputs, command)
+    
+    def record(self, build, nfile, inputs, command, ret):
+        """
+        Record or forget nfile in the manifest depending on the return code of the stage that built it and index its depfile.
+        """
+        if build['depindex'] is not None and ret == 0 and '-MMD' in command:
+            build['depindex'].update(gnu.depfile(nfile), nfile)
+        if build['manifest'] is not None:
+            if ret == 0:
+                build['manifest'].record(nfile, inputs, command)
+            else:
+                build['manifest'].discard(nfile)
+    
+    def offloaded(self, build, stage, file, start, result):
+        """
+        Count the compile of file on a remote worker, or the fallback to compiling it locally if result is None, and profile it.
+        returns result.
+        """
+        build['logs']['remote']['local' if result is None else 'remote'] += 1
+        if result is not None:
+            self.profiled(build, stage, file, start, None)
+        return result
+    
+    async def async_offload(self, build, stage, file, nfile, source, command, content):
+        """
+        Compile content, the preprocessed TU or assembly of source, with command on a remote worker into nfile, see opifex.remote.
+        returns the [returncode, stdout, stderr] result or None if no worker could compile it.
+        """
+        start = time.perf_counter()
+        return self.offloaded(build, stage, file, start, await self.remote.async_compile(command, source, content, nfile))
+    
+    def offload(self, build, stage, file, nfile, source, command, content):
+        """
+        Compile content on a remote worker like gnu.async_offload().
+        """
+        start = time.perf_counter()
+        return self.offloaded(build, stage, file, start, self.remote.compile(command, source, content, nfile))
+    
+    def accounting(self, build):
+        """
+        returns the dict a kernel fills with the start, cpu time and peak rss of its process if build is profiled, tracks memory,
+        is scheduled or waits for jobserver tokens, otherwise None.
+        """
+        needed = (build['profile'], build['memory'], build['schedule'], build['jobserver'])
+        return dict() if any(need is not None for need in needed) else None
+    
+    def profiled(self, build, stage, file, start, usage):
+        """
+        Add the invocation of stage on file to the profile of build, if any, its time to the duration of the source it was compiled from,
+        see gnu.scheduled(), and for the stages of a unit its peak rss to the memory history under that source, which units are admitted by. The invocation started at usage['start'] where the kernel
+        filled it in, so the wait for a jobserver token isn't counted, otherwise at start.
+        returns the seconds the invocation took.
+        """
+        start, end = (usage or dict()).get('start', start), time.perf_counter()
+        source = build['sources'].get(file, file)
+        if build['profile'] is not None:
+            build['profile'].add(stage, file, start, end, usage)
+        if build['memory'] is not None and stage not in ('pch', 'archive', 'final') and usage and usage.get('maxrss'):
+            build['memory'].observe(source, usage['maxrss'])
+        build['durations'][source] = build['durations'].get(source, 0.0) + end - start
+        return end - start
+    
+    def scheduled(self, build, file, rebuilt):
+        """
+        Record the time the invocations that compiled file took in the schedule of build, if any, unless it was up to date.
+        """
+        if build['schedule'] is not None and rebuilt:
+            build['schedule'].record(file, build['durations'].get(file, 0.0), build['members'].get(file, []))
+    
+    def emit(self, build, stage, file, nfile, result, ran):
+        """
+        Log the result of a stage of the async compile and emit it as a 'stage' event, see gnu.stream_compile().
+        """
+        if stage in ('final', 'archive'):
+            build['logs'][stage] = result
+        elif stage != 'pch':
+            build['logs'][stage][file] = result
+        build['emit']({'kind': 'stage', 'stage': stage, 'file': file, 'output': nfile, 'result': result, 'built': ran})
+    
+    def diagnose(self, build, unit, result):
+        """
+        Add the json diagnostics in the stderr of result to the diagnostics of build, if any, as printed by the compile of unit.
+        returns result with the stderr reduced to the text outside the json, unless it is an opifex.sink which keeps the file.
+        """
+        if build['diagnostics'] is None:
+            return result
+        rest = build['diagnostics'].add(unit, str(result[2]), build['cwd'])
+        return result if isinstance(result[2], sink) else [result[0], result[1], rest]
+    
+    def capture(self, build, stage, file):
+        """
+        returns the opened opifex.sink pair the stdout and stderr of stage on file are written to in builddir/name/logs,
+        or None if output is kept in memory or streamed as lines, see gnu.setsink().
+        """
+        if self.sink is None or build.get('lines'):
+            return None
+        name = build['stems'].get(file, pathlib.Path(file).stem) + '.' + stage
+        return [sink(self.builddir / self.name / 'logs' / f'{name}.{stream}', **self.sink).open() for stream in ('stdout', 'stderr')]
+    
+    def captured(self, result, sinks):
+        """
+        returns the [returncode, stdout, stderr] result of a kernel with the output replaced by sinks once they are closed, if any.
+        """
+        result = list(result)
+        if sinks is not None:
+            result[1:] = [capture.close() for capture in sinks]
+        return result
+    
+    async def async_captured(self, kernel, sinks):
+        """
+        returns the result of awaiting the async kernel like gnu.captured() does, closing sinks as well if the kernel raises or is cancelled.
+        """
+        try:
+            result = await kernel
+        except BaseException:
+            for capture in sinks or ():
+                capture.close()
+            raise
+        return self.captured(result, sinks)
+    
+    def callback(self, build, stage, file):
+        """
+        returns a kernel callback that emits each line of compiler output as a 'line' event if build streams lines, otherwise None.
+        """
+        if not build['lines']:
+            return None
+        return lambda stream, line: build['emit']({'kind': 'line', 'stage': stage, 'file': file, 'stream': stream, 'line': line})
+    
+    async def async_compile_stage(self, build, stage, file, nfile, inputs, command, cached=False):
+        """
+        Run a single stage of the async compile unless its output is up to date or, if cached, can be restored from the cache.
+        stage and file label the lines the kernel emits and the profile records of its invocations. The preprocessor run to key the cache
+        or the remote is killed by fail_fast like the compiler, which cancels the stage.
+        returns the [returncode, stdout, stderr] result and whether the output was (re)built.
+        """
+        if self.uptodate(build, nfile, inputs, command):
+            return ([0, '', ''], False)
+        key = None
+        if cached and (self.cache is not None or self.remote is not None):
+            source = inputs[0]
+            content = None
+            if source.suffix == '.s':
+                content = source.read_bytes()
+            else:
+                start, usage = time.perf_counter(), self.accounting(build)
+                ret, stdout, stderr = await self.async_compile_kernel(self.preprocess_command(source, output=nfile if self.remote is not None and '-MMD' in command else None), processes=build['processes'], usage=usage, env=build['env'], cwd=build['cwd'], tokens=build['jobserver'])
+                self.profiled(build, 'preprocess', file, start, usage)
+                if ret != 0 and build['cancelled'].is_set():
+                    return ([ret, '', stderr], True)
+                content = stdout if ret == 0 else None
+            if content is not None and self.cache is not None:
+                key, result = self.restore(build, nfile, source, command, content)
+                if result is not None:
+                    self.record(build, nfile, inputs, command, result[0])
+                    return (result, True)
+            if content is not None and self.remote is not None:
+                result = await self.async_offload(build, stage, file, nfile, source, command, content)
+                if result is not None:
+                    self.record(build, nfile, inputs, command, result[0])
+                    if key is not None:
+                        self.store(build, key, nfile, command, result)
+                    return (result, True)
+        start, usage = time.perf_counter(), self.accounting(build)
+        sinks = self.capture(build, stage, file)
+        result = await self.async_captured(self.async_compile_kernel(command, self.callback(build, stage, file), build['processes'], usage, build['env'], build['cwd'], build['jobserver'], sinks), sinks)
+        elapsed = self.profiled(build, stage, file, start, usage)
+        if cached and inputs[0].suffix != '.s':
+            build['compiletime'] += elapsed
+            build['compiled'] += 1
+        self.record(build, nfile, inputs, command, result[0])
+        if key is not None:
+            self.store(build, key, nfile, command, result)
+        return (result, True)
+    
+    def proceed(self, build):
+        """
+        returns whether another file of the async compile may start a stage under the failure policy, see gnu.setpolicy().
+        """
+        return self.policy == 'keep_going' or not build['failed'].is_set()
+    
+    def settle(self, build, nfile, result):
+        """
+        Classify the result of a stage of the async compile as 'completed', 'failed' or 'cancelled'.
+        The first failure under the fail_fast policy kills every running compiler, whose partial outputs are then removed.
+        """
+        if result[0] == 0:
+            return 'completed'
+        if build['cancelled'].is_set():
+            for path in [nfile, gnu.depfile(nfile)]:
+                if path.exists():
+                    os.unlink(path)
+            return 'cancelled'
+        build['failed'].set()
+        if self.policy == 'fail_fast':
+            build['cancelled'].set()
+            for process in list(build['processes']):
+                gnu.kill(process)
+        return 'failed'
+    
+    async def async_archive_stage(self, build, files):
+        """
+        Run the archive stage of the async compile over the object files in files unless the archive is up to date, see gnu.archive_commands().
+        returns the path to the archive, the [returncode, stdout, stderr] result of the last command and whether the archive was (re)built.
+        """
+        archive = self.archive_path()
+        listed = await self.async_compile_kernel(self.list_command(), cwd=archive.parent) if self.outobj and archive.exists() else None
+        archive, command, commands = self.archive_commands(files, listed)
+        if self.uptodate(build, archive, files, command):
+            return (archive, [0, '', ''], False)
+        for step in commands:
+            start, usage = time.perf_counter(), self.accounting(build)
+            sinks = self.capture(build, 'archive', archive)
+            result = await self.async_captured(self.async_compile_kernel(step, self.callback(build, 'archive', archive), build['processes'], usage, build['env'], build['cwd'], build['jobserver'], sinks), sinks)
+            self.profiled(build, 'archive', archive, start, usage)
+            if result[0] != 0:
+                break
+        self.record(build, archive, files, command, result[0])
+        return (archive, result, True)
+    
+    async def async_compile_unit(self, file, build):
+        """
+        Run the asm and obj stages of a single file with the async kernel and record their results in the logs of build.
+        build['failed'] is an asyncio.Event shared between the files of a compile that a failing stage sets, see gnu.proceed() and gnu.settle().
+        When memory is tracked the file waits until it fits in the available memory, see gnu.setmemory().
+        returns the path to the output file of the last stage that ran or None.
+        """
+        if build['memory'] is None:
+            return await self.async_compile_stages(file, build)
+        await build['memory'].admit(file)
+        try:
+            return await self.async_compile_stages(file, build)
+        finally:
+            build['memory'].release(file)
+    
+    async def async_compile_stages(self, file, build):
+        """
+        Run the stages of gnu.async_compile_unit().
+        """
+        source = file
+        stem = build['stems'][file]
+        nfile = None
+        rebuilt = False
+        status = 'skipped'
+        if self.fusing() and self.proceed(build):
+            asmfile, nfile, command = self.fused_command(file, stem=stem)
+            inputs = [file] + build['members'].get(file, []) + build['pchinputs']
+            self.fuse(asmfile, nfile, False)
+            result, ran = await self.async_compile_stage(build, 'obj', file, nfile, inputs, command, True)
+            result = self.diagnose(build, source, result)
+            self.fuse(asmfile, nfile, ran)
+            self.emit(build, 'asm', file, asmfile, result, ran)
+            self.emit(build, 'obj', asmfile, nfile, result, ran)
+            rebuilt |= ran
+            status = self.settle(build, nfile, result)
+        elif self.outasm and self.proceed(build):
+            nfile, command = self.asm_command(file, stem=stem)
+            result, ran = await self.async_compile_stage(build, 'asm', file, nfile, [file] + build['members'].get(file, []) + build['pchinputs'], command, True)
+            result = self.diagnose(build, source, result)
+            self.emit(build, 'asm', file, nfile, result, ran)
+            rebuilt |= ran
+            status = self.settle(build, nfile, result)
+            build['sources'][nfile] = source
+            file = nfile
+        if self.outobj and not self.fusing() and status in ('skipped', 'completed') and self.proceed(build):
+            nfile, command = self.obj_command(file, stem=stem)
+            result, ran = await self.async_compile_stage(build, 'obj', file, nfile, [file] + ([] if self.outasm else build['members'].get(file, []) + build['pchinputs']), command, True)
+            result = self.diagnose(build, source, result)
+            self.emit(build, 'obj', file, nfile, result, ran)
+            rebuilt |= ran
+            status = self.settle(build, nfile, result)
+        if self.outasm or self.outobj:
+            build['logs']['policy'][status] += 1
+        if status == 'completed':
+            build['logs']['rebuilt' if rebuilt else 'uptodate'].append(source)
+            self.scheduled(build, source, rebuilt)
+        return nfile if status == 'completed' else None
+    
+    async def async_prepare(self, files, emit, lines=False):
+        """
+        Set up the async compile of files: the output directories, the unity aggregates, the build state and the precompiled header.
+        returns the files to compile, aggregates replacing their members, and the build to pass to gnu.async_compile_unit() and gnu.async_link().
+        """
+        self.makedirs(self.outasm, self.outobj)
+        files, members = self.unity_sources(files) if self.unity is not None else (files, dict())
+        build = self.create_build(files)
+        build['members'] = build['logs']['unity'] = members
+        build['failed'] = asyncio.Event()
+        build['cancelled'] = asyncio.Event()
+        build['processes'] = set()
+        build['emit'] = emit
+        build['lines'] = lines
+        if self.pch is not None and (self.outasm or self.outobj):
+            command = self.pending_pch(build)
+            if command is not None:
+                start, usage = time.perf_counter(), self.accounting(build)
+                sinks = self.capture(build, 'pch', self.pch)
+                result = await self.async_captured(self.async_compile_kernel(command, self.callback(build, 'pch', self.pch), usage=usage, env=build['env'], cwd=build['cwd'], tokens=build['jobserver'], streams=sinks), sinks)
+                elapsed = self.profiled(build, 'pch', self.pch, start, usage)
+                result = self.diagnose(build, self.pch, result)
+                if not self.record_pch(build, command, result, elapsed):
+                    build['failed'].set()
+                self.emit(build, 'pch', self.pch, build['logs']['pch']['gch'], result, True)
+        return (files, build)
+    
+    async def async_link(self, build, files, nfiles):
+        """
+        Finish the async compile of files, whose units returned nfiles: run the archive or final stage unless a unit failed,
+        persist the build state and emit the 'done' event.
+        returns the path(s) to the output files in builddir and the logs.
+        """
+        inputs = files
         if self.outasm or self.outobj:
-            files = nfiles
+            files = inputs = [nfile for nfile in nfiles if nfile is not None]
         
-        if self.outfinal and not failed:
-            files, command = self.final_command(files, gnu.safe)
-            ret, stdout, stderr = await self.async_compile_kernel(prefix + ' '.join(command))
-            logs['final'] = [ret, stdout, stderr]
+        if self.archive is not None and not build['failed'].is_set():
+            files, result, ran = await self.async_archive_stage(build, inputs)
+            self.emit(build, 'archive', files, files, result, ran)
+        elif self.outfinal and not build['failed'].is_set():
+            files, command = self.final_command(inputs)
+            result, ran = await self.async_compile_stage(build, 'final', files, files, inputs + sorted(self.archives), command)
+            self.record_link(build, ran, build['durations'].get(files))
+            self.emit(build, 'final', files, files, result, ran)
+        logs = self.finish_build(build)
+        build['emit']({'kind': 'done', 'files': files, 'logs': logs})
         return (files, logs)
     
+    async def async_compile_events(self, files, emit, lines=False):
+        """
+        Run compiler concurrently, with internal configuration and files as input, and pass an event to emit for every stage that completes.
+        Up to self.jobs files are compiled at once, see gnu.setjobs(), longest first when scheduling, see gnu.setschedule().
+        The last event is of kind 'done' and carries the output files and logs.
+        If lines each line of compiler output is emitted as it is written instead of being kept in the logs.
+        returns the path(s) to the output files in builddir and the logs.
+        """
+        files, build = await self.async_prepare(files, emit, lines)
+        semaphore = asyncio.Semaphore(self.jobs)
+        order = files
+        if build['schedule'] is not None:
+            order = build['schedule'].order(files, build['members'])
+            build['logs']['schedule'] = {
+                'order': order,
+                'predicted': build['schedule'].predict(order, self.jobs, build['members']),
+                'unordered': build['schedule'].predict(files, self.jobs, build['members'])
+            }
+        
+        async def unit(file):
+            async with semaphore:
+                return await self.async_compile_unit(file, build)
+        
+        start = time.perf_counter()
+        nfiles = dict(zip(order, await asyncio.gather(*[unit(file) for file in order])))
+        if build['schedule'] is not None:
+            build['logs']['schedule']['actual'] = time.perf_counter() - start
+        return await self.async_link(build, files, [nfiles[file] for file in files])
+    
+    async def stream_compile(self, files, lines=False):
+        """
+        Run compiler concurrently like async_compile and yield events as the compile progresses, for use with async for.
+        'stage' events carry the stage, input file, output, [returncode, stdout, stderr] result and whether it was built as soon as a stage completes.
+        If lines, 'line' events carry each line the compiler writes to stdout or stderr as it is written, and the result holds no output.
+        The last event is of kind 'done' and carries the output files and logs async_compile would return.
+        """
+        queue = asyncio.Queue()
+        task = asyncio.create_task(self.async_compile_events(files, queue.put_nowait, lines))
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while (event := await queue.get()) is not None:
+                yield event
+            task.result()
+        finally:
+            task.cancel()
+    
+    async def async_compile(self, files):
+        """
+        Run compiler concurrently, with internal configuration and files as input and return the path(s) to the output files in builddir.
+        Up to self.jobs files are compiled at once, see gnu.setjobs().
+        When incremental, outputs that are up to date are skipped and logs['rebuilt'] and logs['uptodate'] list the files of each kind.
+        """
+        return await self.async_compile_events(files, lambda event: None)
+    
+    def compile_stage(self, build, stage, file, nfile, inputs, command, cached=False):
+        """
+        Run a single stage of the compile unless its output is up to date or, if cached, can be restored from the cache.
+        stage and file label the profile records of its invocations.
+        returns the [returncode, stdout, stderr] result and whether the output was (re)built.
+        """
+        if self.uptodate(build, nfile, inputs, command):
+            return ([0, '', ''], False)
+        key = None
+        if cached and (self.cache is not None or self.remote is not None):
+            source = inputs[0]
+            content = None
+            if source.suffix == '.s':
+                content = source.read_bytes()
+            else:
+                start, usage = time.perf_counter(), self.accounting(build)
+                ret, stdout, _ = self.compile_kernel(self.preprocess_command(source, output=nfile if self.remote is not None and '-MMD' in command else None), build['env'], usage, build['cwd'], build['jobserver'])
+                self.profiled(build, 'preprocess', file, start, usage)
+                content = stdout if ret == 0 else None
+            if content is not None and self.cache is not None:
+                key, result = self.restore(build, nfile, source, command, content)
+                if result is not None:
+                    self.record(build, nfile, inputs, command, result[0])
+                    return (result, True)
+            if content is not None and self.remote is not None:
+                result = self.offload(build, stage, file, nfile, source, command, content)
+                if result is not None:
+                    self.record(build, nfile, inputs, command, result[0])
+                    if key is not None:
+                        self.store(build, key, nfile, command, result)
+                    return (result, True)
+        start, usage = time.perf_counter(), self.accounting(build)
+        sinks = self.capture(build, stage, file)
+        result = self.captured(self.compile_kernel(command, build['env'], usage, build['cwd'], build['jobserver'], sinks), sinks)
+        elapsed = self.profiled(build, stage, file, start, usage)
+        if cached and inputs[0].suffix != '.s':
+            build['compiletime'] += elapsed
+            build['compiled'] += 1
+        self.record(build, nfile, inputs, command, result[0])
+        if key is not None:
+            self.store(build, key, nfile, command, result)
+        return (result, True)
+    
+    def archive_stage(self, build, files):
+        """
+        Run the archive stage of the compile over the object files in files unless the archive is up to date, see gnu.archive_commands().
+        returns the path to the archive, the [returncode, stdout, stderr] result of the last command and whether the archive was (re)built.
+        """
+        archive, command, commands = self.archive_commands(files)
+        if self.uptodate(build, archive, files, command):
+            return (archive, [0, '', ''], False)
+        for step in commands:
+            start, usage = time.perf_counter(), self.accounting(build)
+            sinks = self.capture(build, 'archive', archive)
+            result = self.captured(self.compile_kernel(step, build['env'], usage, build['cwd'], build['jobserver'], sinks), sinks)
+            self.profiled(build, 'archive', archive, start, usage)
+            if result[0] != 0:
+                break
+        self.record(build, archive, files, command, result[0])
+        return (archive, result, True)
+    
+    def compile_unit(self, file, build):
+        """
+        Run the asm and obj stages of a single file and record their results in the logs of build.
+        returns the path to the output file of the last stage or None and whether the file 'completed' or 'failed'.
+        """
+        source = file
+        stem = build['stems'][file]
+        nfile = None
+        rebuilt = False
+        failed = False
+        if self.fusing():
+            asmfile, nfile, command = self.fused_command(file, stem=stem)
+            self.fuse(asmfile, nfile, False)
+            result, ran = self.compile_stage(build, 'obj', file, nfile, [file] + build['members'].get(file, []) + build['pchinputs'], command, True)
+            result = self.diagnose(build, source, result)
+            self.fuse(asmfile, nfile, ran)
+            build['logs']['asm'][file] = build['logs']['obj'][asmfile] = result
+            rebuilt |= ran
+            failed = result[0] != 0
+        elif self.outasm:
+            nfile, command = self.asm_command(file, stem=stem)
+            result, ran = self.compile_stage(build, 'asm', file, nfile, [file] + build['members'].get(file, []) + build['pchinputs'], command, True)
+            result = self.diagnose(build, source, result)
+            build['logs']['asm'][file] = result
+            rebuilt |= ran
+            failed = result[0] != 0
+            build['sources'][nfile] = source
+            file = nfile
+        if self.outobj and not self.fusing() and not failed:
+            nfile, command = self.obj_command(file, stem=stem)
+            result, ran = self.compile_stage(build, 'obj', file, nfile, [file] + ([] if self.outasm else build['members'].get(file, []) + build['pchinputs']), command, True)
+            result = self.diagnose(build, source, result)
+            build['logs']['obj'][file] = result
+            rebuilt |= ran
+            failed = result[0] != 0
+        if failed:
+            return (None, 'failed')
+        if nfile is not None:
+            build['logs']['rebuilt' if rebuilt else 'uptodate'].append(source)
+            self.scheduled(build, source, rebuilt)
+        return (nfile, 'completed')
+    
     def compile(self, files):
         """
         Run compiler with internal configuration and files as input and return the path(s) to the output files in builddir.
+        When incremental, outputs that are up to date are skipped and logs['rebuilt'] and logs['uptodate'] list the files of each kind.
         """
         self.makedirs(self.outasm, self.outobj)
-        env = self.create_env()
-        logs = {
-            'asm': dict(),
-            'obj': dict(),
-            'final': []
-        }
+        files, members = self.unity_sources(files) if self.unity is not None else (files, dict())
+        build = self.create_build(files)
+        build['members'] = build['logs']['unity'] = members
         failed = False
+        if self.pch is not None and (self.outasm or self.outobj):
+            command = self.pending_pch(build)
+            if command is not None:
+                start, usage = time.perf_counter(), self.accounting(build)
+                sinks = self.capture(build, 'pch', self.pch)
+                result = self.captured(self.compile_kernel(command, build['env'], usage, build['cwd'], build['jobserver'], sinks), sinks)
+                elapsed = self.profiled(build, 'pch', self.pch, start, usage)
+                result = self.diagnose(build, self.pch, result)
+                failed = not self.record_pch(build, command, result, elapsed)
         nfiles = []
         for file in files:
-            if self.outasm and not failed:
-                nfile, command = self.asm_command(file)
-                ret, stdout, stderr = self.compile_kernel(command, env)
-                failed = False if ret == 0 else True
-                logs['asm'][file] = [ret, stdout, stderr]
-                if self.outobj:
-                    file = nfile
-                else:
-                    nfiles.append(nfile)
-            if self.outobj and not failed:
-                nfile, command = self.obj_command(file)
-                ret, stdout, stderr = self.compile_kernel(command, env)
-                failed = False if ret == 0 else True
-                logs['obj'][file] = [ret, stdout, stderr]
+            if failed and self.policy != 'keep_going':
+                build['logs']['policy']['skipped'] += 1
+                continue
+            nfile, status = self.compile_unit(file, build)
+            if self.outasm or self.outobj:
+                build['logs']['policy'][status] += 1
+            failed |= status == 'failed'
+            if nfile is not None:
                 nfiles.append(nfile)
+        inputs = files
         if self.outasm or self.outobj:
-            files = nfiles
+            files = inputs = nfiles
         
-        if self.outfinal and not failed:
-            files, command = self.final_command(files)
-            ret, stdout, stderr = self.compile_kernel(command, env)
-            logs['final'] = [ret, stdout, stderr]
-        return (files, logs)
+        if self.archive is not None and not failed:
+            files, build['logs']['archive'], _ = self.archive_stage(build, inputs)
+        elif self.outfinal and not failed:
+            files, command = self.final_command(inputs)
+            build['logs']['final'], ran = self.compile_stage(build, 'final', files, files, inputs + sorted(self.archives), command)
+            self.record_link(build, ran, build['durations'].get(files))
+        return (files, self.finish_build(build))
+    
+    def analyze(self, files):
+        """
+        Parse files with the includes and options of the compile and collect their include trees in an opifex.headers.
+        The precompiled header is left out so its cost shows up. See headers.report() for the headers ranked by cost.
+        """
+        env = self.create_env()
+        report = headers()
+        for file in files:
+            start = time.perf_counter()
+            ret, _, stderr = self.compile_kernel(self.analyze_command(pathlib.Path(file)), env)
+            report.add(file, stderr, time.perf_counter() - start, ret)
+        return report
+    
+    def setarchive(self, archive, thin=False):
+        """
+        Set whether the obj stage outputs are collected into the static library builddir/lib<target>.a instead of being linked.
+        Only the members whose objects changed are replaced. thin archives reference the objects in builddir instead of copying them,
+        so they must stay in place. The archive is made with gnu.archivers() and logs['archive'] holds the result of the last ar command.
+        """
+        self.archive = {'thin': thin} if archive else None
+        self.frozen = None
+        return self
+    
+    def uselib(self, *libraries):
+        """
+        Link against the archive of each gnu in libraries, see gnu.setarchive(), by adding its builddir to libpaths and its target to libs.
+        The final stage is relinked whenever one of the archives changes.
+        """
+        for library in libraries:
+            os.makedirs(library.builddir, exist_ok=True)
+            self.addlibpaths(library.builddir)
+            self.addlibs(library.target)
+            self.archives.add(library.archive_path())
+        self.frozen = None
+        return self
+    
+    def setlto(self, lto, jobs=None, partition=None):
+        """
+        Set whether to use link time optimization: -flto is added to the asm, obj and pch stages and the final stage links with -flto,
+        or with -flto=jobs to run the link time optimizer over parallel partitions ('auto' uses the jobserver or the cpu count,
+        'jobserver' only the jobserver, see gnu.setjobserver()). partition picks the -flto-partition algorithm, one of balanced (the default), 1to1, max, one or none. Archives are then made
+        with gcc-ar, see gnu.archivers(), and logs['lto'] reports the link wall time.
+        Raises AssertionError if jobs is not 'auto' or at least 1 or if partition is not one of those.
+        """
+        assert jobs in (None, 'auto', 'jobserver') or (isinstance(jobs, int) and jobs >= 1), f'gnu.setlto(). jobs must be auto, jobserver or at least 1. jobs was [{jobs}].'
+        assert partition in (None, 'balanced', '1to1', 'max', 'one', 'none'), f'gnu.setlto(). partition must be balanced, 1to1, max, one or none. partition was [{partition}].'
+        self.lto = {'jobs': jobs, 'partition': partition} if lto else None
+        self.frozen = None
+        return self
+    
+    def setunity(self, unity, batch=None, budget=None, exclude=()):
+        """
+        Set whether to compile files in batches through generated aggregate sources in builddir/name/unity, see gnu.unity_sources().
+        A batch holds up to batch files (unbounded if None) and up to budget bytes of source (unbounded if None). Files in exclude,
+        for example because of anonymous namespace collisions, are compiled on their own. logs['unity'] maps each aggregate to its files.
+        Raises AssertionError if batch is less than 1.
+        """
+        assert batch is None or batch >= 1, f'gnu.setunity(). batch must be at least 1. batch was [{batch}].'
+        self.unity = {'batch': batch, 'budget': budget, 'exclude': list(exclude)} if unity else None
+        self.frozen = None
+        return self
+    
+    def setpolicy(self, policy):
+        """
+        Set what happens to the other files of a compile when one fails, the final stage is skipped either way:
+        'stop' (default) lets running compilers finish but starts no new files, 'fail_fast' also kills the running compilers
+        and removes their partial outputs, and 'keep_going' compiles every file it can to report all errors in one pass.
+        logs['policy'] counts the files that completed, failed, were cancelled or skipped.
+        Raises AssertionError if policy is not one of those.
+        """
+        assert policy in ('stop', 'fail_fast', 'keep_going'), f'gnu.setpolicy(). policy must be stop, fail_fast or keep_going. policy was [{policy}].'
+        self.policy = policy
+        self.frozen = None
+        return self
+    
+    def setschedule(self, scheduling):
+        """
+        Set whether async compiles start the files longest processing time first, so the slowest file doesn't start last and hold up the link.
+        The time every file took is kept in builddir/name/durations.json, and files without history are estimated from their size, see opifex.schedule.
+        logs['schedule'] holds the order, the makespan predicted for it and for the order of files and the actual makespan, all in seconds.
+        The predictions are None until there is history to estimate from. Up to date files count at their last time in the predictions.
+        """
+        self.scheduling = scheduling
+        self.frozen = None
+        return self
+    
+    def setprofile(self, profiling):
+        """
+        Set whether to record the wall time, cpu time and peak rss of every compiler invocation in an opifex.profile at logs['profile'].
+        Cpu time and rss are only available where os.wait4 is, elsewhere only wall time is recorded. See profile.report() and profile.save().
+        """
+        self.profiling = profiling
+        self.frozen = None
+        return self
+    
+    def setjobserver(self, enabled):
+        """
+        Set whether compiles take part in a GNU make jobserver: under make -j the compilers opifex starts each take a token of its jobserver,
+        and otherwise opifex serves self.jobs tokens itself. Either way the compilers inherit it through MAKEFLAGS, so -flto=jobserver
+        partitions and nested makes share the same budget. logs['jobserver'] reports whether opifex was a 'client' or the 'server'.
+        """
+        self.jobserver = enabled
+        self.frozen = None
+        return self
+    
+    def setmemory(self, enabled, reserve=512 << 20, default=None):
+        """
+        Set whether async compiles are admitted against the available memory as well as self.jobs, see opifex.memory. The peak rss of
+        every file is kept in builddir/name/history.json, and a file only starts when its last peak fits in MemAvailable and the cgroup
+        limit besides reserve bytes and the peaks of the running compiles. Files without history are assumed to need default bytes,
+        or the median of the history. logs['memory']['throttled'] lists every file that had to wait and for how long.
+        """
+        self.memory = {'reserve': reserve, 'default': default} if enabled else None
+        self.frozen = None
+        return self
+    
+    def setjobs(self, jobs):
+        """
+        Set how many files async_compile compiles concurrently. Defaults to the number of cpus.
+        Raises AssertionError if jobs is less than 1.
+        """
+        assert jobs >= 1, f'gnu.setjobs(). jobs must be at least 1. jobs was [{jobs}].'
+        self.jobs = jobs
+        self.frozen = None
+        return self
+    
+    def setincremental(self, incremental, hashing=False):
+        """
+        Set whether to skip outputs whose inputs and command are unchanged since they were last built, tracked in builddir/name/manifest.json.
+        Inputs are fingerprinted by mtime and size, hashing additionally compares their contents when only the mtime changed.
+        """
+        self.incremental = incremental
+        self.hashing = hashing
+        self.frozen = None
+        return self
+    
+    def setpch(self, header):
+        """
+        Set a header to precompile into builddir/name/pch/<header>.gch before the asm or obj stage, or None to disable.
+        Every file compiled from source then force includes it, so it should have an include guard. The .gch is only rebuilt when
+        the header, its includes or the options change, and logs['pch'] reports whether it was built and the compile time it saved.
+        Raises AssertionError if header is not a file.
+        """
+        if header is not None:
+            header = pathlib.Path(header)
+            assert header.is_file(), f'gnu.setpch(). header must be a valid path to a file.\n{header.as_posix()} was not found.'
+        self.pch = header
+        self.frozen = None
+        return self
+    
+    def setremote(self, executor):
+        """
+        Set the opifex.remote that compiles the asm and obj stages on worker daemons, or None to compile locally. The TUs are preprocessed
+        locally and sent with the command stripped of its paths, see remote.args(), so the workers only need the same compiler.
+        Compiles fall back to the local compiler while no worker can be reached or accepts them. logs['remote'] counts the compiles of each kind.
+        """
+        self.remote = executor
+        self.frozen = None
+        return self
+    
+    def setcache(self, cache):
+        """
+        Set the opifex.cache that asm and obj outputs are restored from and stored to, or None to disable caching.
+        Outputs are keyed by the preprocessed file (or the assembly when compiling asm), the command without paths and the compiler identity.
+        """
+        self.cache = cache
+        self.frozen = None
+        return self
+    
+    def setdepfiles(self, depfiles):
+        """
+        Set whether the asm and obj commands write -MMD depfiles next to their outputs.
+        The depfiles are indexed in builddir/name/depindex.json so that, when incremental, a changed header rebuilds exactly the outputs that include it.
+        """
+        self.depfiles = depfiles
+        self.frozen = None
+        return self
+    
+    def setdiagnostics(self, enabled):
+        """
+        Set whether the compile stages print their diagnostics with -fdiagnostics-format=json, which are collected in an opifex.diagnostics
+        at logs['diagnostics'] instead of the stderr of each result. A warning from a header is kept once with the files that included it,
+        see diagnostics.query() and diagnostics.report(). Output streamed as lines, see gnu.stream_compile(), isn't collected.
+        """
+        self.diagnostics = enabled
+        self.frozen = None
+        return self
+    
+    def setsink(self, enabled, head=4096, tail=4096):
+        """
+        Set whether compiler output is written straight to files in builddir/name/logs instead of being held in the logs, so a cascade
+        of template errors doesn't grow this process. The stdout and stderr of each result are then opifex.sink handles that keep
+        the first head and last tail bytes in memory and read the full text from their file on demand, see sink.summary() and sink.read().
+        Output streamed as lines, see gnu.stream_compile(), is never kept and isn't written either.
+        """
+        self.sink = {'head': head, 'tail': tail} if enabled else None
+        self.frozen = None
+        return self
+    
+    def setfused(self, fused):
+        """
+        Set whether a compile with both the asm and obj stages runs one compiler per file instead of two, keeping the assembly
+        it compiles with -save-temps as the asm output. The outputs and logs are the same as with two invocations.
+        Compiles that use the cache or remote workers, which key and ship one output per invocation, still run two.
+        """
+        self.fused = fused
+        self.frozen = None
+        return self
     
     def setstages(self, asm, obj, final):
         """
@@ -228,6 +1508,7 @@ class gnu:
         self.outasm = asm
         self.outobj = obj
         self.outfinal = final
+        self.frozen = None
         return self
     
     def setstatic(self, isstatic):
@@ -235,6 +1516,7 @@ class gnu:
         Set whether to link statically or dynamically. Static by default to avoid missing libraries at runtime
         """
         self.static = isstatic
+        self.frozen = None
         return self
     
     def addincludes(self, *includes):
@@ -246,6 +1528,7 @@ class gnu:
             dir = pathlib.Path(include)
             assert dir.is_dir(), f'gnu.addincludes(). Each include in includes must be a valid directory.\n{dir.as_posix()} was not found.'
             self.includes.add(dir)
+        self.frozen = None
         return self
 
     def discardincludes(self, *includes):
@@ -254,6 +1537,7 @@ class gnu:
         """
         for include in includes:
             self.includes.remove(pathlib.Path(include))
+        self.frozen = None
         return self
     
     def addlibpaths(self, *libpaths):
@@ -265,6 +1549,7 @@ class gnu:
             dir = pathlib.Path(libpath)
             assert dir.is_dir(), f'gnu.addlibpaths(). Each libpath in libpaths must be a valid directory.\n{dir.as_posix()} was not found.'
             self.libpaths.add(dir)
+        self.frozen = None
         return self
     
     def discardlibpaths(self, *libpaths):
@@ -273,6 +1558,7 @@ class gnu:
         """
         for libpath in libpaths:
             self.libpaths.remove(pathlib.Path(libpath))
+        self.frozen = None
         return self
     
     def addlibs(self, *libnames):
@@ -283,6 +1569,7 @@ class gnu:
         for libname in libnames:
             assert ' ' not in libname, f'gnu.addlibs(). libnames must not contain spaces. libname was [{libname}].'
             self.libs.add(libname)
+        self.frozen = None
         return self
     
     def discardlibs(self, *libnames):
@@ -291,6 +1578,7 @@ class gnu:
         """
         for libname in libnames:
             self.libs.remove(libname)
+        self.frozen = None
         return self
     
     def addopts(self, *options):
@@ -301,6 +1589,18 @@ class gnu:
         for option in options:
             assert option.startswith('-') and ' ' not in option, f'gnu.addopts(). options must start with a - and not contain spaces. option was [{option}].'
             self.options.add(option)
+        self.frozen = None
+        return self
+    
+    def addsupportedopts(self, *options):
+        """
+        Adds each string-like entry in options that the compiler supports and skips the others, see probe.supports().
+        Raises AssertionError if entry doesn't start with - or contains spaces.
+        """
+        for option in options:
+            assert option.startswith('-') and ' ' not in option, f'gnu.addsupportedopts(). options must start with a - and not contain spaces. option was [{option}].'
+            if self.probe.supports(option):
+                self.addopts(option)
         return self
     
     def discardopts(self, *options):
@@ -309,4 +1609,5 @@ class gnu:
         """
         for option in options:
             self.options.remove(option)
+        self.frozen = None
         return self
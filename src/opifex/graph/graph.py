@@ -0,0 +1,150 @@
+import asyncio
+import heapq
+import itertools
+import os
+import pathlib
+
+class graph:
+    """
+    Builds several targets, each a toolchain object with its sources, with one scheduler shared by all their compiles and links.
+    Compiles of independent targets overlap, links start as soon as their inputs are ready and the longest remaining path goes first.
+    """
+    def __init__(self, jobs=None):
+        """
+        Takes how many compiles and links run at once, defaulting to the number of cpus.
+        Raises AssertionError if jobs is less than 1.
+        """
+        self.jobs = jobs or os.cpu_count() or 1
+        assert self.jobs >= 1, f'graph(). jobs must be at least 1. jobs was [{self.jobs}].'
+        self.targets = dict()
+        self.order = []
+    
+    def add(self, name, toolchain, sources, deps=()):
+        """
+        Declare the target name, built by toolchain from the paths in sources after the targets in deps are linked.
+        Targets built into an archive (see gnu.setarchive()) are linked into the targets that depend on them, see gnu.uselib().
+        Raises AssertionError if name is already declared or a dependency isn't, which also rules out cycles.
+        """
+        assert name not in self.targets, f'graph.add(). name must be unique. name was [{name}].'
+        for dep in deps:
+            assert dep in self.targets, f'graph.add(). deps must be declared before the targets that depend on them. dep was [{dep}].'
+            if getattr(self.targets[dep]['toolchain'], 'archive', None) is not None:
+                toolchain.uselib(self.targets[dep]['toolchain'])
+        self.targets[name] = {'toolchain': toolchain, 'sources': [pathlib.Path(source) for source in sources], 'deps': list(deps)}
+        return self
+    
+    @staticmethod
+    def cost(file, members=()):
+        """
+        returns the estimated cost of compiling file, its size in bytes plus those of the files it aggregates.
+        """
+        cost = 0
+        for path in [file, *members]:
+            try:
+                cost += os.stat(path).st_size
+            except OSError:
+                pass
+        return max(cost, 1)
+    
+    def ranks(self, prepared):
+        """
+        Rank every compile and link by the estimated cost of the longest path from its start to the end of the build.
+        A link is estimated at a tenth of the compiles of its target, and delays the links of the targets that depend on it.
+        returns a dict of ('unit', name, index) and ('link', name) keys to ranks.
+        """
+        ranks = dict()
+        for name in reversed(list(self.targets)):
+            files, build = prepared[name]
+            costs = [graph.cost(file, build['members'].get(file, [])) for file in files]
+            dependents = [ranks[('link', other)] for other, target in self.targets.items() if name in target['deps']]
+            ranks[('link', name)] = sum(costs) / 10 + max(dependents, default=0.0)
+            for index, cost in enumerate(costs):
+                ranks[('unit', name, index)] = cost + ranks[('link', name)]
+        return ranks
+    
+    async def async_compile(self, emit=None, lines=False):
+        """
+        Compile and link every target with up to self.jobs compiles and links at once. Each event passed to emit carries the target
+        it belongs to, see gnu.stream_compile(). A target whose dependencies failed is not linked. self.order lists the tasks as started.
+        An exception raised by a compile or link is raised here, and the other workers still finish the tasks left instead of waiting on it.
+        returns a dict of target names to the output files and logs of each, as gnu.async_compile returns them.
+        """
+        emit = emit or (lambda event: None)
+        slots = asyncio.Semaphore(self.jobs)
+        prepared = dict()
+        
+        async def prepare(name, target):
+            async with slots:
+                sink = lambda event: emit(dict(event, target=name))
+                prepared[name] = await target['toolchain'].async_prepare(target['sources'], sink, lines)
+        
+        await asyncio.gather(*[prepare(name, target) for name, target in self.targets.items()])
+        ranks = self.ranks(prepared)
+        nfiles = {name: [None] * len(files) for name, (files, _) in prepared.items()}
+        waiting = {name: len(prepared[name][0]) + len(target['deps']) for name, target in self.targets.items()}
+        results = dict()
+        failed = set()
+        ready = []
+        counter = itertools.count()
+        remaining = [len(ranks)]
+        condition = asyncio.Condition()
+        self.order = []
+        
+        def push(task):
+            heapq.heappush(ready, (-ranks[task], next(counter), task))
+        
+        def done(name):
+            waiting[name] -= 1
+            if waiting[name] == 0:
+                push(('link', name))
+        
+        for name in self.targets:
+            for index in range(len(prepared[name][0])):
+                push(('unit', name, index))
+            if waiting[name] == 0:
+                push(('link', name))
+        
+        async def run(task):
+            name = task[1]
+            toolchain = self.targets[name]['toolchain']
+            files, build = prepared[name]
+            if task[0] == 'unit':
+                nfiles[name][task[2]] = await toolchain.async_compile_unit(files[task[2]], build)
+                return
+            if any(dep in failed for dep in self.targets[name]['deps']):
+                build['failed'].set()
+            results[name] = await toolchain.async_link(build, files, nfiles[name])
+            result = results[name][1].get('archive' if getattr(toolchain, 'archive', None) is not None else 'final')
+            if build['failed'].is_set() or (result and result[0] != 0):
+                failed.add(name)
+        
+        async def worker():
+            while True:
+                async with condition:
+                    while not ready and remaining[0] > 0:
+                        await condition.wait()
+                    if not ready:
+                        return
+                    task = heapq.heappop(ready)[2]
+                    self.order.append(task)
+                try:
+                    await run(task)
+                finally:
+                    async with condition:
+                        remaining[0] -= 1
+                        if task[0] == 'unit':
+                            done(task[1])
+                        else:
+                            for other, target in self.targets.items():
+                                if task[1] in target['deps']:
+                                    done(other)
+                        condition.notify_all()
+        
+        await asyncio.gather(*[worker() for _ in range(self.jobs)])
+        return results
+    
+    def compile(self, emit=None, lines=False):
+        """
+        Compile and link every target like graph.async_compile() from synchronous code.
+        """
+        return asyncio.run(self.async_compile(emit, lines))
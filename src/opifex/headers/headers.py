@@ -0,0 +1,93 @@
+import pathlib
+import re
+
+class headers:
+    """
+    Aggregates the include trees compilers print with -H across the files of a compile into a per header cost report.
+    """
+    def __init__(self):
+        """
+        Starts without any files, see headers.add().
+        """
+        self.units = dict()
+        self.linecounts = dict()
+    
+    @staticmethod
+    def parse(text):
+        """
+        Parse the -H and -ftime-report output of a compiler.
+        returns the (depth, header) pairs of the include tree in the order they were included and the total wall time or None if there is no time report.
+        """
+        entries = []
+        seconds = None
+        for line in text.splitlines():
+            if match := re.match(r'^(\.+) (.+)$', line):
+                entries.append((len(match.group(1)), pathlib.Path(match.group(2).strip()).as_posix()))
+            elif match := re.match(r'^\s*TOTAL\s*:\s*([\d.]+)\s+([\d.]+)\s+([\d.]+)', line):
+                seconds = float(match.group(3))
+        return (entries, seconds)
+    
+    def lines(self, path):
+        """
+        returns the number of lines of path, counted once per path, or 0 if it can't be read.
+        """
+        path = pathlib.Path(path).as_posix()
+        if path not in self.linecounts:
+            try:
+                with open(path, 'rb') as file:
+                    self.linecounts[path] = sum(1 for _ in file)
+            except OSError:
+                self.linecounts[path] = 0
+        return self.linecounts[path]
+    
+    def add(self, file, text, wall, returncode=0):
+        """
+        Add the include tree of file from the -H and -ftime-report output in text. Every header is assigned its own lines plus those of
+        the headers it includes, and the share of the compile time of file (from the time report, otherwise wall) that those lines make up.
+        """
+        entries, seconds = headers.parse(text)
+        root = {'header': pathlib.Path(file).as_posix(), 'own': self.lines(file), 'children': []}
+        stack = [root]
+        for depth, header in entries:
+            node = {'header': header, 'own': self.lines(header), 'children': []}
+            del stack[max(1, min(depth, len(stack))):]
+            stack[-1]['children'].append(node)
+            stack.append(node)
+        
+        def total(node):
+            node['lines'] = node['own'] + sum(total(child) for child in node['children'])
+            return node['lines']
+        
+        total(root)
+        seconds = wall if seconds is None else seconds
+        
+        def attribute(node):
+            node['time'] = seconds * node['lines'] / root['lines'] if root['lines'] else 0.0
+            [attribute(child) for child in node['children']]
+        
+        attribute(root)
+        self.units[pathlib.Path(file).as_posix()] = {'tree': root, 'time': seconds, 'returncode': returncode}
+        return self
+    
+    def report(self, top=None):
+        """
+        Aggregate the include trees of all files per header: how often it was included, its transitive lines and attributed time summed
+        over every inclusion and the files or headers that include it directly. Nested inclusions of a header are counted once per tree.
+        returns the headers ranked by total attributed time, then transitive lines, limited to top if given.
+        """
+        totals = dict()
+        
+        def visit(node, parent, seen):
+            for child in node['children']:
+                entry = totals.setdefault(child['header'], {'header': child['header'], 'count': 0, 'lines': 0, 'time': 0.0, 'includers': dict()})
+                entry['count'] += 1
+                entry['includers'][parent] = entry['includers'].get(parent, 0) + 1
+                if child['header'] not in seen:
+                    entry['lines'] += child['lines']
+                    entry['time'] += child['time']
+                visit(child, child['header'], seen | {child['header']})
+        
+        for unit in self.units.values():
+            visit(unit['tree'], unit['tree']['header'], frozenset())
+        ranked = sorted(totals.values(), key=lambda entry: (entry['time'], entry['lines']), reverse=True)
+        return ranked if top is None else ranked[:top]
@@ -0,0 +1,163 @@
+import asyncio
+import os
+import re
+import select
+import threading
+
+class jobserver:
+    """
+    A GNU make jobserver: a pipe or fifo holding one token per job that may run besides the one every client holds implicitly.
+    opifex acquires a token for every compiler it starts beyond the first, and passes the jobserver on to the compilers
+    so nested parallelism, like -flto=jobserver partitions, shares the same budget.
+    """
+    def __init__(self, read, write, jobs=None, path=None, owned=False):
+        """
+        Takes the read and write ends of the token pipe, the total number of jobs if known, the path of the fifo if it is one
+        and whether the descriptors are closed with the jobserver. See jobserver.client() and jobserver.server().
+        """
+        self.read = read
+        self.write = write
+        self.jobs = jobs
+        self.path = path
+        self.owned = owned
+        self.implicit = True
+        self.pending = 0
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def parse(makeflags):
+        """
+        returns the jobserver in makeflags as ('fifo', path) or ('fds', read, write) from the last --jobserver-auth or --jobserver-fds,
+        or None if there is none or it is of a kind that can't be used here, like the semaphores of make on windows.
+        """
+        auth = None
+        for match in re.finditer(r'--jobserver-(?:auth|fds)=(\S+)', makeflags or ''):
+            auth = match.group(1)
+        if auth is None:
+            return None
+        if auth.startswith('fifo:'):
+            return ('fifo', auth[5:])
+        if match := re.fullmatch(r'(\d+),(\d+)', auth):
+            return ('fds', int(match.group(1)), int(match.group(2)))
+        return None
+    
+    @staticmethod
+    def client(makeflags=None):
+        """
+        Connect to the jobserver of the make that started this process, read from makeflags or $MAKEFLAGS.
+        returns the jobserver or None if there is none or it can't be reached, as happens when make didn't consider this process
+        a recursive make and closed the descriptors.
+        """
+        makeflags = os.environ.get('MAKEFLAGS') if makeflags is None else makeflags
+        auth = jobserver.parse(makeflags)
+        jobs = re.search(r'(?:^|\s)-j(\d+)', makeflags or '')
+        jobs = int(jobs.group(1)) if jobs else None
+        try:
+            if auth is not None and auth[0] == 'fifo':
+                fd = os.open(auth[1], os.O_RDWR)
+                return jobserver(fd, fd, jobs, auth[1], True)
+            if auth is not None:
+                os.fstat(auth[1])
+                os.fstat(auth[2])
+                return jobserver(auth[1], auth[2], jobs)
+        except OSError:
+            pass
+        return None
+    
+    @staticmethod
+    def server(jobs):
+        """
+        Start a jobserver for jobs jobs, of which the caller holds one implicitly.
+        returns the jobserver or None where descriptors can't be passed on to subprocesses.
+        Raises AssertionError if jobs is less than 1.
+        """
+        assert jobs >= 1, f'jobserver.server(). jobs must be at least 1. jobs was [{jobs}].'
+        if os.name != 'posix':
+            return None
+        read, write = os.pipe()
+        os.write(write, b'+' * (jobs - 1))
+        return jobserver(read, write, jobs, owned=True)
+    
+    def makeflags(self, makeflags=None):
+        """
+        returns makeflags with the jobserver options replaced by the ones of this jobserver, for the environment of subprocesses.
+        """
+        makeflags = re.sub(r'\s*(?:--jobserver-(?:auth|fds)=\S+|-j\d*)(?=\s|$)', '', makeflags or '')
+        auth = f'fifo:{self.path}' if self.path is not None else f'{self.read},{self.write}'
+        jobs = '' if self.jobs is None else str(self.jobs)
+        return f'{makeflags} -j{jobs} --jobserver-auth={auth}'.strip()
+    
+    def fds(self):
+        """
+        returns the descriptors subprocesses need to inherit to use the jobserver, none for a fifo.
+        """
+        return () if self.path is not None else (self.read, self.write)
+    
+    def take(self):
+        """
+        returns True and takes the implicit token if it is free, otherwise False.
+        """
+        with self.lock:
+            if self.implicit:
+                self.implicit = False
+                return True
+            return False
+    
+    def acquire(self):
+        """
+        Wait for a token, the implicit one if it is free.
+        returns the token, None for the implicit one, to pass to jobserver.release().
+        Raises AssertionError if the jobserver was closed.
+        """
+        if self.take():
+            return None
+        with self.lock:
+            self.pending += 1
+        try:
+            while True:
+                try:
+                    token = os.read(self.read, 1)
+                    break
+                except BlockingIOError:
+                    select.select([self.read], [], [])
+        finally:
+            with self.lock:
+                self.pending -= 1
+        assert token, f'jobserver.acquire(). the jobserver was closed. read was [{self.read}].'
+        return token
+    
+    async def async_acquire(self):
+        """
+        Wait for a token like jobserver.acquire() without blocking the event loop. A token read after the wait was cancelled is released.
+        """
+        if self.take():
+            return None
+        future = asyncio.get_running_loop().run_in_executor(None, self.acquire)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            future.add_done_callback(lambda done: done.cancelled() or done.exception() or self.release(done.result()))
+            raise
+    
+    def release(self, token):
+        """
+        Return a token from jobserver.acquire().
+        """
+        if token is None:
+            with self.lock:
+                self.implicit = True
+        else:
+            os.write(self.write, token)
+    
+    def close(self):
+        """
+        Close the descriptors if this jobserver opened them, after waking any acquire still waiting on a token.
+        """
+        if self.owned:
+            if self.pending:
+                os.write(self.write, b'+' * self.pending)
+            os.close(self.read)
+            if self.write != self.read:
+                os.close(self.write)
+            self.owned = False
+        return self
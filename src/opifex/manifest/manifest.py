@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import pathlib
+
+from ..persist.persist import persist
+
+class manifest:
+    """
+    Persists the inputs and command each build output was produced from, so outputs that would be rebuilt identically can be skipped.
+    """
+    def __init__(self, path, hashing=False):
+        """
+        Takes the file path of the manifest, which is loaded if it exists, and whether to fall back to a content hash when a fingerprint's mtime differs.
+        """
+        self.path = pathlib.Path(path)
+        self.hashing = hashing
+        self.entries = dict()
+        if self.path.is_file():
+            try:
+                self.entries = json.loads(self.path.read_text())['entries']
+            except (ValueError, KeyError):
+                self.entries = dict()
+    
+    @staticmethod
+    def digest(file):
+        """
+        returns the sha256 hex digest of the contents of file.
+        """
+        sha = hashlib.sha256()
+        with open(file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+        return sha.hexdigest()
+    
+    def fingerprint(self, file):
+        """
+        returns [mtime_ns, size, digest] of file where digest is None unless hashing, or None if file doesn't exist.
+        """
+        try:
+            stat = os.stat(file)
+        except OSError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size, manifest.digest(file) if self.hashing else None]
+    
+    def matches(self, file, fingerprint):
+        """
+        Compare file against a recorded fingerprint by mtime and size and, when hashing, by content if only the mtime differs.
+        """
+        try:
+            stat = os.stat(file)
+        except OSError:
+            return False
+        if fingerprint is None or stat.st_size != fingerprint[1]:
+            return False
+        if stat.st_mtime_ns == fingerprint[0]:
+            return True
+        if self.hashing and fingerprint[2] is not None and manifest.digest(file) == fingerprint[2]:
+            fingerprint[0] = stat.st_mtime_ns
+            return True
+        return False
+    
+    def uptodate(self, output, inputs, command):
+        """
+        returns True if output exists and was recorded with the same command and unchanged inputs.
+        """
+        entry = self.entries.get(str(output))
+        if entry is None or entry['command'] != list(command) or not os.path.exists(output):
+            return False
+        if set(entry['inputs']) != {str(input) for input in inputs}:
+            return False
+        return all(self.matches(input, fingerprint) for input, fingerprint in entry['inputs'].items())
+    
+    def record(self, output, inputs, command):
+        """
+        Record that output was successfully built from inputs with command.
+        """
+        self.entries[str(output)] = {
+            'inputs': {str(input): self.fingerprint(input) for input in inputs},
+            'command': list(command)
+        }
+        return self
+    
+    def discard(self, output):
+        """
+        Forget output so that it is rebuilt next time.
+        """
+        self.entries.pop(str(output), None)
+        return self
+    
+    def save(self):
+        """
+        Write the manifest to its path, replacing the previous one atomically.
+        """
+        persist.write(self.path, {'entries': self.entries})
+        return self
@@ -0,0 +1,143 @@
+import asyncio
+import json
+import pathlib
+import time
+
+from ..persist.persist import persist
+
+class memory:
+    """
+    Admits compiles against the memory that is available, using the peak rss each file reached the last time it was compiled.
+    The history is kept in a json file, so the budget adapts as heavy files get lighter or lighter files get heavier.
+    """
+    def __init__(self, path, reserve=512 << 20, default=None, interval=0.1):
+        """
+        Takes the path of the history file, the bytes to always leave free, the peak rss assumed for files without history
+        (defaulting to the median of the history) and how many seconds to wait between checks while throttled.
+        """
+        self.path = pathlib.Path(path)
+        self.reserve = reserve
+        self.default = default
+        self.interval = interval
+        try:
+            self.history = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            self.history = dict()
+        self.running = dict()
+        self.seen = set()
+        self.throttled = []
+        self.changed = asyncio.Event()
+    
+    @staticmethod
+    def meminfo(text):
+        """
+        returns the MemAvailable of the /proc/meminfo text in bytes or None if it has none.
+        """
+        for line in text.splitlines():
+            if line.startswith('MemAvailable:'):
+                return int(line.split()[1]) * 1024
+        return None
+    
+    @staticmethod
+    def cgroup(cgroups='/proc/self/cgroup', root='/sys/fs/cgroup'):
+        """
+        returns the bytes left below the memory limit of the cgroup of this process (v2 memory.max or v1 memory.limit_in_bytes)
+        or None if it has no limit or it can't be read.
+        """
+        try:
+            lines = pathlib.Path(cgroups).read_text().splitlines()
+        except OSError:
+            return None
+        candidates = []
+        for line in lines:
+            _, controllers, path = line.split(':', 2)
+            if controllers == '':
+                candidates += [(pathlib.Path(root + path), 'memory.max', 'memory.current'), (pathlib.Path(root), 'memory.max', 'memory.current')]
+            elif 'memory' in controllers.split(','):
+                candidates += [(pathlib.Path(root, 'memory' + path), 'memory.limit_in_bytes', 'memory.usage_in_bytes'), (pathlib.Path(root, 'memory'), 'memory.limit_in_bytes', 'memory.usage_in_bytes')]
+        for directory, limit, usage in candidates:
+            try:
+                limit = (directory / limit).read_text().strip()
+                usage = int((directory / usage).read_text())
+            except (OSError, ValueError):
+                continue
+            if limit == 'max' or int(limit) >= 1 << 60:
+                return None
+            return max(int(limit) - usage, 0)
+        return None
+    
+    @staticmethod
+    def available():
+        """
+        returns the bytes that can still be allocated, the lesser of MemAvailable and the room left in the cgroup, or None where neither is known.
+        """
+        try:
+            free = memory.meminfo(pathlib.Path('/proc/meminfo').read_text())
+        except OSError:
+            free = None
+        limits = [amount for amount in (free, memory.cgroup()) if amount is not None]
+        return min(limits) if limits else None
+    
+    def estimate(self, file):
+        """
+        returns the peak rss expected from compiling file: its last peak, otherwise self.default or the median of the history.
+        """
+        key = pathlib.Path(file).as_posix()
+        if key in self.history:
+            return self.history[key]
+        if self.default is not None:
+            return self.default
+        peaks = sorted(self.history.values())
+        return peaks[len(peaks) // 2] if peaks else 0
+    
+    def admits(self, file, available):
+        """
+        returns whether file fits in available bytes besides the reserve and the expected peaks of the running compiles,
+        whose rss is only partly reflected in available while they grow. A compile is always admitted when none are running.
+        """
+        if not self.running or available is None:
+            return True
+        return self.estimate(file) + sum(self.running.values()) + self.reserve <= available
+    
+    async def admit(self, file):
+        """
+        Wait until file is admitted, see memory.admits(), checking again whenever a compile ends or every self.interval seconds.
+        Every wait is reported in self.throttled with the estimate, the available bytes and the number of running compiles.
+        """
+        available = memory.available()
+        if not self.admits(file, available):
+            event = {'file': str(file), 'estimate': self.estimate(file), 'available': available, 'running': len(self.running), 'start': time.perf_counter()}
+            self.throttled.append(event)
+            while not self.admits(file, available):
+                self.changed.clear()
+                try:
+                    await asyncio.wait_for(self.changed.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                available = memory.available()
+            event['wait'] = time.perf_counter() - event.pop('start')
+        self.running[pathlib.Path(file).as_posix()] = self.estimate(file)
+    
+    def release(self, file):
+        """
+        Mark the compile of file as ended and wake the compiles waiting to be admitted.
+        """
+        self.running.pop(pathlib.Path(file).as_posix(), None)
+        self.changed.set()
+    
+    def observe(self, file, maxrss):
+        """
+        Record maxrss as the peak of file, keeping the largest of the stages that compiled it this build.
+        """
+        key = pathlib.Path(file).as_posix()
+        if key in self.running:
+            self.running[key] = max(self.running[key], maxrss)
+        self.history[key] = max(maxrss, self.history.get(key, 0) if key in self.seen else 0)
+        self.seen.add(key)
+    
+    def save(self):
+        """
+        Write the history to its path, replacing the previous one atomically.
+        """
+        persist.write(self.path, self.history)
+        return self
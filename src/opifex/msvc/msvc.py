@@ -3,6 +3,8 @@ import os
 import pathlib
 import subprocess
 
+from ..snapshot.snapshot import snapshot
+
 class msvc:
     """
     Manages configuration and (optionally async) calling of a msvc compiler.
@@ -37,6 +39,7 @@ class msvc:
         
         self.target = kwargs.get('target', pathlib.Path.cwd().absolute().stem.replace(' ', '_') + '_' + self.name)
         self.builddir = kwargs.get('builddir', pathlib.Path('build/').absolute())
+        self.frozen = None
     
     @staticmethod
     def safe(path: pathlib.Path):
@@ -79,33 +82,55 @@ class msvc:
         """
         final = self.builddir / self.target
         os.makedirs(self.builddir, exist_ok=True)
-        static = ['/DEFAULTLIB:LIBCMT', '/NODEFAULTLIB:MSVCRT'] if self.static else []
-        command = ['/OUT:' + str(final) + '.exe'] + static
+        command = ['/OUT:' + str(final) + '.exe'] + self.freeze().splice('static')
         return final, command
     
     def includes_command(self):
         """
         return a component command that contains all the includes in self.includes
         """
-        return ['/I' + msvc.safe(include) for include in self.includes]
+        return self.freeze().splice('includes')
     
     def libpaths_command(self):
         """
         return a component linker command that contains all the libpaths in self.libpaths
         """
-        return ['/LIBPATH:' + msvc.safe(libpath) for libpath in self.libpaths]
+        return self.freeze().splice('libpaths')
     
     def defaultlibs_command(self):
         """
         return a component linker command that contains all the defaultlibs in self.defaultlibs
         """
-        return ['/DEFAULTLIB:' + defaultlib for defaultlib in self.defaultlibs]
+        return self.freeze().splice('defaultlibs')
     
     def nodefaultlibs_command(self):
         """
         return a component linker command that contains all the nodefaultlibs in self.nodefaultlibs
         """
-        return ['/NODEFAULTLIB:' + nodefaultlib for nodefaultlib in self.nodefaultlibs]
+        return self.freeze().splice('nodefaultlibs')
+    
+    def freeze(self):
+        """
+        Freeze the configuration into an opifex.snapshot with the include, libpath, defaultlib, nodefaultlib, option and static fragments rendered in sorted order.
+        The snapshot is kept until an add*, discard* or set* call changes the configuration, so commands only splice its fragments.
+        snapshot.fingerprint identifies the configuration for keying caches and manifests.
+        """
+        if self.frozen is None:
+            self.frozen = snapshot({
+                'includes': ['/I' + msvc.safe(include) for include in sorted(self.includes)],
+                'libpaths': ['/LIBPATH:' + msvc.safe(libpath) for libpath in sorted(self.libpaths)],
+                'defaultlibs': ['/DEFAULTLIB:' + defaultlib for defaultlib in sorted(self.defaultlibs)],
+                'nodefaultlibs': ['/NODEFAULTLIB:' + nodefaultlib for nodefaultlib in sorted(self.nodefaultlibs)],
+                'options': sorted(self.options),
+                'static': ['/DEFAULTLIB:LIBCMT', '/NODEFAULTLIB:MSVCRT'] if self.static else []
+            }, {
+                'path': self.path.as_posix(),
+                'name': self.name,
+                'target': self.target,
+                'builddir': pathlib.Path(self.builddir).as_posix(),
+                'stages': (self.outasm, self.outobj, self.outfinal)
+            })
+        return self.frozen
     
     def compile_kernel(self, cmd):
         batprefix = [self.path.resolve(), '&&', 'cl']
@@ -136,7 +161,7 @@ class msvc:
         asms, fa = self.asm_output(files)
         objs, fo = self.obj_output(files)
         includes = self.includes_command()
-        options = [option for option in self.options]
+        options = self.freeze().splice('options')
         cmd = fa + fo + includes + options + [str(file.as_posix()) for file in files] + ['/c']
         ret, stdout, stderr = await self.async_compile_kernel(' '.join(cmd))
         logs = [[ret, stdout, stderr]]
@@ -158,7 +183,7 @@ class msvc:
         asms, fa = self.asm_output(files)
         objs, fo = self.obj_output(files)
         includes = self.includes_command()
-        options = [option for option in self.options]
+        options = self.freeze().splice('options')
         cmd = fa + fo + includes + options + [str(file.as_posix()) for file in files] + ['/c']
         ret, stdout, stderr = self.compile_kernel(cmd)
         logs = [[ret, stdout, stderr]]
@@ -181,6 +206,7 @@ class msvc:
         self.outasm = asm
         self.outobj = obj
         self.outfinal = final
+        self.frozen = None
         return self
     
     def setstatic(self, isstatic):
@@ -188,6 +214,7 @@ class msvc:
         Set whether to link statically or dynamically. Static by default to avoid missing libraries at runtime
         """
         self.static = isstatic
+        self.frozen = None
         return self
     
     def addincludes(self, *includes):
@@ -199,6 +226,7 @@ class msvc:
             dir = pathlib.Path(include)
             assert dir.is_dir(), f'gnu.addincludes(). Each include in includes must be a valid directory.\n{dir.as_posix()} was not found.'
             self.includes.add(dir)
+        self.frozen = None
         return self
 
     def discardincludes(self, *includes):
@@ -207,6 +235,7 @@ class msvc:
         """
         for include in includes:
             self.includes.remove(pathlib.Path(include))
+        self.frozen = None
         return self
     
     def addlibpaths(self, *libpaths):
@@ -218,6 +247,7 @@ class msvc:
             dir = pathlib.Path(libpath)
             assert dir.is_dir(), f'gnu.addlibpaths(). Each libpath in libpaths must be a valid directory.\n{dir.as_posix()} was not found.'
             self.libpaths.add(dir)
+        self.frozen = None
         return self
     
     def discardlibpaths(self, *libpaths):
@@ -226,6 +256,7 @@ class msvc:
         """
         for libpath in libpaths:
             self.libpaths.remove(pathlib.Path(libpath))
+        self.frozen = None
         return self
     
     def adddefaultlibs(self, *libnames):
@@ -236,6 +267,7 @@ class msvc:
         for libname in libnames:
             assert ' ' not in libname, f'gnu.addlibs(). libnames must not contain spaces. libname was [{libname}].'
             self.defaultlibs.add(libname)
+        self.frozen = None
         return self
     
     def discarddefaultlibs(self, *libnames):
@@ -244,6 +276,7 @@ class msvc:
         """
         for libname in libnames:
             self.defaultlibs.remove(libname)
+        self.frozen = None
         return self
     
     def addnodefaultlibs(self, *libnames):
@@ -254,6 +287,7 @@ class msvc:
         for libname in libnames:
             assert ' ' not in libname, f'gnu.addlibs(). libnames must not contain spaces. libname was [{libname}].'
             self.nodefaultlibs.add(libname)
+        self.frozen = None
         return self
     
     def discardnodefaultlibs(self, *libnames):
@@ -262,6 +296,7 @@ class msvc:
         """
         for libname in libnames:
             self.nodefaultlibs.remove(libname)
+        self.frozen = None
         return self
     
     def addopts(self, *options):
@@ -272,6 +307,7 @@ class msvc:
         for option in options:
             assert option.startswith('/') and ' ' not in option, f'gnu.addopts(). options must start with a / and not contain spaces. option was [{option}].'
             self.options.add(option)
+        self.frozen = None
         return self
     
     def discardopts(self, *options):
@@ -280,5 +316,6 @@ class msvc:
         """
         for option in options:
             self.options.remove(option)
+        self.frozen = None
         return self
 
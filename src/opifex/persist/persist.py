@@ -0,0 +1,26 @@
+import json
+import os
+import pathlib
+import uuid
+
+class persist:
+    """
+    Writes the json state opifex keeps between builds, like manifests and histories, so readers never see a partial file.
+    """
+    @staticmethod
+    def write(path, data):
+        """
+        Write data as json to path, creating its directory, through a temporary file of its own that replaces path atomically,
+        so concurrent writers don't clobber each other's temporary files.
+        returns path.
+        """
+        path = pathlib.Path(path)
+        os.makedirs(path.parent, exist_ok=True)
+        temp = path.with_name(f'{path.name}.{uuid.uuid4().hex}.tmp')
+        try:
+            temp.write_text(json.dumps(data))
+            os.replace(temp, path)
+        finally:
+            if temp.exists():
+                os.unlink(temp)
+        return path
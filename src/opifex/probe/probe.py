@@ -0,0 +1,119 @@
+import json
+import os
+import pathlib
+import subprocess
+
+from ..persist.persist import persist
+
+class probe:
+    """
+    Queries the version, target triple, include search paths and supported flags of a gcc compatible compiler.
+    Results are cached on disk keyed by the compiler path, mtime and size, so a compiler is only run again when its binary changes.
+    """
+    def __init__(self, path, cachedir=None):
+        """
+        Takes the file path to the compiler and the directory of probe.json, defaulting to $OPIFEX_CACHE or ~/.cache/opifex like opifex.cache.
+        Nothing is run or read until the first query.
+        """
+        self.path = pathlib.Path(path)
+        self.cachedir = pathlib.Path(cachedir or os.environ.get('OPIFEX_CACHE', pathlib.Path.home() / '.cache' / 'opifex'))
+        self.results = None
+        self.key = None
+    
+    def identity(self):
+        """
+        returns a string identifying the compiler binary by its resolved path, mtime and size.
+        """
+        path = self.path.resolve()
+        stat = os.stat(path)
+        return f'{path.as_posix()}:{stat.st_mtime_ns}:{stat.st_size}'
+    
+    def load(self):
+        """
+        returns the cached results of the compiler binary as it is now, empty if it was never probed or changed since.
+        """
+        if self.results is None or self.key != self.identity():
+            self.key = self.identity()
+            try:
+                self.results = json.loads((self.cachedir / 'probe.json').read_text()).get(self.key, dict())
+            except (OSError, ValueError):
+                self.results = dict()
+        return self.results
+    
+    def save(self):
+        """
+        Merge the results into probe.json, replacing it atomically so concurrent probes of other compilers don't corrupt it.
+        """
+        try:
+            cached = json.loads((self.cachedir / 'probe.json').read_text())
+        except (OSError, ValueError):
+            cached = dict()
+        cached[self.key] = self.results
+        persist.write(self.cachedir / 'probe.json', cached)
+        return self
+    
+    def run(self, *args):
+        """
+        Run the compiler with args, with its parent directory first on path.
+        returns the returncode, stdout and stderr.
+        """
+        env = os.environ.copy()
+        env['PATH'] = str(self.path.parent.resolve()) + os.pathsep + env.get('PATH', '')
+        task = subprocess.run([self.path.name, *args], executable=self.path, env=env, capture_output=True, text=True)
+        return (task.returncode, task.stdout, task.stderr)
+    
+    def query(self, name, callback):
+        """
+        returns the cached result name, computing it with callback and saving it on a miss.
+        """
+        results = self.load()
+        if name not in results:
+            results[name] = callback()
+            self.save()
+        return results[name]
+    
+    def version(self):
+        """
+        returns the version the compiler reports with -dumpversion.
+        """
+        return self.query('version', lambda: self.run('-dumpversion')[1].strip())
+    
+    def machine(self):
+        """
+        returns the target triple the compiler reports with -dumpmachine.
+        """
+        return self.query('machine', lambda: self.run('-dumpmachine')[1].strip())
+    
+    @staticmethod
+    def parse_includes(text):
+        """
+        returns the directories listed in the #include search list of the -v output in text, in search order.
+        """
+        includes = []
+        listing = False
+        for line in text.splitlines():
+            if line.startswith('#include <...> search starts here:'):
+                listing = True
+            elif line.startswith('End of search list.'):
+                listing = False
+            elif listing and line.startswith(' '):
+                includes.append(pathlib.Path(line.strip().removesuffix(' (framework directory)')).as_posix())
+        return includes
+    
+    def includes(self):
+        """
+        returns the default include search paths of the compiler for c++, from the -v output of preprocessing an empty file.
+        """
+        return self.query('includes', lambda: probe.parse_includes(self.run('-v', '-E', '-x', 'c++', os.devnull)[2]))
+    
+    def supports(self, flag):
+        """
+        returns whether the compiler accepts flag, by checking an empty c++ file with -Werror -fsyntax-only and flag.
+        Compilers ignore unknown -Wno- flags unless other diagnostics are emitted, so those are checked as their -W form.
+        """
+        check = '-W' + flag[5:] if flag.startswith('-Wno-') else flag
+        flags = self.query('flags', dict)
+        if check not in flags:
+            flags[check] = self.run('-Werror', '-fsyntax-only', check, '-x', 'c++', os.devnull)[0] == 0
+            self.save()
+        return flags[check]
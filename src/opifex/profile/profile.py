@@ -0,0 +1,99 @@
+import json
+import os
+import pathlib
+
+class profile:
+    """
+    Collects a record of wall time, user and system cpu time and peak rss for every compiler invocation of a compile.
+    """
+    def __init__(self):
+        """
+        Starts an empty profile, record times are relative to its creation.
+        """
+        self.records = []
+    
+    def add(self, stage, file, start, end, usage=None):
+        """
+        Record an invocation of stage on file that ran from start to end (time.perf_counter() seconds) with the usage filled in by a kernel.
+        """
+        usage = usage or dict()
+        self.records.append({
+            'stage': stage,
+            'file': str(file),
+            'start': start,
+            'wall': end - start,
+            'user': usage.get('user'),
+            'system': usage.get('system'),
+            'maxrss': usage.get('maxrss')
+        })
+        return self
+    
+    def lanes(self):
+        """
+        Assign every record to the lowest lane that is free when it starts, so overlapping invocations end up on separate lanes.
+        returns the list of lanes in the order of self.records.
+        """
+        ends = []
+        lanes = [0] * len(self.records)
+        for i in sorted(range(len(self.records)), key=lambda i: self.records[i]['start']):
+            record = self.records[i]
+            lane = next((lane for lane, end in enumerate(ends) if end <= record['start']), len(ends))
+            if lane == len(ends):
+                ends.append(0.0)
+            ends[lane] = record['start'] + record['wall']
+            lanes[i] = lane
+        return lanes
+    
+    def report(self, top=10):
+        """
+        Summarize the records: the wall time span, totals per stage, the top slowest and most memory hungry invocations,
+        the final (link) time and the idle lane time between the first and last invocation that points at scheduling gaps.
+        """
+        if not self.records:
+            return {'wall': 0.0, 'stages': dict(), 'slowest': [], 'largest': [], 'final': 0.0, 'lanes': 0, 'idle': 0.0}
+        begin = min(record['start'] for record in self.records)
+        end = max(record['start'] + record['wall'] for record in self.records)
+        stages = dict()
+        for record in self.records:
+            stage = stages.setdefault(record['stage'], {'count': 0, 'wall': 0.0, 'user': 0.0, 'system': 0.0, 'maxrss': 0})
+            stage['count'] += 1
+            stage['wall'] += record['wall']
+            stage['user'] += record['user'] or 0.0
+            stage['system'] += record['system'] or 0.0
+            stage['maxrss'] = max(stage['maxrss'], record['maxrss'] or 0)
+        lanes = max(self.lanes()) + 1
+        return {
+            'wall': end - begin,
+            'stages': stages,
+            'slowest': sorted(self.records, key=lambda record: record['wall'], reverse=True)[:top],
+            'largest': sorted(self.records, key=lambda record: record['maxrss'] or 0, reverse=True)[:top],
+            'final': sum(record['wall'] for record in self.records if record['stage'] == 'final'),
+            'lanes': lanes,
+            'idle': lanes * (end - begin) - sum(record['wall'] for record in self.records)
+        }
+    
+    def trace(self):
+        """
+        returns the records as a Chrome about:tracing / Perfetto trace with one complete event per invocation and one thread per lane.
+        """
+        begin = min((record['start'] for record in self.records), default=0.0)
+        events = []
+        for record, lane in zip(self.records, self.lanes()):
+            events.append({
+                'name': pathlib.Path(record['file']).name,
+                'cat': record['stage'],
+                'ph': 'X',
+                'ts': (record['start'] - begin) * 1e6,
+                'dur': record['wall'] * 1e6,
+                'pid': os.getpid(),
+                'tid': lane,
+                'args': {key: record[key] for key in ('file', 'user', 'system', 'maxrss')}
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+    
+    def save(self, path):
+        """
+        Write the Chrome trace of the records to path.
+        """
+        pathlib.Path(path).write_text(json.dumps(self.trace()))
+        return self
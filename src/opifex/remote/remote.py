@@ -0,0 +1,170 @@
+import asyncio
+import json
+import os
+import pathlib
+import socket
+import time
+
+from ..cache.cache import cache
+from ..worker.worker import worker
+
+class remote:
+    """
+    Sends preprocessed TUs and their normalized command to opifex.worker daemons and writes back the outputs they compile.
+    Each compile goes to the least loaded worker with a free slot. A worker that can't be reached or answers with an error,
+    like a refused argument or a wrong secret, is left out for a while, and the compile is reported as not done so the caller compiles it locally.
+    """
+    def __init__(self, workers, timeout=60.0, retry=30.0, secret=None):
+        """
+        Takes the workers as (host, port, slots) tuples, the seconds a compile may take on a worker, the seconds a failed worker is left out
+        and the shared secret of the workers, defaulting to $OPIFEX_WORKER_SECRET.
+        Raises AssertionError if a worker has less than 1 slot.
+        """
+        self.workers = []
+        for host, port, slots in workers:
+            assert slots >= 1, f'remote(). every worker must have at least 1 slot. slots was [{slots}].'
+            self.workers.append({'host': host, 'port': port, 'slots': slots, 'running': 0, 'load': 0, 'failed': None, 'compiled': 0, 'failures': 0, 'error': None})
+        self.timeout = timeout
+        self.retry = retry
+        self.secret = secret or os.environ.get('OPIFEX_WORKER_SECRET') or None
+        self.changed = None
+    
+    @staticmethod
+    def args(command, inputs):
+        """
+        returns the arguments of command that still apply to its preprocessed TU: those cache.normalize() keeps, without forced includes.
+        """
+        args = []
+        skip = False
+        for arg in cache.normalize(command, inputs):
+            if skip:
+                skip = False
+            elif arg == '-include':
+                skip = True
+            else:
+                args.append(arg)
+        return args
+    
+    @staticmethod
+    def language(file):
+        """
+        returns the -x language the worker compiles the content of file as, assembly or preprocessed c++.
+        """
+        return 'assembler' if pathlib.Path(file).suffix == '.s' else 'c++-cpp-output'
+    
+    def pick(self):
+        """
+        returns the worker with a free slot and the lowest load, counting the compiles of other clients it last reported, or None if all are busy or failed.
+        """
+        now = time.monotonic()
+        candidates = [
+            target for target in self.workers
+            if target['running'] < target['slots'] and (target['failed'] is None or now - target['failed'] > self.retry)
+        ]
+        return min(candidates, key=lambda target: (target['running'] + target['load']) / target['slots'], default=None)
+    
+    def available(self):
+        """
+        returns whether any worker may be reachable, ie not all of them failed within self.retry seconds.
+        """
+        now = time.monotonic()
+        return any(target['failed'] is None or now - target['failed'] > self.retry for target in self.workers)
+    
+    def request(self, command, file, content):
+        """
+        returns the message asking a worker to compile content, the preprocessed TU or assembly of file, with command.
+        """
+        content = content if isinstance(content, bytes) else content.encode()
+        header = {'args': remote.args(command, {str(pathlib.Path(file).resolve())}), 'language': remote.language(file)}
+        return worker.pack(dict(header, secret=self.secret) if self.secret is not None else header, content)
+    
+    def finish(self, target, header):
+        """
+        Account for the end of a compile on target with the response header, None if it failed.
+        returns header, or None if it holds an error in place of a result.
+        """
+        target['running'] -= 1
+        if header is not None and 'returncode' not in header:
+            target['error'] = header.get('error')
+            header = None
+        if header is None:
+            target['failed'] = time.monotonic()
+            target['failures'] += 1
+        else:
+            target['failed'] = None
+            target['compiled'] += 1
+            target['load'] = max(header.get('running', 0) - target['running'], 0)
+        return header
+    
+    def respond(self, header, data, output):
+        """
+        Write the output of a response to output.
+        returns the [returncode, stdout, stderr] result.
+        """
+        if header['returncode'] == 0:
+            output.write_bytes(data)
+        return [header['returncode'], header['stdout'], header['stderr']]
+    
+    async def async_compile(self, command, file, content, output):
+        """
+        Compile content, the preprocessed TU or assembly of file, with command on a worker and write the output to output.
+        Waits for a worker slot while all are busy.
+        returns the [returncode, stdout, stderr] result or None if no worker could compile it, in which case it should be compiled locally.
+        """
+        if self.changed is None:
+            self.changed = asyncio.Condition()
+        request = self.request(command, file, content)
+        while self.available():
+            async with self.changed:
+                target = self.pick()
+                if target is None:
+                    await self.changed.wait_for(lambda: self.pick() is not None or not self.available())
+                    continue
+                target['running'] += 1
+            header = None
+            try:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(target['host'], target['port']), self.timeout)
+                try:
+                    writer.write(request)
+                    await writer.drain()
+                    header, data = await asyncio.wait_for(worker.read(reader), self.timeout)
+                finally:
+                    writer.close()
+            except (OSError, asyncio.TimeoutError, ValueError):
+                header = None
+            async with self.changed:
+                header = self.finish(target, header)
+                self.changed.notify_all()
+            if header is not None:
+                return self.respond(header, data, output)
+        return None
+    
+    def compile(self, command, file, content, output):
+        """
+        Compile content on a worker like remote.async_compile() from synchronous code, one compile at a time.
+        """
+        request = self.request(command, file, content)
+        while (target := self.pick()) is not None:
+            target['running'] += 1
+            header = None
+            try:
+                with socket.create_connection((target['host'], target['port']), self.timeout) as connection:
+                    connection.sendall(request)
+                    stream = connection.makefile('rb')
+                    length = int.from_bytes(stream.read(4), 'big')
+                    header = json.loads(stream.read(length))
+                    data = stream.read(header.get('size', 0))
+                    if len(data) != header.get('size', 0):
+                        header = None
+            except (OSError, ValueError):
+                header = None
+            header = self.finish(target, header)
+            if header is not None:
+                return self.respond(header, data, output)
+        return None
+    
+    def report(self):
+        """
+        returns the compiles and failures of every worker as 'host:port' keys to dicts.
+        """
+        return {f"{target['host']}:{target['port']}": {'compiled': target['compiled'], 'failures': target['failures']} for target in self.workers}
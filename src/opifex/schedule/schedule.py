@@ -0,0 +1,80 @@
+import heapq
+import json
+import pathlib
+
+from ..graph.graph import graph
+from ..persist.persist import persist
+
+class schedule:
+    """
+    Orders the files of a compile longest processing time first, using the time each file took the last time it was compiled.
+    Files without history are estimated from their size, see graph.cost(), at the seconds per byte of the history.
+    """
+    def __init__(self, path):
+        """
+        Takes the path of the history file, which is loaded if it exists.
+        """
+        self.path = pathlib.Path(path)
+        try:
+            self.history = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            self.history = dict()
+    
+    def rate(self):
+        """
+        returns the seconds per byte over the history or None if it is empty.
+        """
+        sizes = sum(entry['size'] for entry in self.history.values())
+        return sum(entry['time'] for entry in self.history.values()) / sizes if sizes else None
+    
+    def estimate(self, file, members=(), rate=None):
+        """
+        returns the seconds file is expected to take, its last time or its size at rate (defaulting to schedule.rate()), or None if neither is known.
+        """
+        entry = self.history.get(pathlib.Path(file).as_posix())
+        if entry is not None:
+            return entry['time']
+        rate = self.rate() if rate is None else rate
+        return graph.cost(file, members) * rate if rate is not None else None
+    
+    def order(self, files, members=None):
+        """
+        returns files sorted by their estimate, longest first. Files that can't be estimated keep their order at the end.
+        """
+        members = members or dict()
+        rate = self.rate()
+        estimates = {file: self.estimate(file, members.get(file, []), rate) for file in files}
+        return sorted(files, key=lambda file: -estimates[file] if estimates[file] is not None else float('inf'))
+    
+    @staticmethod
+    def makespan(times, jobs):
+        """
+        returns the seconds it takes jobs workers to run tasks of times each, started in order on the first free worker.
+        """
+        workers = [0.0] * max(min(jobs, len(times)), 1)
+        for time in times:
+            heapq.heappush(workers, heapq.heappop(workers) + time)
+        return max(workers)
+    
+    def predict(self, files, jobs, members=None):
+        """
+        returns the predicted makespan of files in order with jobs workers or None if a file can't be estimated.
+        """
+        members = members or dict()
+        rate = self.rate()
+        times = [self.estimate(file, members.get(file, []), rate) for file in files]
+        return None if None in times else schedule.makespan(times, jobs)
+    
+    def record(self, file, seconds, members=()):
+        """
+        Record that compiling file took seconds.
+        """
+        self.history[pathlib.Path(file).as_posix()] = {'time': seconds, 'size': graph.cost(file, members)}
+        return self
+    
+    def save(self):
+        """
+        Write the history to its path, replacing the previous one atomically.
+        """
+        persist.write(self.path, self.history)
+        return self
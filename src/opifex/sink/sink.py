@@ -0,0 +1,86 @@
+import os
+import pathlib
+
+class sink:
+    """
+    Captures one output stream of a compiler invocation in a file and stands in for its text in the logs.
+    The compiler writes to the file directly, only a bounded head and tail are kept in memory and the full text is read on demand.
+    """
+    def __init__(self, path, head=4096, tail=4096):
+        """
+        Takes the path of the file and how many bytes from its start and end to keep in memory once closed.
+        """
+        self.path = pathlib.Path(path)
+        self.head = head
+        self.tail = tail
+        self.size = 0
+        self.start = ''
+        self.end = ''
+        self.file = None
+    
+    def open(self):
+        """
+        Create or truncate the file for the compiler to write to, see sink.fileno().
+        """
+        os.makedirs(self.path.parent, exist_ok=True)
+        self.file = open(self.path, 'wb')
+        return self
+    
+    def fileno(self):
+        """
+        returns the descriptor of the open file, so a sink can be passed as the stdout or stderr of a subprocess.
+        """
+        return self.file.fileno()
+    
+    def close(self):
+        """
+        Close the file after the compiler exited and keep its head and tail. An empty file is removed.
+        """
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.size = os.stat(self.path).st_size if self.path.exists() else 0
+        if self.size == 0:
+            self.path.unlink(missing_ok=True)
+            return self
+        with open(self.path, 'rb') as f:
+            self.start = f.read(self.head).decode(errors='replace')
+            if self.size > self.head:
+                f.seek(max(self.size - self.tail, self.head))
+                self.end = f.read().decode(errors='replace')
+        return self
+    
+    def read(self):
+        """
+        returns the full text of the stream, read from the file.
+        """
+        if self.size == 0:
+            return ''
+        return self.path.read_bytes().decode(errors='replace')
+    
+    def summary(self):
+        """
+        returns the head and tail kept in memory, with the number of bytes left out between them if any.
+        """
+        elided = self.size - len(self.start.encode()) - len(self.end.encode())
+        return self.start + (f'\n[... {elided} bytes in {self.path.as_posix()} ...]\n' if elided > 0 else '') + self.end
+    
+    def __str__(self):
+        return self.read()
+    
+    def __repr__(self):
+        return f"sink('{self.path.as_posix()}', {self.size} bytes)"
+    
+    def __bool__(self):
+        return self.size > 0
+    
+    def __contains__(self, text):
+        return text in self.read()
+    
+    def __eq__(self, other):
+        if isinstance(other, sink):
+            return self.path == other.path
+        return isinstance(other, str) and (self.size == 0 and other == '' or self.read() == other)
+    
+    def __hash__(self):
+        return hash(self.path)
@@ -0,0 +1,45 @@
+import hashlib
+import json
+import types
+
+class snapshot:
+    """
+    An immutable view of a toolchain configuration with its argument fragments rendered once in a deterministic order and a stable fingerprint.
+    """
+    __slots__ = ('fragments', 'settings', 'runtime', 'fingerprint')
+    
+    def __init__(self, fragments, settings, runtime=None):
+        """
+        Takes a mapping of fragment names to lists of arguments, a mapping of the remaining settings that affect the outputs
+        and a mapping of those that only affect how they are built, like the number of jobs. Settings are stored as strings.
+        The fingerprint is a sha256 of the fragments and settings, so it changes whenever an argument or output setting does but not with the runtime settings.
+        """
+        fragments = {name: tuple(arguments) for name, arguments in fragments.items()}
+        settings = {name: str(setting) for name, setting in settings.items()}
+        runtime = {name: str(setting) for name, setting in (runtime or dict()).items()}
+        text = json.dumps({'fragments': fragments, 'settings': settings}, sort_keys=True)
+        object.__setattr__(self, 'fragments', types.MappingProxyType(fragments))
+        object.__setattr__(self, 'settings', types.MappingProxyType(settings))
+        object.__setattr__(self, 'runtime', types.MappingProxyType(runtime))
+        object.__setattr__(self, 'fingerprint', hashlib.sha256(text.encode()).hexdigest())
+    
+    def __setattr__(self, name, value):
+        raise AttributeError(f'snapshot(). snapshots are immutable, freeze the toolchain again instead. name was [{name}].')
+    
+    def __getitem__(self, name):
+        return self.fragments[name]
+    
+    def __eq__(self, other):
+        return isinstance(other, snapshot) and self.fingerprint == other.fingerprint
+    
+    def __hash__(self):
+        return hash(self.fingerprint)
+    
+    def splice(self, *names):
+        """
+        returns a new list of the arguments of the fragments in names, in order.
+        """
+        arguments = []
+        for name in names:
+            arguments += self.fragments[name]
+        return arguments
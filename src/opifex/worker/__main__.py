@@ -0,0 +1,8 @@
+import asyncio
+import sys
+
+from .worker import worker
+
+if __name__ == '__main__':
+    assert len(sys.argv) >= 2, 'python -m opifex.worker compiler [host] [port] [jobs], with the secret in $OPIFEX_WORKER_SECRET to listen beyond loopback'
+    asyncio.run(worker(sys.argv[1], *sys.argv[2:3], *[int(arg) for arg in sys.argv[3:5]]).serve())
@@ -0,0 +1,206 @@
+import asyncio
+import hmac
+import ipaddress
+import json
+import os
+import pathlib
+import shutil
+import socket
+import tempfile
+
+class worker:
+    """
+    A compile daemon for opifex.remote: it receives preprocessed TUs with their normalized command over a socket,
+    compiles them with its local compiler and sends back the output bytes and the diagnostics.
+    Every message is a 4 byte big endian length, a json header of that length and the header['size'] bytes of payload.
+    Requests must carry the shared secret of the worker, if it has one, and only arguments that can't run or read anything
+    besides the compiler and the TU are accepted, see worker.allowed(). Anything else is answered with an error instead of compiled.
+    """
+    HEADER = 1 << 20
+    VALUES = (
+        '-fabi-version=', '-falign-functions=', '-falign-jumps=', '-falign-labels=', '-falign-loops=', '-fcf-protection=',
+        '-fconstexpr-depth=', '-fconstexpr-loop-limit=', '-fconstexpr-ops-limit=', '-fdiagnostics-color=', '-fdiagnostics-format=',
+        '-fexcess-precision=', '-fexec-charset=', '-ffp-contract=', '-finput-charset=', '-flto=', '-flto-partition=', '-fmax-errors=',
+        '-fmessage-length=', '-fsanitize=', '-ftemplate-depth=', '-ftls-model=', '-ftrivial-auto-var-init=', '-fvisibility=',
+        '-fwide-exec-charset=', '-fzero-call-used-regs='
+    )
+    
+    def __init__(self, path, host='127.0.0.1', port=0, jobs=None, secret=None, maxsize=256 << 20):
+        """
+        Takes the compiler, as a path or a name searched on PATH, the address to listen on (port 0 picks a free one, see self.port
+        once started), how many compiles run at once, defaulting to the number of cpus, the shared secret clients must send,
+        defaulting to $OPIFEX_WORKER_SECRET, and the largest TU in bytes a request may carry.
+        Raises AssertionError if the compiler isn't found, if jobs is less than 1 or if host isn't a loopback address and there is no secret.
+        """
+        self.path = pathlib.Path(shutil.which(str(path)) or path).absolute()
+        assert self.path.is_file(), f'worker(). path must be a valid path to a file or a compiler on PATH. path was [{path}].'
+        self.host = host
+        self.port = port
+        self.jobs = jobs or os.cpu_count() or 1
+        assert self.jobs >= 1, f'worker(). jobs must be at least 1. jobs was [{self.jobs}].'
+        self.secret = secret or os.environ.get('OPIFEX_WORKER_SECRET') or None
+        assert self.secret is not None or worker.loopback(host), f'worker(). a secret is required to listen on a host other than loopback. host was [{host}].'
+        self.maxsize = maxsize
+        self.env = os.environ.copy()
+        self.env['PATH'] = str(self.path.parent.resolve()) + os.pathsep + self.env.get('PATH', '')
+        self.running = 0
+        self.served = 0
+        self.server = None
+        self.slots = None
+    
+    @staticmethod
+    def loopback(host):
+        """
+        returns whether every address host resolves to is a loopback address.
+        """
+        try:
+            addresses = {info[4][0] for info in socket.getaddrinfo(host, None)}
+        except (OSError, UnicodeError):
+            return False
+        return bool(addresses) and all(ipaddress.ip_address(address.split('%')[0]).is_loopback for address in addresses)
+    
+    @staticmethod
+    def allowed(arg):
+        """
+        returns whether a client may pass arg to the compiler: -c, -S, -w, -pedantic and the -O, -W, -f, -m, -g, -std=, -D and -U options,
+        except those that pass options to other tools, load plugins or read or write files named by the client.
+        An -f option with a value is only accepted if it is in worker.VALUES, as new ones keep adding output files like -fdeps-file=.
+        Everything else, like -wrapper, -B, -specs, @file, -o, -x and inputs, is refused.
+        """
+        if arg in ('-c', '-S', '-w', '-pedantic', '-pedantic-errors', '-pipe'):
+            return True
+        if arg.startswith(('-Wa,', '-Wl,', '-Wp,', '-fplugin', '-fprofile', '-fauto-profile', '-fdump', '-fcompare-debug', '-fmodule', '-fopt-info', '-fself-test', '-fsanitize-blacklist', '-fsanitize-ignorelist')):
+            return False
+        if arg.startswith('-f') and '=' in arg:
+            return arg.startswith(worker.VALUES)
+        return arg.startswith(('-O', '-W', '-f', '-m', '-g', '-std=', '-D', '-U'))
+    
+    @staticmethod
+    async def read(reader, limit=None):
+        """
+        returns the header and payload of the next message from reader, or (None, None) if the connection closed.
+        Raises ValueError if the header isn't a json object or, given a limit, if the header is larger than worker.HEADER or the payload than limit bytes.
+        """
+        try:
+            length = int.from_bytes(await reader.readexactly(4), 'big')
+            if limit is not None and length > worker.HEADER:
+                raise ValueError(f'worker.read(). the header must be at most {worker.HEADER} bytes. length was [{length}].')
+            header = json.loads(await reader.readexactly(length))
+            if not isinstance(header, dict) or not isinstance(header.get('size', 0), int) or header.get('size', 0) < 0:
+                raise ValueError('worker.read(). the header must be a json object with a size of at least 0.')
+            if limit is not None and header.get('size', 0) > limit:
+                raise ValueError(f'worker.read(). the payload must be at most {limit} bytes. size was [{header["size"]}].')
+            return (header, await reader.readexactly(header.get('size', 0)))
+        except asyncio.IncompleteReadError:
+            return (None, None)
+    
+    @staticmethod
+    def pack(header, payload=b''):
+        """
+        returns the message of header and payload, with header['size'] set to the length of payload.
+        """
+        data = json.dumps(dict(header, size=len(payload))).encode()
+        return len(data).to_bytes(4, 'big') + data + payload
+    
+    async def run(self, args, language, content):
+        """
+        Compile content as language with args into a temporary directory.
+        returns the response header with the returncode, stdout and stderr, and the output bytes, empty if it failed.
+        """
+        with tempfile.TemporaryDirectory(prefix='opifex-') as directory:
+            source = pathlib.Path(directory) / ('input.s' if language == 'assembler' else 'input.ii')
+            output = pathlib.Path(directory) / 'output'
+            source.write_bytes(content)
+            task = await asyncio.create_subprocess_exec(
+                self.path.name, *args, '-x', language, str(source), '-o', str(output),
+                executable=self.path, cwd=directory, env=self.env, stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            )
+            stdout, stderr = await task.communicate()
+            data = output.read_bytes() if task.returncode == 0 and output.is_file() else b''
+        header = {'returncode': task.returncode, 'stdout': stdout.decode(errors='replace'), 'stderr': stderr.decode(errors='replace')}
+        return (header, data)
+    
+    def authentic(self, request):
+        """
+        returns whether request carries the secret of this worker, always True if it has none.
+        """
+        return self.secret is None or hmac.compare_digest(str(request.get('secret', '')).encode(), self.secret.encode())
+    
+    def refuse(self, request):
+        """
+        returns why request can't be compiled, or None if it can: a language other than preprocessed c++ or assembly,
+        or arguments that aren't allowed, see worker.allowed().
+        """
+        if request.get('language', 'c++-cpp-output') not in ('c++-cpp-output', 'assembler'):
+            return f'worker(). the language must be c++-cpp-output or assembler. language was [{request.get("language")}].'
+        args = request.get('args')
+        if not isinstance(args, list) or not all(isinstance(arg, str) for arg in args):
+            return 'worker(). args must be a list of strings.'
+        refused = [arg for arg in args if not worker.allowed(arg)]
+        if refused:
+            return f'worker(). the arguments are not allowed. refused was [{" ".join(refused)}].'
+        return None
+    
+    async def handle(self, reader, writer):
+        """
+        Serve the requests of a connection in turn until it closes. Every response reports the compiles running on this worker
+        and its slots, which clients use to dispatch by load. A request that is refused or can't be compiled, because the compiler
+        couldn't be started, is answered with header['error'] instead of a returncode, so the client compiles it locally.
+        A request with the wrong secret also closes the connection.
+        """
+        try:
+            while True:
+                request, content = await worker.read(reader, self.maxsize)
+                if request is None:
+                    break
+                if not self.authentic(request):
+                    writer.write(worker.pack({'error': 'worker(). the secret of the request is wrong.'}))
+                    await writer.drain()
+                    break
+                if (error := self.refuse(request)) is not None:
+                    writer.write(worker.pack({'error': error, 'running': self.running, 'slots': self.jobs}))
+                    await writer.drain()
+                    continue
+                self.running += 1
+                try:
+                    async with self.slots:
+                        header, data = await self.run(request['args'], request.get('language', 'c++-cpp-output'), content)
+                except OSError as error:
+                    header, data = {'error': f'worker(). {error}'}, b''
+                finally:
+                    self.running -= 1
+                self.served += 1
+                writer.write(worker.pack(dict(header, running=self.running, slots=self.jobs), data))
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+    
+    async def start(self):
+        """
+        Start listening, self.port holds the port once this returns.
+        """
+        self.slots = asyncio.Semaphore(self.jobs)
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+    
+    async def serve(self):
+        """
+        Start listening and serve until cancelled.
+        """
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+    
+    async def close(self):
+        """
+        Stop listening and wait for the server to close.
+        """
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        return self
@@ -1,3 +1,5 @@
+#pragma once
+
 #include <cstdio>
 
 class my_app {
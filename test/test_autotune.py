@@ -0,0 +1,44 @@
+import pathlib
+import pytest
+
+from opifex import autotune, gnu
+
+
+@pytest.fixture
+def base(tmp_path: pathlib.Path):
+    path = tmp_path / 'g++'
+    path.touch()
+    return gnu(path, 'tune', builddir=tmp_path / 'build', options={'-O1', '-Wall', '-fno-unroll-loops'})
+
+def test_family():
+    assert autotune.family('-O3') == autotune.family('-Os') == '-O'
+    assert autotune.family('-fno-unroll-loops') == autotune.family('-funroll-loops') == '-funroll-loops'
+    assert autotune.family('-march=native') == '-march' and autotune.family('-Wall') == '-Wall'
+
+def test_interval():
+    assert autotune.interval(list(range(10, 0, -1))) == (5.5, 2, 9)
+    assert autotune.interval([3, 1, 2]) == (2, 1, 3)
+    assert autotune.interval([2.0]) == (2.0, 2.0, 2.0)
+
+def test_derive(base: gnu):
+    variant = autotune.derive(base, [['-O3', '-funroll-loops'], ['-flto=4'], lambda toolchain: toolchain.addopts('-g')])
+    assert variant.options == {'-O3', '-Wall', '-funroll-loops', '-g'} and variant.lto == {'jobs': 4, 'partition': None}
+    assert base.options == {'-O1', '-Wall', '-fno-unroll-loops'} and base.lto is None
+
+def test_variants(base: gnu):
+    tuner = autotune(base, [], {'O': [['-O1'], ['-O2']], 'lto': [[], ['-flto']], 'same': [[], ['-Wall']]})
+    variants = tuner.variants()
+    assert len(variants) == 4
+    for key, variant in variants.items():
+        assert variant['toolchain'].name == f'tune-{key}' and variant['toolchain'].incremental and variant['toolchain'].outfinal
+        assert variant['toolchain'].freeze().settings['name'] == f'tune-{key}' and variant['toolchain'].freeze().settings['target'].endswith(key)
+    with pytest.raises(AssertionError):
+        autotune(base, [], {}, runs=0)
+
+def test_tune():
+    base = gnu('c:/msys64/mingw64/bin/g++.exe', 'mingw64').setstages(False, True, True)
+    tuner = autotune(base, [pathlib.Path('test/mock/main.cpp'), pathlib.Path('test/mock/app.cxx')], {'O': [['-O0'], ['-O2']]}, runs=3, warmup=1)
+    ranking = tuner.tune()
+    assert len(ranking) == 2 and all(entry['error'] is None and len(entry['times']) == 3 for entry in ranking)
+    assert ranking[0]['median'] <= ranking[1]['median'] and ranking[0]['overlaps']
+    assert all(entry['reused'] for entry in tuner.tune())
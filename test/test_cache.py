@@ -0,0 +1,66 @@
+import os
+import pathlib
+import pytest
+
+from opifex import cache
+
+
+@pytest.fixture
+def store(tmp_path: pathlib.Path):
+    return cache(tmp_path / 'cache')
+
+@pytest.fixture
+def output(tmp_path: pathlib.Path):
+    output = tmp_path / 'main.obj'
+    output.write_bytes(b'object')
+    return output
+
+def test_normalize():
+    command = ['g++', '-c', '/src/main.cpp', '-Iinclude', '-o', '/build/x/obj/main.obj', '-MMD', '-MF', '/build/x/obj/main.d', '-O2']
+    assert cache.normalize(command, {'/src/main.cpp'}) == ['-c', '-O2']
+    assert cache.normalize(command + ['-include', '/build/x/pch/app.hpp'], {'/src/main.cpp'}) == ['-c', '-O2']
+
+def test_key():
+    assert cache.key('g++:1', ['-c'], 'int main() {}') == cache.key('g++:1', ['-c'], b'int main() {}')
+    assert cache.key('g++:1', ['-c'], 'int main() {}') != cache.key('g++:2', ['-c'], 'int main() {}')
+    assert cache.key('g++:1', ['-c'], 'int main() {}') != cache.key('g++:1', ['-c', '-O2'], 'int main() {}')
+
+def test_fetch(store: cache, output: pathlib.Path, tmp_path: pathlib.Path):
+    assert store.fetch('ab' * 32, tmp_path / 'restored.obj') is None
+    store.store('ab' * 32, output, [0, '', 'warning'], ['main.cpp', 'app hpp'])
+    restored = tmp_path / 'restored.obj'
+    assert store.fetch('ab' * 32, restored, tmp_path / 'restored.d') == [0, '', 'warning']
+    assert restored.read_bytes() == b'object'
+    assert (tmp_path / 'restored.d').read_text() == f'{restored}: main.cpp \\\n app\\ hpp\n'
+    assert store.hits == store.misses == 1
+
+def test_hardlink(tmp_path: pathlib.Path, output: pathlib.Path):
+    store = cache(tmp_path / 'cache', hardlink=True)
+    store.store('cd' * 32, output, [0, '', ''])
+    restored = tmp_path / 'restored.obj'
+    store.fetch('cd' * 32, restored)
+    assert os.stat(restored).st_ino == os.stat(store.entry('cd' * 32) / 'output').st_ino
+    with open(restored, 'ab') as file:
+        file.write(b' stripped')
+    assert store.fetch('cd' * 32, restored) is None and not store.entry('cd' * 32).exists()
+
+def test_failed(store: cache, output: pathlib.Path):
+    store.store('ef' * 32, output, [1, '', 'error'])
+    assert not store.entry('ef' * 32).exists()
+
+def test_evict(tmp_path: pathlib.Path, output: pathlib.Path):
+    store = cache(tmp_path / 'cache', maxsize=1)
+    store.store('01' * 32, output, [0, '', ''])
+    os.utime(store.entry('01' * 32), ns=(0, 0))
+    store.store('02' * 32, output, [0, '', ''])
+    size = os.path.getsize(store.entry('02' * 32) / 'output') + os.path.getsize(store.entry('02' * 32) / 'meta.json')
+    assert store.evict(size) == size
+    assert not store.entry('01' * 32).exists() and store.entry('02' * 32).exists()
+    store.save()
+    assert store.stats()['size'] == 0
+
+def test_stats(store: cache, output: pathlib.Path, tmp_path: pathlib.Path):
+    store.fetch('03' * 32, tmp_path / 'missing.obj')
+    store.save()
+    assert store.stats() == {'hits': 0, 'misses': 1, 'size': 0}
+    assert cache(store.path).stats()['misses'] == 1
@@ -0,0 +1,54 @@
+import os
+import pathlib
+import pytest
+
+from opifex import depindex
+
+
+def test_parse():
+    target, deps = depindex.parse('build/main.obj: test/mock/main.cpp \\\n test/mock/app.hpp \\\n c:/with\\ space/x.hpp\n')
+    assert target == 'build/main.obj'
+    assert deps == ['test/mock/main.cpp', 'test/mock/app.hpp', 'c:/with space/x.hpp']
+
+@pytest.fixture
+def tree(tmp_path: pathlib.Path):
+    header = tmp_path / 'app.hpp'
+    header.write_text('')
+    outputs = []
+    for name in ['main', 'app', 'solo']:
+        (tmp_path / f'{name}.cpp').touch()
+    for name in ['main', 'app', 'solo']:
+        deps = [tmp_path / f'{name}.cpp'] + ([header] if name != 'solo' else [])
+        output = tmp_path / f'{name}.obj'
+        output.touch()
+        (tmp_path / f'{name}.d').write_text(f'{output}: ' + ' '.join(str(dep) for dep in deps) + '\n')
+        outputs.append(output)
+    return tmp_path, header, outputs
+
+def test_dependents(tree):
+    tmp_path, header, outputs = tree
+    index = depindex(tmp_path / 'depindex.json')
+    for output in outputs:
+        index.update(tmp_path / f'{output.stem}.d', output)
+    assert index.dependents(header) == {str(outputs[0]), str(outputs[1])}
+    index.discard(tmp_path / 'main.d')
+    assert index.dependents(header) == {str(outputs[1])}
+
+def test_stale(tree):
+    tmp_path, header, outputs = tree
+    index = depindex(tmp_path / 'depindex.json')
+    for output in outputs:
+        index.update(tmp_path / f'{output.stem}.d', output)
+    assert index.stale() == set()
+    stat = os.stat(outputs[0])
+    os.utime(header, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert index.stale() == {str(outputs[0]), str(outputs[1])}
+
+def test_save(tree):
+    tmp_path, header, outputs = tree
+    index = depindex(tmp_path / 'depindex.json')
+    index.update(tmp_path / 'main.d', outputs[0]).save()
+    (tmp_path / 'main.d').write_text('unparsed')
+    os.utime(tmp_path / 'main.d', ns=(0, index.depfiles[str(tmp_path / 'main.d')]['mtime']))
+    loaded = depindex(tmp_path / 'depindex.json').update(tmp_path / 'main.d', outputs[0])
+    assert loaded.dependents(header) == {str(outputs[0])}
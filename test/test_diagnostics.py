@@ -0,0 +1,32 @@
+import json
+
+from opifex import diagnostics
+
+
+def warning(file, line, message, option='-Wunused-variable'):
+    return {'kind': 'warning', 'option': option, 'message': message, 'children': [], 'locations': [{'caret': {'file': file, 'line': line, 'column': 5}}]}
+
+def test_parse():
+    text = 'g++: note: before\n' + json.dumps([warning('app.hpp', 1, "unused variable 'x'")]) + '\n[not json\n'
+    found, rest = diagnostics.parse(text)
+    assert [entry['message'] for entry in found] == ["unused variable 'x'"]
+    assert rest == 'g++: note: before\n\n[not json'
+    assert diagnostics.parse('') == ([], '')
+
+def test_add(tmp_path):
+    report = diagnostics()
+    header = warning('include/app.hpp', 3, "unused variable 'x'")
+    assert report.add('main.cpp', json.dumps([header, warning('main.cpp', 1, "unused variable 'y'")]), tmp_path) == ''
+    assert report.add('app.cxx', json.dumps([header]), tmp_path) == ''
+    report.add('app.cxx', json.dumps([header]), tmp_path)
+    shared = report.query(file=tmp_path / 'include' / 'app.hpp')
+    assert len(shared) == 1 and shared[0]['units'] == ['main.cpp', 'app.cxx'] and shared[0]['line'] == 3
+    assert len(report.query(kind='warning')) == 2 and report.query(kind='error') == []
+    assert len(report.query(option='-Wunused-variable')) == 2
+    assert report.report()['kinds'] == {'warning': {'distinct': 2, 'occurrences': 3}}
+
+def test_compact():
+    entry = warning('main.cpp', 2, 'message')
+    entry['children'] = [{'kind': 'note', 'message': 'declared here', 'locations': [{'caret': {'file': '/src/app.hpp', 'line': 1, 'column': 1}}]}]
+    record = diagnostics.compact(entry, '/src')
+    assert record['file'] == '/src/main.cpp' and record['children'][0]['file'] == '/src/app.hpp' and record['children'][0]['option'] is None
@@ -1,7 +1,10 @@
+import json
+import os
 import pathlib 
 import pytest
+import sys
 
-from opifex import gnu 
+from opifex import cache, gnu, probe, remote, sink, worker
 
 
 @pytest.fixture
@@ -104,14 +107,286 @@ def test_compile_kernel(compiler: gnu):
 
 @pytest.mark.asyncio
 async def test_async_compile_kernel(compiler: gnu):
-    code, stdout, stderr = await compiler.async_compile_kernel('c:/msys64/mingw64/bin/g++.exe')
+    code, stdout, stderr = await compiler.async_compile_kernel(['g++.exe'])
     assert code == 1
     assert stdout == ''
-    assert stderr == 'g++.exe: fatal error: no input files\ncompilation terminated.\r\n'
+    assert stderr == 'g++.exe: fatal error: no input files\ncompilation terminated.\n'
+
+def test_decode():
+    assert gnu.decode(b'g++.exe: fatal error: no input files\r\ncompilation terminated.\r\n') == 'g++.exe: fatal error: no input files\ncompilation terminated.\n'
+
+@pytest.mark.asyncio
+async def test_kernel_line_endings():
+    python = gnu(sys.executable, 'python')
+    cmd = [python.path.name, '-c', 'import sys; sys.stderr.buffer.write(b"error\\r\\nterminated.\\r\\n")']
+    assert python.compile_kernel(cmd)[2] == (await python.async_compile_kernel(cmd))[2] == 'error\nterminated.\n'
+    lines = []
+    await python.async_compile_kernel(cmd, lambda stream, line: lines.append(line))
+    assert lines == ['error\n', 'terminated.\n']
 
 def test_create_env(compiler: gnu):
     env = compiler.create_env()
-    assert env['Path'].startswith('C:\\msys64\\mingw64\\bin;')
+    assert env['PATH'].startswith('C:\\msys64\\mingw64\\bin;')
+    assert os.environ.get('PATH') != env['PATH']
+
+def test_launch_args(compiler: gnu):
+    args = compiler.launch_args(cwd='build')
+    assert args['executable'] == compiler.path and args['cwd'] == 'build'
+    assert 'shell' not in args and args['env']['PATH'].startswith('C:\\msys64\\mingw64\\bin;')
+
+def test_stems(files):
+    stems = gnu.stems(files + [pathlib.Path('test/main.cpp')])
+    assert stems[files[1]] == 'app'
+    assert stems[files[0]] != stems[pathlib.Path('test/main.cpp')]
+    assert stems[files[0]].startswith('main_')
+
+def test_jobs(compiler: gnu):
+    assert compiler.jobs >= 1
+    compiler.setjobs(3)
+    assert compiler.jobs == 3
+    with pytest.raises(AssertionError):
+        compiler.setjobs(0)
+    assert gnu(compiler.path, compiler.name, jobs=3).jobs == 3
+    with pytest.raises(AssertionError):
+        gnu(compiler.path, compiler.name, jobs=0)
+
+@pytest.mark.asyncio
+async def test_async_compile_jobs(compiler: gnu, files):
+    compiler.name += 'j'
+    compiler.target += 'j'
+    compiler.setjobs(2).setstages(True, True, True)
+    executable, logs = await compiler.async_compile(files)
+    assert executable
+    assert len(logs['asm']) == len(logs['obj']) == 2
+    assert logs['final'][0] == 0
+
+def test_incremental(compiler: gnu, files):
+    compiler.name += 'i'
+    compiler.target += 'i'
+    compiler.setincremental(True).setstages(False, True, True)
+    _, logs = compiler.compile(files)
+    _, logs = compiler.compile(files)
+    assert logs['rebuilt'] == []
+    assert logs['uptodate'] == files
+    assert logs['final'][0] == 0
+    compiler.addopts('-O2')
+    _, logs = compiler.compile(files)
+    assert logs['rebuilt'] == files
+
+def test_depfiles(compiler: gnu, files):
+    compiler.setdepfiles(True)
+    asm_file, command = compiler.asm_command(files[0])
+    assert command[command.index('-MF') + 1] == str(gnu.depfile(asm_file))
+    compiler.setstages(True, True, True)
+    obj_file, command = compiler.obj_command(asm_file)
+    assert '-MMD' not in command
+
+def test_cache(compiler: gnu, files, tmp_path: pathlib.Path):
+    compiler.setcache(cache(tmp_path)).setstages(False, True, True)
+    compiler.name += 'c'
+    _, logs = compiler.compile(files)
+    assert logs['cache'] == {'hits': 0, 'misses': 2}
+    compiler.name += 'c'
+    _, logs = compiler.compile(files)
+    assert logs['cache'] == {'hits': 2, 'misses': 0}
+    assert logs['final'][0] == 0
+
+def test_pch_cache(compiler: gnu, files, tmp_path: pathlib.Path):
+    compiler.setcache(cache(tmp_path)).setpch('test/mock/app.hpp').setstages(False, True, True)
+    compiler.name += 'pc'
+    _, logs = compiler.compile(files)
+    assert logs['cache'] == {'hits': 0, 'misses': 2}
+    compiler.name += 'c'
+    _, logs = compiler.compile(files)
+    assert logs['cache'] == {'hits': 2, 'misses': 0}
+    assert logs['final'][0] == 0
+
+def test_pch(compiler: gnu, files, tmp_path: pathlib.Path):
+    compiler.builddir = tmp_path
+    assert gnu(compiler.path, compiler.name, pch='test/mock/app.hpp').pch == pathlib.Path('test/mock/app.hpp')
+    with pytest.raises(AssertionError):
+        gnu(compiler.path, compiler.name, pch='test/mock/missing.hpp')
+    compiler.setpch('test/mock/app.hpp').setstages(False, True, True)
+    obj_file, command = compiler.obj_command(files[0])
+    assert command[command.index('-include') + 1].endswith('app.hpp')
+    _, logs = compiler.compile(files)
+    assert logs['pch']['built'] and logs['pch']['gch'].exists()
+    assert logs['final'][0] == 0
+    _, logs = compiler.compile(files)
+    assert not logs['pch']['built']
+
+@pytest.mark.asyncio
+async def test_stream_compile(compiler: gnu, files):
+    compiler.name += 's'
+    compiler.target += 's'
+    compiler.setstages(False, True, True)
+    events = [event async for event in compiler.stream_compile(files)]
+    assert [event['stage'] for event in events[:-1]].count('obj') == 2
+    assert events[-2]['stage'] == 'final' and events[-2]['result'][0] == 0
+    assert events[-1]['kind'] == 'done' and events[-1]['files'] == events[-2]['output']
+
+@pytest.mark.asyncio
+async def test_async_compile_kernel_callback(compiler: gnu):
+    lines = []
+    code, stdout, stderr = await compiler.async_compile_kernel(['g++.exe'], lambda stream, line: lines.append((stream, line)))
+    assert code == 1
+    assert stdout == stderr == ''
+    assert lines[0] == ('stderr', 'g++.exe: fatal error: no input files\n')
+
+def test_policy(compiler: gnu, files):
+    assert compiler.policy == 'stop'
+    compiler.setpolicy('keep_going').setstages(False, True, False)
+    _, logs = compiler.compile(files)
+    assert logs['policy'] == {'policy': 'keep_going', 'completed': 2, 'failed': 0, 'cancelled': 0, 'skipped': 0}
+    with pytest.raises(AssertionError):
+        compiler.setpolicy('ignore')
+    assert gnu(compiler.path, compiler.name, policy='fail_fast').policy == 'fail_fast'
+    with pytest.raises(AssertionError):
+        gnu(compiler.path, compiler.name, policy='bogus')
+
+@pytest.mark.asyncio
+async def test_fail_fast(compiler: gnu, files):
+    compiler.name += 'f'
+    compiler.setpolicy('fail_fast').setstages(False, True, False)
+    _, logs = await compiler.async_compile(files + [pathlib.Path('test/mock/app.hpp.missing')])
+    assert logs['policy']['failed'] == 1
+    assert logs['policy']['completed'] + logs['policy']['cancelled'] + logs['policy']['skipped'] == len(files)
+
+def test_unity(compiler: gnu, files):
+    compiler.name += 'u'
+    compiler.target += 'u'
+    compiler.setunity(True, batch=1, exclude=[files[1]])
+    sources, members = compiler.unity_sources(files)
+    assert sources == list(members) + [files[1]]
+    assert list(members.values()) == [[files[0]]]
+    compiler.setunity(True).setstages(False, True, True)
+    _, logs = compiler.compile(files)
+    assert len(logs['unity']) == 1 and logs['final'][0] == 0
+
+def test_profile(compiler: gnu, files):
+    compiler.name += 'p'
+    compiler.target += 'p'
+    compiler.setprofile(True).setstages(False, True, True)
+    _, logs = compiler.compile(files)
+    report = logs['profile'].report()
+    assert report['stages']['obj']['count'] == len(files) and report['stages']['final']['count'] == 1
+    assert all(record['wall'] > 0 for record in logs['profile'].records)
+    assert compiler.setprofile(False).compile(files)[1]['profile'] is None
+
+def test_analyze(compiler: gnu, files):
+    report = compiler.analyze(files).report()
+    app = [entry for entry in report if entry['header'].endswith('app.hpp')]
+    assert len(app) == 1 and app[0]['count'] >= 1 and app[0]['lines'] > 0
+    assert compiler.analyze_command(files[0])[1:4] == ['-fsyntax-only', '-H', '-ftime-report']
+
+def test_freeze(compiler: gnu):
+    frozen = compiler.freeze()
+    assert compiler.freeze() is frozen
+    assert frozen['options'] == tuple(sorted(compiler.options))
+    compiler.addopts('-O2')
+    assert compiler.freeze().fingerprint != frozen.fingerprint
+    compiler.discardopts('-O2')
+    assert compiler.freeze().fingerprint == frozen.fingerprint
+    assert compiler.setjobs(3).setpolicy('keep_going').setprofile(True).freeze().fingerprint == frozen.fingerprint
+    assert compiler.freeze().runtime['jobs'] == '3'
+    assert compiler.setstages(True, True, True).freeze().fingerprint != frozen.fingerprint
+
+def test_addsupportedopts(compiler: gnu):
+    compiler.addsupportedopts('-Wshadow', '-Wbogus-flag')
+    assert '-Wshadow' in compiler.options and '-Wbogus-flag' not in compiler.options
+    assert compiler.identity() == compiler.probe.identity()
+    queried = probe(compiler.path)
+    assert gnu(compiler.path, compiler.name, probe=queried).probe is queried
+
+def test_lto(compiler: gnu, files):
+    assert compiler.lto is None
+    compiler.setlto(True, 'auto', 'balanced').setstages(False, True, True)
+    _, command = compiler.obj_command(files[0])
+    assert command[-1] == '-flto'
+    _, command = compiler.final_command(files)
+    assert command[command.index('-flto=auto') + 1] == '-flto-partition=balanced'
+    assert gnu.lto_args(4) == ['-flto=4'] and gnu.lto_args() == ['-flto']
+    assert compiler.archivers()[0].name.startswith('gcc-ar')
+    _, logs = compiler.compile(files)
+    assert logs['final'][0] == 0 and logs['lto']['link'] > 0
+    with pytest.raises(AssertionError):
+        compiler.setlto(True, 0)
+
+def test_archive(compiler: gnu, files):
+    library = gnu(compiler.path, 'mingw64lib', target='opifex_lib').setstages(False, True, False).setarchive(True, thin=True)
+    archive, logs = library.compile(files[1:])
+    assert archive == library.archive_path() and logs['archive'][0] == 0
+    assert archive.read_bytes().startswith(b'!<thin>\n')
+    _, _, commands = library.archive_commands([pathlib.Path(library.builddir / library.name / 'obj' / (files[1].stem + '.obj'))])
+    assert commands[-1][1] == 'rcsT'
+    compiler.uselib(library).setstages(False, True, True)
+    assert 'opifex_lib' in compiler.libs and library.builddir in compiler.libpaths
+    assert archive in compiler.archives
+
+def test_jobserver(compiler: gnu, files):
+    compiler.setjobserver(True).setjobs(2).setstages(False, True, True)
+    _, logs = compiler.compile(files)
+    assert logs['final'][0] == 0 and logs.get('jobserver', 'server') in ('client', 'server')
+
+@pytest.mark.asyncio
+async def test_jobserver_profile(compiler: gnu, files):
+    compiler.setjobserver(True).setjobs(2).setprofile(True).setstages(False, True, True)
+    _, logs = await compiler.async_compile(files)
+    assert logs['final'][0] == 0 and max(logs['profile'].lanes()) < 2
+
+@pytest.mark.asyncio
+async def test_memory(compiler: gnu, files):
+    assert gnu(compiler.path, compiler.name, memory=True).memory == {'reserve': 512 << 20, 'default': None}
+    compiler.setmemory(True, reserve=0).setjobs(2).setstages(False, True, True)
+    _, logs = await compiler.async_compile(files)
+    assert logs['final'][0] == 0 and logs['memory']['throttled'] == []
+    assert (compiler.builddir / compiler.name / 'history.json').exists()
+    compiler.name += 'm'
+    compiler.setstages(True, True, True)
+    _, logs = await compiler.async_compile(files)
+    history = json.loads((compiler.builddir / compiler.name / 'history.json').read_text())
+    assert logs['final'][0] == 0 and sorted(history) == sorted(pathlib.Path(file).as_posix() for file in files)
+
+@pytest.mark.asyncio
+async def test_schedule(compiler: gnu, files, tmp_path: pathlib.Path):
+    compiler.builddir = tmp_path
+    compiler.setschedule(True).setincremental(False).setstages(False, True, True)
+    _, logs = await compiler.async_compile(files)
+    assert logs['final'][0] == 0 and logs['schedule']['predicted'] is None
+    _, logs = await compiler.async_compile(files)
+    assert sorted(logs['schedule']['order']) == sorted(files) and logs['schedule']['predicted'] > 0 and logs['schedule']['actual'] > 0
+
+@pytest.mark.asyncio
+async def test_remote(compiler: gnu, files):
+    daemon = await worker(compiler.path).start()
+    compiler.setremote(remote([('127.0.0.1', daemon.port, 2)])).setincremental(False).setstages(False, True, True)
+    _, logs = await compiler.async_compile(files)
+    await daemon.close()
+    assert logs['final'][0] == 0 and logs['remote']['remote'] == len(files) and logs['remote']['local'] == 0
+    _, logs = await compiler.async_compile(files)
+    assert logs['final'][0] == 0 and logs['remote']['local'] == len(files)
+
+def test_fused(compiler: gnu, files):
+    compiler.setstages(True, True, True).setprofile(True)
+    _, separate = compiler.compile(files)
+    compiler.setfused(True)
+    asmfile, objfile, command = compiler.fused_command(files[0])
+    assert '-save-temps' in command and command[command.index('-o') + 1] == str(objfile) and asmfile.suffix == '.s'
+    _, fused = compiler.compile(files)
+    assert fused['final'][0] == 0 and len(fused['profile'].records) < len(separate['profile'].records)
+    assert list(fused['asm']) == list(separate['asm']) and list(fused['obj']) == list(separate['obj'])
+    assert asmfile.exists() and not asmfile.with_suffix('.ii').exists()
+
+def test_sink(compiler: gnu, files):
+    assert gnu(compiler.path, compiler.name, sink=True).sink == {'head': 4096, 'tail': 4096}
+    compiler.setsink(True, 64, 64).setstages(False, True, True)
+    _, logs = compiler.compile(files)
+    assert logs['final'][0] == 0 and logs['final'][1] == '' and isinstance(logs['final'][2], sink)
+    assert logs['obj'][files[0]][2].path.parent == compiler.builddir / compiler.name / 'logs'
 
-def test_create_prefix(compiler: gnu):
-    assert compiler.create_prefix() == 'cd "c:/msys64/mingw64/bin" && '
+def test_diagnostics(compiler: gnu, files):
+    compiler.setdiagnostics(True).setstages(False, True, True)
+    _, command = compiler.obj_command(files[0])
+    assert command[-1] == '-fdiagnostics-format=json'
+    _, logs = compiler.compile(files)
+    assert logs['final'][0] == 0 and logs['diagnostics'].query(kind='error') == []
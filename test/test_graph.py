@@ -0,0 +1,76 @@
+import asyncio
+import pathlib
+import pytest
+
+from opifex import graph
+
+
+class toolchain:
+    def __init__(self, log, fail=False, error=False):
+        self.log = log
+        self.fail = fail
+        self.error = error
+        self.archive = None
+    
+    async def async_prepare(self, files, emit, lines=False):
+        return (files, {'members': dict(), 'failed': asyncio.Event(), 'emit': emit})
+    
+    async def async_compile_unit(self, file, build):
+        await asyncio.sleep(0)
+        self.log.append(file.name)
+        if self.error:
+            raise RuntimeError(file.name)
+        if self.fail:
+            build['failed'].set()
+            return None
+        return file.with_suffix('.obj')
+    
+    async def async_link(self, build, files, nfiles):
+        self.log.append('link ' + files[0].stem if not build['failed'].is_set() else 'skip ' + files[0].stem)
+        build['emit']({'kind': 'done'})
+        return (nfiles, {'final': [1 if build['failed'].is_set() else 0, '', '']})
+
+@pytest.fixture
+def sources(tmp_path: pathlib.Path):
+    for name, size in (('small.cpp', 10), ('large.cpp', 1000), ('lib.cpp', 100), ('app.cpp', 10)):
+        (tmp_path / name).write_text('x' * size)
+    return tmp_path
+
+def test_add():
+    g = graph(jobs=1).add('lib', toolchain([]), [])
+    with pytest.raises(AssertionError):
+        g.add('lib', toolchain([]), [])
+    with pytest.raises(AssertionError):
+        g.add('app', toolchain([]), [], ['missing'])
+
+def test_critical_path(sources: pathlib.Path):
+    log = []
+    g = graph(jobs=1)
+    g.add('lib', toolchain(log), [sources / 'lib.cpp'])
+    g.add('app', toolchain(log), [sources / 'app.cpp'], ['lib'])
+    g.add('other', toolchain(log), [sources / 'small.cpp', sources / 'large.cpp'])
+    events = []
+    results = g.compile(events.append)
+    assert set(results) == {'lib', 'app', 'other'}
+    assert log.index('large.cpp') < log.index('small.cpp')
+    assert log.index('link lib') < log.index('link app')
+    assert {event['target'] for event in events} == {'lib', 'app', 'other'}
+    assert g.order[0] == ('unit', 'other', 1)
+
+def test_failed_dependency(sources: pathlib.Path):
+    log = []
+    g = graph(jobs=2).add('lib', toolchain(log, fail=True), [sources / 'lib.cpp']).add('app', toolchain(log), [sources / 'app.cpp'], ['lib'])
+    results = g.compile()
+    assert 'skip app' in log and results['app'][1]['final'][0] == 1
+
+def test_error(sources: pathlib.Path):
+    log = []
+    g = graph(jobs=2).add('lib', toolchain(log, error=True), [sources / 'lib.cpp']).add('other', toolchain(log), [sources / 'small.cpp', sources / 'large.cpp'])
+    
+    async def build():
+        with pytest.raises(RuntimeError):
+            await g.async_compile()
+        await asyncio.wait_for(asyncio.gather(*(asyncio.all_tasks() - {asyncio.current_task()})), 5)
+    
+    asyncio.run(build())
+    assert 'link small' in log
@@ -0,0 +1,33 @@
+import pathlib
+import pytest
+
+from opifex import headers
+
+
+@pytest.fixture
+def tree(tmp_path: pathlib.Path):
+    for name, lines in (('main.cpp', 2), ('a.hpp', 3), ('b.hpp', 5)):
+        (tmp_path / name).write_text('x\n' * lines)
+    return tmp_path
+
+def test_parse():
+    text = '. /inc/a.hpp\n.. /inc/b.hpp\nMultiple include guards may be useful for:\n/inc/b.hpp\n TOTAL                              :   0.11          0.07          0.19           17M\n'
+    assert headers.parse(text) == ([(1, '/inc/a.hpp'), (2, '/inc/b.hpp')], 0.19)
+    assert headers.parse('. /inc/a.hpp\n')[1] is None
+
+def test_add(tree: pathlib.Path):
+    a, b = (tree / 'a.hpp').as_posix(), (tree / 'b.hpp').as_posix()
+    h = headers().add(tree / 'main.cpp', f'. {a}\n.. {b}\n. {b}\n', 2.0)
+    root = h.units[(tree / 'main.cpp').as_posix()]['tree']
+    assert root['lines'] == 15 and h.units[(tree / 'main.cpp').as_posix()]['time'] == 2.0
+    assert [(child['header'], child['lines']) for child in root['children']] == [(a, 8), (b, 5)]
+    assert root['children'][0]['time'] == pytest.approx(2.0 * 8 / 15)
+
+def test_report(tree: pathlib.Path):
+    a, b = (tree / 'a.hpp').as_posix(), (tree / 'b.hpp').as_posix()
+    h = headers().add(tree / 'main.cpp', f'. {a}\n.. {b}\n', 1.0).add(tree / 'other.cpp', f'. {b}\n', 1.0)
+    report = h.report()
+    assert [(entry['header'], entry['count'], entry['lines']) for entry in report] == [(b, 2, 10), (a, 1, 8)]
+    assert report[0]['includers'] == {a: 1, (tree / 'other.cpp').as_posix(): 1}
+    assert report[0]['time'] == pytest.approx(5 / 10 + 1.0)
+    assert h.report(top=1) == report[:1]
@@ -0,0 +1,42 @@
+import asyncio
+import os
+import pytest
+
+from opifex import jobserver
+
+
+def test_parse():
+    assert jobserver.parse(' -j4 --jobserver-auth=fifo:/tmp/GMfifo1') == ('fifo', '/tmp/GMfifo1')
+    assert jobserver.parse('-j --jobserver-fds=3,4 --jobserver-auth=5,6') == ('fds', 5, 6)
+    assert jobserver.parse('-j4 --jobserver-auth=gmake_semaphore_1234') is None
+    assert jobserver.parse('-k') is None and jobserver.parse(None) is None
+
+@pytest.mark.skipif(os.name != 'posix', reason='jobserver descriptors need posix')
+def test_server():
+    server = jobserver.server(2)
+    tokens = [server.acquire(), server.acquire()]
+    assert tokens == [None, b'+']
+    [server.release(token) for token in tokens]
+    assert server.makeflags('-k -j8 --jobserver-auth=3,4') == f'-k -j2 --jobserver-auth={server.read},{server.write}'
+    assert server.fds() == (server.read, server.write)
+    server.close()
+
+@pytest.mark.skipif(os.name != 'posix', reason='jobserver descriptors need posix')
+def test_client(tmp_path):
+    fifo = tmp_path / 'fifo'
+    os.mkfifo(fifo)
+    make = os.open(fifo, os.O_RDWR)
+    os.write(make, b'ab')
+    client = jobserver.client(f' -j3 --jobserver-auth=fifo:{fifo}')
+    assert client.jobs == 3 and client.fds() == ()
+    
+    async def acquire():
+        return [await client.async_acquire() for _ in range(3)]
+    
+    tokens = asyncio.run(acquire())
+    assert tokens == [None, b'a', b'b']
+    [client.release(token) for token in tokens]
+    assert os.read(make, 2) == b'ab'
+    client.close()
+    os.close(make)
+    assert jobserver.client('-j3') is None and jobserver.client(f'--jobserver-auth=fifo:{tmp_path / "missing"}') is None
@@ -0,0 +1,52 @@
+import os
+import pathlib
+import pytest
+
+from opifex import manifest
+
+
+@pytest.fixture
+def files(tmp_path: pathlib.Path):
+    source = tmp_path / 'main.cpp'
+    source.write_text('int main() {}\n')
+    output = tmp_path / 'main.obj'
+    output.write_text('obj')
+    return source, output
+
+def test_uptodate(tmp_path: pathlib.Path, files):
+    source, output = files
+    m = manifest(tmp_path / 'manifest.json')
+    assert not m.uptodate(output, [source], ['g++', '-c'])
+    m.record(output, [source], ['g++', '-c'])
+    assert m.uptodate(output, [source], ['g++', '-c'])
+    assert not m.uptodate(output, [source], ['g++', '-c', '-O3'])
+    assert not m.uptodate(output, [source, output], ['g++', '-c'])
+
+def test_fingerprint(tmp_path: pathlib.Path, files):
+    source, output = files
+    m = manifest(tmp_path / 'manifest.json')
+    m.record(output, [source], ['g++'])
+    source.write_text('int main() { return 1; }\n')
+    assert not m.uptodate(output, [source], ['g++'])
+    assert m.fingerprint(tmp_path / 'missing.cpp') is None
+
+def test_hashing(tmp_path: pathlib.Path, files):
+    source, output = files
+    m = manifest(tmp_path / 'manifest.json', hashing=True)
+    m.record(output, [source], ['g++'])
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert m.uptodate(output, [source], ['g++'])
+    assert not manifest(tmp_path / 'manifest.json').record(output, [source], ['g++']).uptodate(output, [tmp_path / 'other'], ['g++'])
+
+def test_save(tmp_path: pathlib.Path, files):
+    source, output = files
+    manifest(tmp_path / 'build' / 'manifest.json').record(output, [source], ['g++']).save()
+    m = manifest(tmp_path / 'build' / 'manifest.json')
+    assert m.uptodate(output, [source], ['g++'])
+    m.discard(output)
+    assert not m.uptodate(output, [source], ['g++'])
+
+def test_corrupt(tmp_path: pathlib.Path):
+    (tmp_path / 'manifest.json').write_text('{')
+    assert manifest(tmp_path / 'manifest.json').entries == {}
@@ -0,0 +1,63 @@
+import asyncio
+import json
+
+from opifex import memory
+
+
+def test_meminfo():
+    assert memory.meminfo('MemTotal:       16000000 kB\nMemAvailable:    8000000 kB\n') == 8000000 * 1024
+    assert memory.meminfo('MemTotal:       16000000 kB\n') is None
+
+def test_cgroup(tmp_path):
+    (tmp_path / 'cgroup').write_text('0::/build\n')
+    (tmp_path / 'build').mkdir()
+    (tmp_path / 'build' / 'memory.max').write_text('1000\n')
+    (tmp_path / 'build' / 'memory.current').write_text('400\n')
+    assert memory.cgroup(tmp_path / 'cgroup', str(tmp_path)) == 600
+    (tmp_path / 'build' / 'memory.max').write_text('max\n')
+    assert memory.cgroup(tmp_path / 'cgroup', str(tmp_path)) is None
+    (tmp_path / 'cgroup').write_text('4:cpu,memory:/build\n')
+    (tmp_path / 'memory').mkdir()
+    (tmp_path / 'memory' / 'memory.limit_in_bytes').write_text('2000\n')
+    (tmp_path / 'memory' / 'memory.usage_in_bytes').write_text('500\n')
+    assert memory.cgroup(tmp_path / 'cgroup', str(tmp_path)) == 1500
+    assert memory.cgroup(tmp_path / 'missing', str(tmp_path)) is None
+
+def test_estimate(tmp_path):
+    (tmp_path / 'history.json').write_text(json.dumps({'a.cpp': 100, 'b.cpp': 300, 'c.cpp': 200}))
+    history = memory(tmp_path / 'history.json', reserve=0)
+    assert history.estimate('b.cpp') == 300 and history.estimate('d.cpp') == 200
+    assert memory(tmp_path / 'history.json', default=50).estimate('d.cpp') == 50
+    assert memory(tmp_path / 'missing.json').estimate('d.cpp') == 0
+
+def test_admits(tmp_path):
+    history = memory(tmp_path / 'history.json', reserve=100, default=400)
+    assert history.admits('a.cpp', 0) and history.admits('a.cpp', None)
+    history.running['b.cpp'] = 400
+    assert history.admits('a.cpp', 900) and not history.admits('a.cpp', 899)
+
+def test_admit(tmp_path, monkeypatch):
+    monkeypatch.setattr(memory, 'available', staticmethod(lambda: 1000))
+    history = memory(tmp_path / 'history.json', reserve=0, default=600, interval=10)
+    
+    async def build():
+        await history.admit('a.cpp')
+        waiting = asyncio.create_task(history.admit('b.cpp'))
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        history.observe('a.cpp', 700)
+        history.release('a.cpp')
+        await waiting
+    
+    asyncio.run(build())
+    assert list(history.running) == ['b.cpp']
+    assert [(event['file'], event['running']) for event in history.throttled] == [('b.cpp', 1)]
+    history.save()
+    assert memory(tmp_path / 'history.json').history == {'a.cpp': 700}
+
+def test_observe(tmp_path):
+    (tmp_path / 'history.json').write_text(json.dumps({'a.cpp': 900}))
+    history = memory(tmp_path / 'history.json')
+    history.observe('a.cpp', 300)
+    history.observe('a.cpp', 200)
+    assert history.history == {'a.cpp': 300}
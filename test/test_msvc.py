@@ -129,3 +129,12 @@ async def test_async_compile_kernel(compiler: msvc, files):
     assert all(objs)
     assert target is not None
     assert logs[0][0] == logs[1][0] == 0
+
+def test_freeze(compiler: msvc):
+    frozen = compiler.freeze()
+    assert compiler.freeze() is frozen
+    assert frozen['options'] == tuple(sorted(compiler.options))
+    compiler.addopts('/O2')
+    assert compiler.freeze().fingerprint != frozen.fingerprint
+    compiler.discardopts('/O2')
+    assert compiler.freeze().fingerprint == frozen.fingerprint
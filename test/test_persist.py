@@ -0,0 +1,11 @@
+import json
+import pathlib
+
+from opifex import persist
+
+
+def test_write(tmp_path: pathlib.Path):
+    path = persist.write(tmp_path / 'state' / 'history.json', {'a': 1})
+    assert json.loads(path.read_text()) == {'a': 1}
+    persist.write(path, {'b': 2})
+    assert json.loads(path.read_text()) == {'b': 2} and list(path.parent.iterdir()) == [path]
@@ -0,0 +1,39 @@
+import json
+import os
+import pathlib
+import pytest
+
+from opifex import probe
+
+
+@pytest.fixture
+def compiler(tmp_path: pathlib.Path):
+    path = tmp_path / 'g++'
+    path.write_text('')
+    return path
+
+def test_parse_includes():
+    text = 'ignoring nonexistent directory "/usr/local/include/x86_64-linux-gnu"\n#include "..." search starts here:\n#include <...> search starts here:\n /usr/include/c++/12\n /usr/include\n /Library/Frameworks (framework directory)\nEnd of search list.\n'
+    assert probe.parse_includes(text) == ['/usr/include/c++/12', '/usr/include', '/Library/Frameworks']
+
+def test_cached(tmp_path: pathlib.Path, compiler: pathlib.Path):
+    p = probe(compiler, tmp_path / 'cache')
+    (tmp_path / 'cache').mkdir()
+    (tmp_path / 'cache' / 'probe.json').write_text(json.dumps({p.identity(): {'version': '12', 'flags': {'-Wshadow': True, '-Wbogus': False}}}))
+    assert p.version() == '12'
+    assert p.supports('-Wshadow') and not p.supports('-Wbogus') and not p.supports('-Wno-bogus')
+
+def test_identity(tmp_path: pathlib.Path, compiler: pathlib.Path):
+    p = probe(compiler, tmp_path / 'cache')
+    identity = p.identity()
+    assert identity.startswith(compiler.resolve().as_posix())
+    stat = os.stat(compiler)
+    os.utime(compiler, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert p.identity() != identity
+
+def test_save(tmp_path: pathlib.Path, compiler: pathlib.Path):
+    p = probe(compiler, tmp_path / 'cache')
+    assert p.query('machine', lambda: 'x86_64-linux-gnu') == 'x86_64-linux-gnu'
+    assert probe(compiler, tmp_path / 'cache').query('machine', lambda: 'other') == 'x86_64-linux-gnu'
+    compiler.write_text('changed')
+    assert probe(compiler, tmp_path / 'cache').query('machine', lambda: 'other') == 'other'
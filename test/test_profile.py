@@ -0,0 +1,30 @@
+import json
+import pathlib
+
+from opifex import profile
+
+
+def test_report():
+    p = profile()
+    assert p.report()['wall'] == 0.0
+    p.add('obj', 'a.cpp', 0.0, 2.0, {'user': 1.5, 'system': 0.25, 'maxrss': 100})
+    p.add('obj', 'b.cpp', 1.0, 2.0)
+    p.add('final', 'app', 2.0, 3.0, {'user': 0.5, 'system': 0.0, 'maxrss': 300})
+    report = p.report(top=1)
+    assert report['wall'] == 3.0 and report['final'] == 1.0
+    assert report['stages']['obj'] == {'count': 2, 'wall': 3.0, 'user': 1.5, 'system': 0.25, 'maxrss': 100}
+    assert [r['file'] for r in report['slowest']] == ['a.cpp']
+    assert [r['file'] for r in report['largest']] == ['app']
+    assert report['lanes'] == 2 and report['idle'] == 2.0
+
+def test_lanes():
+    p = profile()
+    p.add('asm', 'a.cpp', 0.0, 1.0).add('asm', 'b.cpp', 0.5, 1.5).add('asm', 'c.cpp', 1.0, 2.0)
+    assert p.lanes() == [0, 1, 0]
+
+def test_trace(tmp_path: pathlib.Path):
+    p = profile().add('obj', 'src/a.cpp', 1.0, 1.5, {'user': 0.25}).add('final', 'app', 1.5, 2.0)
+    p.save(tmp_path / 'trace.json')
+    events = json.loads((tmp_path / 'trace.json').read_text())['traceEvents']
+    assert [(e['name'], e['cat'], e['ph'], e['ts'], e['dur'], e['tid']) for e in events] == [('a.cpp', 'obj', 'X', 0.0, 500000.0, 0), ('app', 'final', 'X', 500000.0, 500000.0, 0)]
+    assert events[0]['args']['user'] == 0.25 and events[1]['args']['user'] is None
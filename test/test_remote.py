@@ -0,0 +1,78 @@
+import asyncio
+import os
+import pathlib
+import pytest
+
+from opifex import remote, worker
+
+
+def test_args():
+    command = ['g++.exe', '-c', 'c:/src/main.cpp', '-include', 'build/pch/app.hpp', '-Iinclude', '-o', 'build/main.obj', '-MMD', '-MF', 'build/main.d', '-O2']
+    assert remote.args(command, {'c:/src/main.cpp'}) == ['-c', '-O2']
+    assert remote.language('build/asm/main.s') == 'assembler' and remote.language('main.cpp') == 'c++-cpp-output'
+
+def test_pick():
+    executor = remote([('a', 1, 2), ('b', 2, 4)])
+    a, b = executor.workers
+    assert executor.pick() is a
+    a['running'] = 1
+    assert executor.pick() is b
+    b['load'] = 3
+    assert executor.pick() is a
+    a['running'] = 2
+    b['running'] = 4
+    assert executor.pick() is None
+    with pytest.raises(AssertionError):
+        remote([('a', 1, 0)])
+
+def test_unreachable(tmp_path):
+    executor = remote([('127.0.0.1', 1, 1)], timeout=1)
+    assert executor.compile(['g++', '-c'], 'main.cpp', 'int x;', tmp_path / 'main.obj') is None
+    assert not executor.available() and executor.report() == {'127.0.0.1:1': {'compiled': 0, 'failures': 1}}
+    assert asyncio.run(executor.async_compile(['g++', '-c'], 'main.cpp', 'int x;', tmp_path / 'main.obj')) is None
+
+@pytest.fixture
+def compiler(tmp_path: pathlib.Path):
+    path = tmp_path / 'cc'
+    path.write_text('#!/bin/sh\nwhile [ "$1" != "-o" ]; do last="$1"; shift; done\ngrep -q error "$last" && { echo "$last: error" >&2; exit 1; }\ncp "$last" "$2"\n')
+    path.chmod(0o755)
+    return path
+
+@pytest.mark.skipif(os.name != 'posix', reason='the fake compiler is a shell script')
+def test_worker(compiler, tmp_path):
+    async def build():
+        daemon = await worker(compiler, jobs=1).start()
+        executor = remote([('127.0.0.1', daemon.port, 2)])
+        results = await asyncio.gather(*[executor.async_compile(['cc', '-c'], 'main.cpp', f'int x{i};', tmp_path / f'{i}.obj') for i in range(3)])
+        failed = await asyncio.to_thread(executor.compile, ['cc', '-c'], 'bad.cpp', 'error', tmp_path / 'bad.obj')
+        await daemon.close()
+        return results, failed, daemon.served
+    
+    results, failed, served = asyncio.run(build())
+    assert results == [[0, '', '']] * 3 and served == 4
+    assert [(tmp_path / f'{i}.obj').read_text() for i in range(3)] == ['int x0;', 'int x1;', 'int x2;']
+    assert failed[0] == 1 and 'error' in failed[2] and not (tmp_path / 'bad.obj').exists()
+
+def test_allowed():
+    assert all(worker.allowed(arg) for arg in ['-c', '-S', '-O2', '-Wall', '-fno-exceptions', '-fvisibility=hidden', '-march=native', '-g', '-std=c++20', '-DNDEBUG'])
+    assert not any(worker.allowed(arg) for arg in ['-wrapper', '-fplugin=evil.so', '-B/tmp', '-specs=evil', '@args', '-o', '-x', 'main.cpp', '-Wl,-evil', '-fmodule-mapper=|sh', '-fdeps-file=/tmp/x', '-fdiagnostics-add-output=sarif:file=/tmp/x'])
+    with pytest.raises(AssertionError):
+        worker('/bin/sh', host='0.0.0.0')
+    assert worker('/bin/sh', host='0.0.0.0', secret='key').secret == 'key'
+    assert worker('sh').path.is_absolute()
+
+@pytest.mark.skipif(os.name != 'posix', reason='the fake compiler is a shell script')
+def test_refused(compiler, tmp_path):
+    async def build():
+        daemon = await worker(compiler, jobs=1, secret='key', maxsize=64).start()
+        results = [
+            await remote([('127.0.0.1', daemon.port, 1)], secret='key').async_compile(['cc', '-c', '-wrapper', '/bin/sh,-c,touch pwned'], 'main.cpp', 'int x;', tmp_path / 'a.obj'),
+            await remote([('127.0.0.1', daemon.port, 1)], secret='wrong').async_compile(['cc', '-c'], 'main.cpp', 'int x;', tmp_path / 'b.obj'),
+            await remote([('127.0.0.1', daemon.port, 1)], secret='key').async_compile(['cc', '-c'], 'main.cpp', 'x' * 65, tmp_path / 'c.obj'),
+            await remote([('127.0.0.1', daemon.port, 1)], secret='key').async_compile(['cc', '-c'], 'main.cpp', 'int x;', tmp_path / 'd.obj')
+        ]
+        await daemon.close()
+        return results, daemon.served
+    
+    results, served = asyncio.run(build())
+    assert results == [None, None, None, [0, '', '']] and served == 1
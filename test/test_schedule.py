@@ -0,0 +1,33 @@
+import json
+
+from opifex import schedule
+
+
+def test_makespan():
+    assert schedule.makespan([3, 3, 2, 2, 2], 2) == 7
+    assert schedule.makespan([2, 2, 2, 3, 3], 2) == 7
+    assert schedule.makespan([1, 1, 1, 1, 4], 2) == 6
+    assert schedule.makespan([4, 1, 1, 1, 1], 2) == 4
+    assert schedule.makespan([], 4) == 0.0
+
+def test_estimate(tmp_path):
+    (tmp_path / 'a.cpp').write_text('a' * 100)
+    (tmp_path / 'b.cpp').write_text('b' * 50)
+    (tmp_path / 'c.hpp').write_text('c' * 50)
+    history = schedule(tmp_path / 'durations.json')
+    assert history.rate() is None and history.estimate(tmp_path / 'a.cpp') is None
+    history.record(tmp_path / 'a.cpp', 2.0)
+    assert history.rate() == 0.02 and history.estimate(tmp_path / 'a.cpp') == 2.0
+    assert history.estimate(tmp_path / 'b.cpp') == 1.0 and history.estimate(tmp_path / 'b.cpp', [tmp_path / 'c.hpp']) == 2.0
+
+def test_order(tmp_path):
+    files = [tmp_path / f'{name}.cpp' for name in 'abcd']
+    [file.write_text('x' * 10) for file in files]
+    history = schedule(tmp_path / 'durations.json')
+    assert history.order(files) == files and history.predict(files, 2) is None
+    history.record(files[0], 1.0).record(files[1], 1.0).record(files[2], 4.0)
+    assert history.order(files) == [files[2], files[3], files[0], files[1]]
+    assert history.predict(history.order(files), 2) == 4.0 and history.predict(files, 2) == 5.0
+    history.save()
+    assert json.loads((tmp_path / 'durations.json').read_text())[files[2].as_posix()] == {'time': 4.0, 'size': 10}
+    assert schedule(tmp_path / 'durations.json').history == history.history
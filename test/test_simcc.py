@@ -0,0 +1,82 @@
+import asyncio
+import os
+import pathlib
+import subprocess
+import sys
+import time
+import pytest
+
+from opifex import cache, gnu
+
+SIMCC = pathlib.Path(__file__).resolve().parent.parent / 'bench' / 'simcc.py'
+
+pytestmark = pytest.mark.skipif(os.name != 'posix', reason='the simulated compiler is started through its shebang')
+
+
+def run(*args, env=None):
+    return subprocess.run([sys.executable, str(SIMCC), *map(str, args)], capture_output=True, text=True, env=dict(os.environ, **(env or dict())))
+
+def test_gnu(tmp_path: pathlib.Path):
+    source = tmp_path / 'main.cpp'
+    source.write_text('// simcc latency=0.2 output=200\nint main() {}\n')
+    start = time.perf_counter()
+    task = run('-c', source, '-o', tmp_path / 'obj' / 'main.obj', '-MMD', '-MF', tmp_path / 'main.d')
+    assert time.perf_counter() - start >= 0.2
+    assert task.returncode == 0 and task.stderr.count('warning: simulated diagnostic') >= 1 and len(task.stderr) >= 150
+    assert (tmp_path / 'obj' / 'main.obj').read_text().startswith('// simcc latency=0.2')
+    assert (tmp_path / 'main.d').read_text().startswith(str(tmp_path / 'obj' / 'main.obj') + ': ' + str(source))
+    assert run('-dumpversion').stdout.strip() == '12.0.0'
+    assert run(tmp_path / 'obj' / 'main.obj', '-o', tmp_path / 'app').returncode == 0 and os.access(tmp_path / 'app', os.X_OK)
+
+def test_fail(tmp_path: pathlib.Path):
+    source = tmp_path / 'bad.cpp'
+    source.write_text('// simcc fail=1\n')
+    task = run('-c', source, '-o', tmp_path / 'bad.obj')
+    assert task.returncode == 1 and 'error: simulated failure' in task.stderr and not (tmp_path / 'bad.obj').exists()
+    source.write_text('int x;\n')
+    assert run('-c', source, '-o', tmp_path / 'bad.obj', env={'SIMCC_FAIL': '0'}).returncode == 0
+    results = {run('-c', source, '-o', tmp_path / 'bad.obj', env={'SIMCC_FAIL': '0.5', 'SIMCC_SEED': '7'}).returncode for _ in range(2)}
+    assert len(results) == 1
+
+def test_rss(tmp_path: pathlib.Path):
+    source = tmp_path / 'main.cpp'
+    source.write_text('// simcc rss=200000000\n')
+    compiler = gnu(SIMCC, 'simcc', builddir=tmp_path / 'build', target='simcc_app').setprofile(True).setstages(False, True, True)
+    _, logs = compiler.compile([source])
+    assert logs['final'][0] == 0 and (compiler.builddir / 'simcc_app').is_file()
+    if hasattr(os, 'wait4'):
+        assert max(record['maxrss'] for record in logs['profile'].records if record['stage'] == 'obj') >= 200000000
+
+def test_fail_fast(tmp_path: pathlib.Path):
+    slow, bad = tmp_path / 'slow.cpp', tmp_path / 'bad.cpp'
+    slow.write_text('// simcc latency=5\n')
+    bad.write_text('// simcc fail=1\n')
+    compiler = gnu(SIMCC, 'simcc', builddir=tmp_path / 'build', target='simcc_app', jobs=2).setcache(cache(tmp_path / 'cache')).setpolicy('fail_fast').setstages(False, True, False)
+    start = time.perf_counter()
+    _, logs = asyncio.run(compiler.async_compile([slow, bad]))
+    assert time.perf_counter() - start < 4
+    assert logs['policy']['failed'] == 1 and logs['policy']['cancelled'] == 1
+
+def test_sink_cancelled(tmp_path: pathlib.Path):
+    source = tmp_path / 'slow.cpp'
+    source.write_text('// simcc latency=5 output=200\n')
+    compiler = gnu(SIMCC, 'simcc', builddir=tmp_path / 'build', target='simcc_app').setsink(True).setstages(False, True, False)
+    sinks = []
+    compiler.capture = lambda build, stage, file: sinks.extend(gnu.capture(compiler, build, stage, file)) or sinks[-2:]
+    
+    async def build():
+        task = asyncio.ensure_future(compiler.async_compile([source]))
+        await asyncio.sleep(0.5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    
+    asyncio.run(build())
+    assert sinks and all(capture.file is None for capture in sinks)
+
+def test_msvc(tmp_path: pathlib.Path):
+    source = tmp_path / 'main.cpp'
+    source.write_text('int main() {}\n')
+    task = run('&&', 'cl', '/Fo' + str(tmp_path / 'obj') + '\\', '/Fa' + str(tmp_path / 'asm') + '\\', source, '/c')
+    assert task.returncode == 0 and (tmp_path / 'obj' / 'main.obj').is_file() and (tmp_path / 'asm' / 'main.asm').is_file()
+    assert run('&&', 'link', tmp_path / 'obj' / 'main.obj', '/OUT:' + str(tmp_path / 'main.exe')).returncode == 0 and (tmp_path / 'main.exe').is_file()
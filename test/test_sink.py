@@ -0,0 +1,24 @@
+import subprocess
+import sys
+
+from opifex import sink
+
+
+def test_sink(tmp_path):
+    capture = sink(tmp_path / 'logs' / 'main.obj.stderr', head=4, tail=3).open()
+    subprocess.run([sys.executable, '-c', 'import sys; sys.stderr.write("0123456789")'], stderr=capture)
+    capture.close()
+    assert capture.size == 10 and capture.start == '0123' and capture.end == '789'
+    assert capture.read() == str(capture) == '0123456789' and capture == '0123456789' and '456' in capture
+    assert capture.summary().startswith('0123\n[... 3 bytes in ') and capture.summary().endswith('...]\n789')
+    assert capture and capture == sink(tmp_path / 'logs' / 'main.obj.stderr')
+
+def test_short(tmp_path):
+    capture = sink(tmp_path / 'short', head=4, tail=4).open()
+    capture.file.write(b'012345')
+    capture.close()
+    assert capture.start == '0123' and capture.end == '45' and capture.summary() == '012345'
+
+def test_empty(tmp_path):
+    capture = sink(tmp_path / 'main.obj.stdout').open().close()
+    assert not capture and capture == '' and capture.read() == '' and not (tmp_path / 'main.obj.stdout').exists()
@@ -0,0 +1,26 @@
+import pytest
+
+from opifex import snapshot
+
+
+def test_splice():
+    s = snapshot({'includes': ['-Ia', '-Ib'], 'options': ['-O2']}, {'name': 'gcc'})
+    assert s['includes'] == ('-Ia', '-Ib')
+    assert s.splice('options', 'includes') == ['-O2', '-Ia', '-Ib']
+    assert s.splice() == []
+
+def test_fingerprint():
+    s = snapshot({'options': ['-O2']}, {'name': 'gcc', 'jobs': 4})
+    assert s.fingerprint == snapshot({'options': ['-O2']}, {'jobs': 4, 'name': 'gcc'}).fingerprint
+    assert s == snapshot({'options': ['-O2']}, {'name': 'gcc', 'jobs': 4})
+    assert s.fingerprint != snapshot({'options': ['-O3']}, {'name': 'gcc', 'jobs': 4}).fingerprint
+    assert s.fingerprint != snapshot({'options': ['-O2']}, {'name': 'gcc', 'jobs': 8}).fingerprint
+    r = snapshot({'options': ['-O2']}, {'name': 'gcc'}, {'jobs': 4})
+    assert r.runtime['jobs'] == '4' and r.fingerprint == snapshot({'options': ['-O2']}, {'name': 'gcc'}, {'jobs': 8}).fingerprint
+
+def test_immutable():
+    s = snapshot({'options': ['-O2']}, {})
+    with pytest.raises(AttributeError):
+        s.fingerprint = ''
+    with pytest.raises(TypeError):
+        s.fragments['options'] = ('-O3',)